@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+bench_chunking.py
+────────────────────────────────────────────────────────────────────
+Microbenchmark for the shared text chunker (common/chunking.py) on large
+documents, next to the string-concatenation chunker index_pdfs.py and
+create_db.py used before.
+
+High-level flow
+---------------
+1. **Documents** – seeded synthetic prose of each `--sizes` length, plus
+   the same length with no sentence punctuation at all (one "sentence"
+   per page, as extracted tables and code listings often are).
+2. **Chunk** – time chunk_spans() (spans only), chunk_text() (spans +
+   slicing) and the legacy chunker, best of `--repeat` runs each.
+3. **Report** – ms, MB/s and chunk count per size, and the growth
+   exponent between consecutive sizes (≈1.0 means linear, ≈2.0 quadratic).
+   A sanity check confirms no chunk is longer than chunk_size and
+   that the chunks cover the whole document.
+
+Usage
+-----
+python bench/bench_chunking.py [--sizes 10000,100000,500000,2000000]
+       [--chunk-size 800] [--overlap 200] [--repeat 3] [--no-legacy]
+       [--json results.json]
+"""
+
+# ───────────────────── standard-library imports ────────────────────
+import argparse
+import json
+import math
+import random
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+import logging
+
+# ── Resolve shared helpers from the repo root ───────────────────────
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+from common.chunking import chunk_spans, chunk_text
+
+logger = logging.getLogger("bench-chunking")
+
+# ╔════════════════════════════════════════════════════════════════╗
+# 1.  Documents and the legacy chunker                             ║
+# ╚════════════════════════════════════════════════════════════════╝
+
+WORDS = ("omnitech customer support refund policy device warranty shipping "
+         "return account password reset security incident report quarterly "
+         "revenue employee handbook onboarding benefits travel expense").split()
+
+
+def synthetic_document(size: int, seed: int, punctuation: bool = True) -> str:
+    """Seeded prose of `size` characters; without punctuation it is one long sentence."""
+    rng = random.Random(seed)
+    parts, length = [], 0
+    while length < size:
+        words = rng.choices(WORDS, k=rng.randint(6, 30))
+        sentence = " ".join(words) + (rng.choice(".!?") if punctuation else "")
+        sentence += "\n" if rng.random() < 0.1 else " "
+        parts.append(sentence)
+        length += len(sentence)
+    return "".join(parts)[:size]
+
+
+def legacy_chunk_text(text: str, chunk_size: int, overlap: int) -> List[str]:
+    """The chunker index_pdfs.py and create_db.py each carried before common/chunking.py."""
+    if not text or len(text) <= chunk_size:
+        return [text] if text else []
+
+    chunks = []
+    sentences = re.split(r'(?<=[.!?])\s+', text)
+    current_chunk = ""
+    for sentence in sentences:
+        if len(current_chunk) + len(sentence) > chunk_size and current_chunk:
+            chunks.append(current_chunk.strip())
+            overlap_text = current_chunk[-overlap:] if len(current_chunk) > overlap else current_chunk
+            current_chunk = overlap_text + " " + sentence
+        else:
+            current_chunk += (" " if current_chunk else "") + sentence
+    if current_chunk.strip():
+        chunks.append(current_chunk.strip())
+    return chunks
+
+# ╔════════════════════════════════════════════════════════════════╗
+# 2.  Timing                                                       ║
+# ╚════════════════════════════════════════════════════════════════╝
+
+def best_time(fn: Callable[[], Any], repeat: int) -> tuple:
+    """Best wall time (s) of `repeat` calls, and the last result."""
+    best, result = math.inf, None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def check_spans(text: str, spans: List[tuple], chunk_size: int, overlap: int) -> None:
+    """Every chunk within bounds, and every non-space character inside some chunk."""
+    longest = max((end - start for start, end in spans), default=0)
+    if longest > chunk_size:
+        raise AssertionError(f"chunk of {longest} chars exceeds chunk_size")
+    covered = 0
+    for start, end in spans:
+        if text[covered:start].strip():
+            raise AssertionError(f"text between {covered} and {start} is not in any chunk")
+        covered = max(covered, end)
+    if text[covered:].strip():
+        raise AssertionError("end of the document is not in any chunk")
+
+
+def bench_size(size: int, punctuation: bool, args) -> List[Dict[str, Any]]:
+    text = synthetic_document(size, args.seed, punctuation)
+    kind = "prose" if punctuation else "no-punctuation"
+    candidates = [
+        ("chunk_spans", lambda: list(chunk_spans(text, args.chunk_size, args.overlap))),
+        ("chunk_text", lambda: chunk_text(text, args.chunk_size, args.overlap)),
+    ]
+    if not args.no_legacy:
+        candidates.append(("legacy", lambda: legacy_chunk_text(text, args.chunk_size, args.overlap)))
+
+    rows = []
+    for name, fn in candidates:
+        seconds, result = best_time(fn, args.repeat)
+        if name == "chunk_spans":
+            check_spans(text, result, args.chunk_size, args.overlap)
+        rows.append({
+            "document": kind, "chunker": name, "chars": len(text),
+            "ms": seconds * 1000, "mb_per_s": len(text) / seconds / 1e6 if seconds else 0.0,
+            "chunks": len(result),
+            "longest": max((len(c) if isinstance(c, str) else c[1] - c[0] for c in result), default=0),
+        })
+        logger.info(f"{kind:>14} {len(text):>9,} chars  {name:<11} {seconds * 1000:9.2f} ms")
+    return rows
+
+# ╔════════════════════════════════════════════════════════════════╗
+# 3.  Report and CLI                                               ║
+# ╚════════════════════════════════════════════════════════════════╝
+
+def print_report(rows: List[Dict[str, Any]]) -> None:
+    print()
+    print(f"{'document':<15} {'chunker':<12} {'chars':>10} {'ms':>10} {'MB/s':>8} "
+          f"{'chunks':>7} {'longest':>8} {'growth':>7}")
+    print("-" * 84)
+    previous: Dict[tuple, Dict[str, Any]] = {}
+    for row in rows:
+        key = (row["document"], row["chunker"])
+        growth = ""
+        prev = previous.get(key)
+        if prev and row["chars"] > prev["chars"] and prev["ms"] > 0:
+            growth = f"{math.log(row['ms'] / prev['ms']) / math.log(row['chars'] / prev['chars']):.2f}"
+        previous[key] = row
+        print(f"{row['document']:<15} {row['chunker']:<12} {row['chars']:>10,} {row['ms']:>10.2f} "
+              f"{row['mb_per_s']:>8.1f} {row['chunks']:>7} {row['longest']:>8} {growth:>7}")
+    print("\ngrowth = log(time ratio) / log(size ratio) against the previous size; "
+          "1.0 is linear.")
+
+
+def int_list(text: str) -> List[int]:
+    return [int(v) for v in text.split(",") if v.strip()]
+
+
+def main():
+    """Parse command-line arguments and run the benchmark."""
+    parser = argparse.ArgumentParser(
+        description="Time the shared text chunker on large documents.",
+    )
+    parser.add_argument("--sizes", type=int_list, default=[10_000, 100_000, 500_000, 2_000_000],
+                        help="Comma-separated document sizes in characters "
+                             "(default: 10000,100000,500000,2000000)")
+    parser.add_argument("--chunk-size", type=int, default=800, help="Chunk size (default: 800)")
+    parser.add_argument("--overlap", type=int, default=200, help="Chunk overlap (default: 200)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement, best kept (default: 3)")
+    parser.add_argument("--no-legacy", action="store_true",
+                        help="Skip the legacy chunker (slow on unpunctuated text)")
+    parser.add_argument("--seed", type=int, default=42, help="Seed for the documents (default: 42)")
+    parser.add_argument("--json", type=Path, help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if args.repeat < 1:
+        parser.error("--repeat must be at least 1")
+    if not 0 <= args.overlap < args.chunk_size:
+        parser.error("--overlap must be at least 0 and less than --chunk-size")
+
+    rows = []
+    for punctuation in (True, False):
+        for size in sorted(args.sizes):
+            rows.extend(bench_size(size, punctuation, args))
+    print_report(rows)
+
+    if args.json:
+        args.json.write_text(json.dumps({
+            "config": {"sizes": args.sizes, "chunk_size": args.chunk_size,
+                       "overlap": args.overlap, "repeat": args.repeat, "seed": args.seed},
+            "rows": rows,
+        }, indent=2))
+        logger.info(f"Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,488 @@
+#!/usr/bin/env python3
+"""
+bench_chunking_sweep.py
+────────────────────────────────────────────────────────────────────
+Retrieval quality vs cost for a grid of chunking settings.
+
+index_pdfs.py defaults to --chunk-size 800 / --chunk-overlap 200 and
+index_code.py to --max-tokens 500. This script measures what other
+settings would buy: for every setting it indexes the same corpus into
+its own temporary collection, asks a labeled question set, and reports
+quality next to cost.
+
+High-level flow
+---------------
+1. **Corpus** – the knowledge-base PDFs (--pdf-dir) and/or a code tree
+   (--code-dir). PDF pages are extracted once into a temporary page cache
+   and code files are read once, so every setting pays only for
+   chunking, embedding and storing.
+2. **Index** – per (chunk_size, overlap) for PDFs and per max_tokens for
+   code: chunk with the indexers' own functions (iter_pdf_chunks;
+   chunk_python or chunk_code, then pack_chunks), embed with the
+   indexers' default model, and add to a fresh collection. Records
+   indexing time, chunk count and on-disk size.
+3. **Ask** – every labeled question, one query at a time. A question is
+   (corpus, question, source file, answer): a retrieved chunk is relevant
+   when it comes from that file and contains the answer text (compared
+   lowercased, whitespace-collapsed). Questions are embedded once per
+   corpus, so latency is that of the collection query alone.
+4. **Report** – recall@k (questions with a relevant chunk in the top k),
+   MRR (mean 1/rank of the first relevant chunk, 0 if none in the top
+   k), p50/p95 query latency, chunks, index size and indexing time per
+   setting. Settings that no other setting beats on quality (recall@k and
+   MRR) without costing more (size and indexing time) are marked '*'.
+
+Labels whose answer text appears in no chunk of a setting can never be
+hit; they are counted and logged, so a bad label does not pass for a bad
+setting.
+
+Usage
+-----
+python bench/bench_chunking_sweep.py [--corpus pdfs,code]
+       [--chunk-sizes 400,800,1200] [--overlaps 0,100,200]
+       [--max-tokens 200,500,1000] [--k 5] [--questions questions.json]
+       [--pdf-dir rag/knowledge_base_pdfs] [--code-dir common]
+       [--json results.json]
+
+--questions takes a JSON list of objects with "corpus" ("pdfs" or
+"code"), "question", "source" (PDF file name, or file path relative to
+--code-dir) and "answer" (text a relevant chunk contains); it replaces
+the built-in set for the corpora it covers.
+"""
+
+# ───────────────────── standard-library imports ────────────────────
+import argparse
+import itertools
+import json
+import re
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+import logging
+
+# ── Resolve shared helpers and the indexers from the repo root ──────
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "tools"))
+from common.embedding_cache import default_embedding_function
+from common.file_discovery import discover_files
+from common.page_cache import PageTextCache
+from common.pipeline_metrics import RollingHistogram
+
+# ───────────────────── 3rd-party imports ───────────────────────────
+try:
+    from chromadb import PersistentClient
+    from chromadb.config import Settings, DEFAULT_TENANT, DEFAULT_DATABASE
+    from chromadb.api.shared_system_client import SharedSystemClient
+except ImportError:
+    print("ERROR: chromadb not installed. Install with: pip install chromadb")
+    sys.exit(1)
+
+from index_pdfs import DEFAULT_CHUNK_OVERLAP, DEFAULT_CHUNK_SIZE, iter_pdf_chunks, iter_pdf_pages
+from index_code import (
+    DEFAULT_MAX_TOKENS, SKIP_DIRS, chunk_code, chunk_python, get_language, pack_chunks,
+    screen_file, should_index_file,
+)
+
+logger = logging.getLogger("bench-chunking-sweep")
+
+# ╔════════════════════════════════════════════════════════════════╗
+# 1.  Configuration / labeled questions                            ║
+# ╚════════════════════════════════════════════════════════════════╝
+
+DEFAULT_PDF_DIR = ROOT / "rag" / "knowledge_base_pdfs"
+DEFAULT_CODE_DIR = ROOT / "common"
+CORPORA = ("pdfs", "code")
+ADD_BATCH = 256
+COLLECTION_NAME = "chunking_sweep"
+
+RETURNS = "OmniTech_Returns_Policy_2024.pdf"
+SHIPPING = "OmniTech_Global_Shipping_Logistics.pdf"
+SECURITY = "OmniTech_Account_Security_Handbook.pdf"
+DEVICE = "OmniTech_Device_Troubleshooting_Manual.pdf"
+
+# (corpus, question, source, answer text a relevant chunk contains)
+QUESTIONS: List[Tuple[str, str, str, str]] = [
+    ("pdfs", "How long do I have to return a product I bought?", RETURNS,
+     "returned within 30 calendar days"),
+    ("pdfs", "What is the return window for Pro-Series enterprise servers?", RETURNS,
+     "strict 14-day return window"),
+    ("pdfs", "How soon is a refund paid after my return is inspected?", RETURNS,
+     "within 5-7 business days of inspection completion"),
+    ("pdfs", "Where do Canadian customers send their returns?", RETURNS,
+     "Mississauga, Ontario"),
+    ("pdfs", "How much does priority express shipping cost?", SHIPPING,
+     "Priority Express Shipping ($15.99)"),
+    ("pdfs", "How long does standard international delivery take?", SHIPPING,
+     "Estimated delivery of 7-14 business days"),
+    ("pdfs", "My package shows delivered but never arrived, what should I do?", SHIPPING,
+     "they must wait 36 hours before initiating a claim"),
+    ("pdfs", "What does shipping to an APO/FPO military address cost?", SHIPPING,
+     "$9.99 flat rate"),
+    ("pdfs", "What order total qualifies for free shipping?", SHIPPING,
+     "Orders totaling $50.00 or more"),
+    ("pdfs", "I am locked out of my account, how do I reset my password?", SECURITY,
+     "'Forgot Password' link"),
+    ("pdfs", "Where do I turn on multi-factor authentication?", SECURITY,
+     "Settings > Security > Multi-Factor Authentication"),
+    ("pdfs", "How many backup codes do I get when enrolling in MFA?", SECURITY,
+     "generates 10 single-use backup codes"),
+    ("pdfs", "How often must business accounts change their passwords?", SECURITY,
+     "rotate passwords every 90 days"),
+    ("pdfs", "My device is frozen and unresponsive, how do I force restart it?", DEVICE,
+     "Press and hold the Power button for exactly 10 seconds"),
+    ("pdfs", "How do I recalibrate the battery?", DEVICE,
+     "Leave powered off for 6 hours minimum"),
+    ("pdfs", "Which DNS servers should I use to fix Wi-Fi connection problems?", DEVICE,
+     "Primary: 8.8.8.8"),
+    ("pdfs", "How do I reset the network settings on my device?", DEVICE,
+     "Hold the 'Volume Up' and 'Power' buttons"),
+    ("pdfs", "When does the device check for firmware updates?", DEVICE,
+     "daily at 3:00 AM local time"),
+    ("code", "How are near-duplicate chunks detected with MinHash?", "dedup.py",
+     "class NearDuplicateFilter"),
+    ("code", "Convert a Chroma distance into a similarity score", "hnsw.py",
+     "def distance_to_score"),
+    ("code", "Quantize stored vectors to float16 or int8", "vector_store.py",
+     "def quantize"),
+    ("code", "Split text into overlapping sentence-aligned chunks", "chunking.py",
+     "def chunk_spans"),
+    ("code", "Evict old entries from the on-disk embedding cache", "embedding_store.py",
+     "def prune"),
+    ("code", "Compute the SHA-256 hash of a PDF file", "page_cache.py",
+     "def file_digest"),
+    ("code", "Percentile latency histogram over a sliding window", "pipeline_metrics.py",
+     "class RollingHistogram"),
+    ("code", "Normalize a query string before looking it up in the cache", "embedding_cache.py",
+     "def normalize_query"),
+    ("code", "Which URL is the remote embedding server at?", "remote_embeddings.py",
+     "def embedding_server_url"),
+]
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize(text: str) -> str:
+    return _WHITESPACE.sub(" ", text).strip().lower()
+
+
+def load_questions(path: Path) -> List[Dict[str, str]]:
+    """Labeled questions from a JSON file; raises ValueError on a malformed entry."""
+    entries = json.loads(path.read_text())
+    if not isinstance(entries, list):
+        raise ValueError(f"{path}: expected a JSON list of questions")
+    for i, entry in enumerate(entries):
+        missing = [key for key in ("corpus", "question", "source", "answer") if not entry.get(key)]
+        if missing:
+            raise ValueError(f"{path}: question {i} is missing {', '.join(missing)}")
+        if entry["corpus"] not in CORPORA:
+            raise ValueError(f"{path}: question {i} has unknown corpus {entry['corpus']!r}")
+    return entries
+
+
+def builtin_questions() -> List[Dict[str, str]]:
+    return [{"corpus": c, "question": q, "source": s, "answer": a} for c, q, s, a in QUESTIONS]
+
+# ╔════════════════════════════════════════════════════════════════╗
+# 2.  Corpora – one chunker per corpus                             ║
+# ╚════════════════════════════════════════════════════════════════╝
+
+Chunk = Tuple[str, str]                 # (source, text)
+
+
+def pdf_files(pdf_dir: Path) -> List[Path]:
+    return sorted(pdf_dir.glob("*.pdf"))
+
+
+def warm_page_cache(files: List[Path], page_cache: PageTextCache) -> None:
+    """Extract every PDF once, so no setting's indexing time includes parsing."""
+    for pdf_path in files:
+        for _ in iter_pdf_pages(pdf_path, page_cache=page_cache):
+            pass
+
+
+def pdf_chunks(files: List[Path], page_cache: PageTextCache,
+               chunk_size: int, overlap: int) -> Iterator[Chunk]:
+    for pdf_path in files:
+        for chunk in iter_pdf_chunks(pdf_path, chunk_size, overlap, page_cache=page_cache):
+            yield chunk["metadata"]["source"], chunk["text"]
+
+
+def read_code_tree(code_dir: Path) -> List[Tuple[str, str, str]]:
+    """(path relative to code_dir, language, text) of every file index_code.py would index."""
+    files = []
+    for file_path in discover_files(code_dir, SKIP_DIRS)[0]:
+        if not should_index_file(file_path) or screen_file(file_path, file_path.stat().st_size):
+            continue
+        text = file_path.read_text(encoding="utf-8", errors="ignore")
+        if text.strip():
+            files.append((file_path.relative_to(code_dir).as_posix(),
+                          get_language(file_path), text))
+    return files
+
+
+def code_chunks(files: List[Tuple[str, str, str]], max_tokens: int) -> Iterator[Chunk]:
+    for rel_path, language, text in files:
+        chunks = (chunk_python(text, max_tokens) if language == "python"
+                  else chunk_code(text, max_tokens, language))
+        for chunk in pack_chunks(chunks, max_tokens):
+            yield rel_path, chunk["text"]
+
+# ╔════════════════════════════════════════════════════════════════╗
+# 3.  Index and ask one setting                                    ║
+# ╚════════════════════════════════════════════════════════════════╝
+
+def directory_mb(path: Path) -> float:
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file()) / 1e6
+
+
+def build(db_path: Path, chunks: Iterator[Chunk],
+          embed: Callable[[List[str]], List[Any]]) -> Tuple[Any, List[Chunk], float]:
+    """Chunk, embed and store into a fresh collection; returns (collection, chunks, seconds)."""
+    client = PersistentClient(path=str(db_path), settings=Settings(),
+                              tenant=DEFAULT_TENANT, database=DEFAULT_DATABASE)
+    coll = client.create_collection(COLLECTION_NAME, embedding_function=None)
+    stored: List[Chunk] = []
+
+    def flush(batch: List[Chunk]) -> None:
+        coll.add(ids=[str(i) for i in range(len(stored), len(stored) + len(batch))],
+                 embeddings=embed([text for _, text in batch]))
+        stored.extend(batch)
+
+    t0 = time.perf_counter()
+    batch: List[Chunk] = []
+    for chunk in chunks:
+        batch.append(chunk)
+        if len(batch) >= ADD_BATCH:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+    return coll, stored, time.perf_counter() - t0
+
+
+def ask(coll, stored: List[Chunk], questions: List[Dict[str, str]],
+        query_embeddings: List[Any], k: int) -> Dict[str, Any]:
+    """recall@k, MRR and latency of one-at-a-time queries."""
+    normalized = [(source, normalize(text)) for source, text in stored]
+    answerable = 0
+    hits = 0
+    reciprocal_ranks = 0.0
+    hist = RollingHistogram(window=len(questions))
+    for question, embedding in zip(questions, query_embeddings):
+        source, answer = question["source"], normalize(question["answer"])
+        relevant = {i for i, (s, text) in enumerate(normalized) if s == source and answer in text}
+        if relevant:
+            answerable += 1
+        else:
+            logger.debug(f"  no chunk contains the answer to: {question['question']}")
+
+        t0 = time.perf_counter()
+        result = coll.query(query_embeddings=[embedding], n_results=min(k, len(stored)),
+                            include=[])
+        hist.add((time.perf_counter() - t0) * 1000)
+
+        for rank, chunk_id in enumerate(result["ids"][0], start=1):
+            if int(chunk_id) in relevant:
+                hits += 1
+                reciprocal_ranks += 1.0 / rank
+                break
+    return {
+        "recall": round(hits / len(questions), 4),
+        "mrr": round(reciprocal_ranks / len(questions), 4),
+        "answerable": answerable,
+        "latency_ms": hist.summary(),
+    }
+
+
+def bench_corpus(corpus: str, settings: List[Dict[str, int]],
+                 make_chunks: Callable[..., Iterator[Chunk]], questions: List[Dict[str, str]],
+                 embed: Callable[[List[str]], List[Any]], args,
+                 workdir: Path) -> List[Dict[str, Any]]:
+    """Every chunking setting of one corpus."""
+    query_embeddings = embed([q["question"] for q in questions])
+    rows = []
+    for setting in settings:
+        label = " ".join(f"{key}={value}" for key, value in setting.items())
+        db_path = workdir / f"{corpus}_{'_'.join(str(v) for v in setting.values())}"
+        logger.info(f"Indexing {corpus} with {label} ...")
+        coll, stored, seconds = build(db_path, make_chunks(**setting), embed)
+        if not stored:
+            raise ValueError(f"{corpus}: no chunks were produced")
+
+        result = ask(coll, stored, questions, query_embeddings, args.k)
+        if result["answerable"] < len(questions):
+            logger.warning(f"  {len(questions) - result['answerable']} of {len(questions)} "
+                           f"answers are in no chunk with {label} (check the labels with -v)")
+        rows.append({
+            "corpus": corpus, **setting, "chunks": len(stored),
+            "avg_chars": round(sum(len(text) for _, text in stored) / len(stored)),
+            "index_s": round(seconds, 2), "size_mb": round(directory_mb(db_path), 2),
+            **result,
+        })
+        logger.info(f"  recall@{args.k}={result['recall']:.3f} mrr={result['mrr']:.3f} "
+                    f"chunks={len(stored)} index={seconds:.1f}s")
+        del coll
+        SharedSystemClient.clear_system_cache()
+        shutil.rmtree(db_path, ignore_errors=True)
+    mark_frontier(rows)
+    return rows
+
+
+def mark_frontier(rows: List[Dict[str, Any]]) -> None:
+    """Set 'frontier' on rows no other row beats on quality without costing more."""
+    def dominates(a: Dict[str, Any], b: Dict[str, Any]) -> bool:
+        better = (a["recall"], a["mrr"], -a["size_mb"], -a["index_s"])
+        worse = (b["recall"], b["mrr"], -b["size_mb"], -b["index_s"])
+        return all(x >= y for x, y in zip(better, worse)) and better != worse
+
+    for row in rows:
+        row["frontier"] = not any(dominates(other, row) for other in rows if other is not row)
+
+# ╔════════════════════════════════════════════════════════════════╗
+# 4.  Report and CLI                                               ║
+# ╚════════════════════════════════════════════════════════════════╝
+
+def print_report(results: Dict[str, Any]) -> None:
+    cfg = results["config"]
+    k = cfg["k"]
+    print("\n" + "=" * 100)
+    print(f"CHUNKING SWEEP  k={k}  corpora={','.join(cfg['corpora'])}")
+    print("=" * 100)
+    for corpus in cfg["corpora"]:
+        rows = [r for r in results["rows"] if r["corpus"] == corpus]
+        if not rows:
+            continue
+        print(f"\n{corpus} ({cfg['questions'][corpus]} questions)")
+        print(f"  {'setting':<22}{'recall@' + str(k):>10}{'MRR':>8}{'p50 ms':>9}{'p95 ms':>9}"
+              f"{'chunks':>8}{'avg ch':>8}{'size MB':>9}{'index s':>9}")
+        for r in rows:
+            setting = (f"max_tokens={r['max_tokens']}" if corpus == "code"
+                       else f"size={r['chunk_size']} ov={r['overlap']}")
+            lat = r["latency_ms"]
+            print(f"{'*' if r['frontier'] else ' '} {setting:<22}{r['recall']:>10.3f}{r['mrr']:>8.3f}"
+                  f"{lat['p50']:>9.2f}{lat['p95']:>9.2f}{r['chunks']:>8}{r['avg_chars']:>8}"
+                  f"{r['size_mb']:>9.2f}{r['index_s']:>9.2f}")
+    print("\n* = no other setting has recall@k and MRR at least as high with size and "
+          "indexing time at most as high.")
+    print(f"Indexer defaults: chunk_size={DEFAULT_CHUNK_SIZE} overlap={DEFAULT_CHUNK_OVERLAP} "
+          f"max_tokens={DEFAULT_MAX_TOKENS}\n")
+
+
+def int_list(text: str) -> List[int]:
+    return [int(v) for v in text.split(",") if v.strip()]
+
+
+def main():
+    """Parse command-line arguments and run the benchmark."""
+    parser = argparse.ArgumentParser(
+        description="Measure retrieval quality and cost across chunking settings.",
+    )
+    parser.add_argument("--corpus", default="pdfs,code",
+                        help="Comma-separated subset of pdfs, code (default: pdfs,code)")
+    parser.add_argument("--pdf-dir", type=Path, default=DEFAULT_PDF_DIR,
+                        help="Directory of PDFs (default: rag/knowledge_base_pdfs)")
+    parser.add_argument("--code-dir", type=Path, default=DEFAULT_CODE_DIR,
+                        help="Code tree; the built-in code questions are about common/ "
+                             "(default: common)")
+    parser.add_argument("--chunk-sizes", type=int_list, default=[400, DEFAULT_CHUNK_SIZE, 1200],
+                        help=f"Comma-separated PDF chunk sizes in characters "
+                             f"(default: 400,{DEFAULT_CHUNK_SIZE},1200)")
+    parser.add_argument("--overlaps", type=int_list, default=[0, 100, DEFAULT_CHUNK_OVERLAP],
+                        help=f"Comma-separated PDF chunk overlaps; overlaps not below a chunk "
+                             f"size are skipped for it (default: 0,100,{DEFAULT_CHUNK_OVERLAP})")
+    parser.add_argument("--max-tokens", type=int_list, default=[200, DEFAULT_MAX_TOKENS, 1000],
+                        help=f"Comma-separated code chunk sizes in tokens "
+                             f"(default: 200,{DEFAULT_MAX_TOKENS},1000)")
+    parser.add_argument("--questions", type=Path,
+                        help="JSON file of labeled questions (replaces the built-in set "
+                             "for the corpora it covers)")
+    parser.add_argument("--k", type=int, default=5, help="Results per question (default: 5)")
+    parser.add_argument("--json", type=Path, help="Write results as JSON to this path")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Debug logging")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+    logging.getLogger("chromadb").setLevel(logging.WARNING)
+    logging.getLogger("index_pdfs").setLevel(logging.WARNING)
+
+    corpora = [c.strip() for c in args.corpus.split(",") if c.strip()]
+    unknown = [c for c in corpora if c not in CORPORA]
+    if unknown:
+        parser.error(f"unknown corpus: {', '.join(unknown)}")
+    if args.k < 1:
+        parser.error("--k must be at least 1")
+
+    try:
+        questions = builtin_questions()
+        if args.questions:
+            loaded = load_questions(args.questions)
+            covered = {q["corpus"] for q in loaded}
+            questions = [q for q in questions if q["corpus"] not in covered] + loaded
+    except (OSError, ValueError) as e:
+        logger.error(str(e))
+        return
+    by_corpus = {c: [q for q in questions if q["corpus"] == c] for c in corpora}
+    for corpus, corpus_questions in by_corpus.items():
+        if not corpus_questions:
+            parser.error(f"no questions for corpus {corpus!r}")
+
+    embed = default_embedding_function()
+    workdir = Path(tempfile.mkdtemp(prefix="bench_chunking_sweep_"))
+    page_cache = None
+    rows: List[Dict[str, Any]] = []
+    try:
+        if "pdfs" in corpora:
+            files = pdf_files(args.pdf_dir)
+            if not files:
+                logger.error(f"No PDFs found in {args.pdf_dir}")
+                return
+            page_cache = PageTextCache(workdir / "pages.sqlite3", max_age_days=None)
+            logger.info(f"Extracting {len(files)} PDFs once ...")
+            warm_page_cache(files, page_cache)
+            settings = [{"chunk_size": size, "overlap": overlap}
+                        for size, overlap in itertools.product(args.chunk_sizes, args.overlaps)
+                        if 0 <= overlap < size]
+            rows.extend(bench_corpus(
+                "pdfs", settings,
+                lambda chunk_size, overlap: pdf_chunks(files, page_cache, chunk_size, overlap),
+                by_corpus["pdfs"], embed, args, workdir))
+
+        if "code" in corpora:
+            files = read_code_tree(args.code_dir)
+            if not files:
+                logger.error(f"No code files found in {args.code_dir}")
+                return
+            logger.info(f"Read {len(files)} code files from {args.code_dir}")
+            settings = [{"max_tokens": n} for n in args.max_tokens if n > 0]
+            rows.extend(bench_corpus(
+                "code", settings,
+                lambda max_tokens: code_chunks(files, max_tokens),
+                by_corpus["code"], embed, args, workdir))
+    except ValueError as e:
+        logger.error(str(e))
+        return
+    finally:
+        if page_cache is not None:
+            page_cache.close(prune=False)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    results = {
+        "config": {"corpora": corpora, "k": args.k,
+                   "questions": {c: len(q) for c, q in by_corpus.items()},
+                   "pdf_dir": str(args.pdf_dir), "code_dir": str(args.code_dir)},
+        "rows": rows,
+    }
+    print_report(results)
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+        logger.info(f"Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+bench_hnsw_recall.py
+────────────────────────────────────────────────────────────────────
+Recall / latency / size benchmark for Chroma's HNSW index settings.
+
+index_pdfs.py and index_code.py accept --hnsw-space, --hnsw-m,
+--hnsw-ef-construction and --hnsw-ef-search (see common/hnsw.py). This
+script measures what those settings buy: for every combination it builds
+a collection from the same vectors, runs held-out queries one at a time,
+and compares the approximate results with brute-force exact search.
+
+High-level flow
+---------------
+1. **Vectors** – embeddings from an existing collection (--chroma-path),
+   or seeded clustered unit vectors shaped like MiniLM embeddings.
+   `--queries` rows are held out of the index and used as queries.
+2. **Ground truth** – exact top-k per query with NumPy, in the same
+   distance space as the index.
+3. **Build** – one temporary collection per (space, M, ef_construction),
+   recording build time and on-disk size.
+4. **Search** – for each ef_search, recall@k and p50/p99 latency of
+   single-query collection.query() calls, next to exact NumPy search.
+
+Usage
+-----
+python bench/bench_hnsw_recall.py [--vectors 20000] [--queries 200] [--k 10]
+       [--spaces l2,cosine] [--m 8,16,32] [--ef-construction 100,200]
+       [--ef-search 10,20,50,100,200] [--chroma-path PATH --collection NAME]
+       [--json results.json]
+"""
+
+# ───────────────────── standard-library imports ────────────────────
+import argparse
+import itertools
+import json
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+import logging
+
+# ── Resolve shared helpers from the repo root ───────────────────────
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+from common.hnsw import (
+    SPACES, DEFAULT_EF_CONSTRUCTION, DEFAULT_EF_SEARCH, DEFAULT_M, hnsw_configuration,
+)
+from common.pipeline_metrics import RollingHistogram
+
+# ───────────────────── 3rd-party imports ───────────────────────────
+try:
+    import numpy as np
+except ImportError:
+    print("ERROR: numpy not installed. Install with: pip install numpy")
+    sys.exit(1)
+
+try:
+    from chromadb import PersistentClient
+    from chromadb.config import Settings, DEFAULT_TENANT, DEFAULT_DATABASE
+    from chromadb.api.shared_system_client import SharedSystemClient
+except ImportError:
+    print("ERROR: chromadb not installed. Install with: pip install chromadb")
+    sys.exit(1)
+
+logger = logging.getLogger("bench-hnsw")
+
+# ╔════════════════════════════════════════════════════════════════╗
+# 1.  Configuration / constants                                    ║
+# ╚════════════════════════════════════════════════════════════════╝
+
+DIM = 384                       # all-MiniLM-L6-v2
+CLUSTERS = 200                  # Topic clusters in the synthetic vectors
+ADD_BATCH = 1000
+COLLECTION_NAME = "hnsw_bench"
+
+# ╔════════════════════════════════════════════════════════════════╗
+# 2.  Vectors and exact ground truth                               ║
+# ╚════════════════════════════════════════════════════════════════╝
+
+def synthetic_vectors(count: int, seed: int) -> np.ndarray:
+    """Unit vectors scattered around topic centers, like embeddings of a real corpus."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((CLUSTERS, DIM)).astype(np.float32)
+    vectors = centers[rng.integers(0, CLUSTERS, count)]
+    vectors += 0.6 * rng.standard_normal((count, DIM)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def collection_vectors(chroma_path: Path, collection: str) -> np.ndarray:
+    """All stored embeddings of an existing collection."""
+    client = PersistentClient(path=str(chroma_path), settings=Settings(),
+                              tenant=DEFAULT_TENANT, database=DEFAULT_DATABASE)
+    data = client.get_collection(collection).get(include=["embeddings"])
+    return np.asarray(data["embeddings"], dtype=np.float32)
+
+
+def normalized(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def exact_distances(data: np.ndarray, queries: np.ndarray, space: str) -> np.ndarray:
+    """
+    Distances as Chroma defines them: squared L2, 1 - cosine, or 1 - dot.
+    For 'cosine' both inputs must already be normalized (done once, up front).
+    """
+    if space == "l2":
+        return (np.einsum("ij,ij->i", data, data)[None, :] - 2.0 * queries @ data.T
+                + np.einsum("ij,ij->i", queries, queries)[:, None])
+    return 1.0 - queries @ data.T
+
+
+def exact_top_k(data: np.ndarray, queries: np.ndarray, k: int, space: str) -> np.ndarray:
+    distances = exact_distances(data, queries, space)
+    top = np.argpartition(distances, k - 1, axis=1)[:, :k]
+    return np.take_along_axis(top, np.argsort(np.take_along_axis(distances, top, axis=1), axis=1), axis=1)
+
+
+def exact_latency(data: np.ndarray, queries: np.ndarray, k: int, space: str) -> Dict[str, float]:
+    """Single-query latency of brute-force NumPy search (the baseline ANN must beat)."""
+    hist = RollingHistogram(window=len(queries))
+    for q in queries:
+        t0 = time.perf_counter()
+        exact_top_k(data, q[None, :], k, space)
+        hist.add((time.perf_counter() - t0) * 1000)
+    return hist.summary()
+
+
+# ╔════════════════════════════════════════════════════════════════╗
+# 3.  Build and search one configuration                           ║
+# ╚════════════════════════════════════════════════════════════════╝
+
+def directory_mb(path: Path) -> float:
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file()) / 1e6
+
+
+def open_client(db_path: Path):
+    return PersistentClient(path=str(db_path), settings=Settings(),
+                            tenant=DEFAULT_TENANT, database=DEFAULT_DATABASE)
+
+
+def build(db_path: Path, data: np.ndarray, space: str, m: int, ef_construction: int):
+    """Create a collection with the given settings; returns (collection, seconds)."""
+    coll = open_client(db_path).create_collection(
+        COLLECTION_NAME,
+        configuration=hnsw_configuration(space, m, ef_construction),
+        embedding_function=None,
+    )
+    t0 = time.perf_counter()
+    for start in range(0, len(data), ADD_BATCH):
+        chunk = data[start:start + ADD_BATCH]
+        coll.add(ids=[str(i) for i in range(start, start + len(chunk))], embeddings=chunk)
+    return coll, time.perf_counter() - t0
+
+
+def with_ef_search(db_path: Path, coll, ef_search: int):
+    """
+    Persist a new ef_search and reopen the collection. A loaded HNSW index
+    keeps the ef it was opened with, so the client cache must be dropped.
+    """
+    coll.modify(configuration={"hnsw": {"ef_search": ef_search}})
+    SharedSystemClient.clear_system_cache()
+    return open_client(db_path).get_collection(COLLECTION_NAME)
+
+
+def search(coll, queries: np.ndarray, truth: np.ndarray, k: int) -> Dict[str, Any]:
+    """recall@k and latency of one-at-a-time queries at the collection's current ef_search."""
+    hist = RollingHistogram(window=len(queries))
+    hits = 0
+    for q, expected in zip(queries, truth):
+        t0 = time.perf_counter()
+        result = coll.query(query_embeddings=[q], n_results=k, include=[])
+        hist.add((time.perf_counter() - t0) * 1000)
+        hits += len(set(int(i) for i in result["ids"][0]) & set(expected.tolist()))
+    return {"recall": round(hits / (len(queries) * k), 4), "latency_ms": hist.summary()}
+
+
+def bench_space(space: str, data: np.ndarray, queries: np.ndarray, args,
+                workdir: Path) -> List[Dict[str, Any]]:
+    """Every (M, ef_construction, ef_search) combination for one distance space."""
+    exact_data, exact_queries = ((normalized(data), normalized(queries)) if space == "cosine"
+                                 else (data, queries))
+    truth = exact_top_k(exact_data, exact_queries, args.k, space)
+    rows = [{"space": space, "index": "exact (numpy)", "recall": 1.0,
+             "latency_ms": exact_latency(exact_data, exact_queries, args.k, space),
+             "size_mb": round(data.nbytes / 1e6, 1)}]
+
+    for m, ef_construction in itertools.product(args.m, args.ef_construction):
+        db_path = workdir / f"{space}_m{m}_efc{ef_construction}"
+        logger.info(f"Building space={space} M={m} ef_construction={ef_construction} ...")
+        coll, seconds = build(db_path, data, space, m, ef_construction)
+
+        for ef_search in args.ef_search:
+            coll = with_ef_search(db_path, coll, ef_search)
+            for q in queries[:args.warmup]:
+                coll.query(query_embeddings=[q], n_results=args.k, include=[])
+            result = search(coll, queries, truth, args.k)
+            rows.append({
+                "space": space, "index": "hnsw", "m": m, "ef_construction": ef_construction,
+                "ef_search": ef_search, "build_s": round(seconds, 2),
+                "size_mb": round(directory_mb(db_path), 1), **result,
+            })
+            logger.info(f"  ef_search={ef_search:<4} recall@{args.k}={result['recall']:.4f} "
+                        f"p50={result['latency_ms']['p50']:.2f}ms")
+        del coll
+        SharedSystemClient.clear_system_cache()
+        shutil.rmtree(db_path, ignore_errors=True)
+    return rows
+
+
+# ╔════════════════════════════════════════════════════════════════╗
+# 4.  Report and CLI                                               ║
+# ╚════════════════════════════════════════════════════════════════╝
+
+def print_report(results: Dict[str, Any]) -> None:
+    cfg = results["config"]
+    print("\n" + "=" * 86)
+    print(f"HNSW RECALL BENCHMARK  vectors={cfg['vectors']}  queries={cfg['queries']}  "
+          f"k={cfg['k']}  source={cfg['source']}")
+    print("=" * 86)
+    print(f"  {'space':<8}{'index':<15}{'M':>4}{'efC':>6}{'efS':>6}{'recall':>9}"
+          f"{'p50 ms':>9}{'p99 ms':>9}{'build s':>9}{'size MB':>9}")
+    for r in results["rows"]:
+        lat = r["latency_ms"]
+        print(f"  {r['space']:<8}{r['index']:<15}{r.get('m', ''):>4}{r.get('ef_construction', ''):>6}"
+              f"{r.get('ef_search', ''):>6}{r['recall']:>9.4f}{lat['p50']:>9.2f}{lat['p99']:>9.2f}"
+              f"{r.get('build_s', ''):>9}{r['size_mb']:>9}")
+    print()
+
+
+def int_list(text: str) -> List[int]:
+    return [int(v) for v in text.split(",") if v.strip()]
+
+
+def main():
+    """Parse command-line arguments and run the benchmark."""
+    parser = argparse.ArgumentParser(
+        description="Measure HNSW recall@k, latency and size against exact search.",
+    )
+    parser.add_argument("--vectors", type=int, default=20000,
+                        help="Synthetic vectors to index (default: 20000)")
+    parser.add_argument("--chroma-path", type=Path,
+                        help="Use the embeddings of an existing ChromaDB instead of synthetic ones")
+    parser.add_argument("--collection", default="pdf_documents",
+                        help="Collection to read with --chroma-path (default: pdf_documents)")
+    parser.add_argument("--queries", type=int, default=200,
+                        help="Held-out query vectors (default: 200)")
+    parser.add_argument("--k", type=int, default=10, help="Results per query (default: 10)")
+    parser.add_argument("--spaces", default="l2,cosine",
+                        help=f"Comma-separated subset of {', '.join(SPACES)} (default: l2,cosine)")
+    parser.add_argument("--m", type=int_list, default=[8, DEFAULT_M, 32],
+                        help=f"Comma-separated M values (default: 8,{DEFAULT_M},32)")
+    parser.add_argument("--ef-construction", type=int_list, default=[DEFAULT_EF_CONSTRUCTION, 200],
+                        help=f"Comma-separated ef_construction values (default: {DEFAULT_EF_CONSTRUCTION},200)")
+    parser.add_argument("--ef-search", type=int_list, default=[10, 20, 50, DEFAULT_EF_SEARCH, 200],
+                        help=f"Comma-separated ef_search values (default: 10,20,50,{DEFAULT_EF_SEARCH},200)")
+    parser.add_argument("--warmup", type=int, default=10,
+                        help="Untimed queries after each ef_search change (default: 10)")
+    parser.add_argument("--seed", type=int, default=42, help="Seed for vectors and query choice (default: 42)")
+    parser.add_argument("--json", type=Path, help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    logging.getLogger("chromadb").setLevel(logging.WARNING)
+
+    spaces = [s.strip() for s in args.spaces.split(",") if s.strip()]
+    unknown = [s for s in spaces if s not in SPACES]
+    if unknown:
+        parser.error(f"unknown space(s): {', '.join(unknown)}")
+
+    if args.chroma_path:
+        vectors = collection_vectors(args.chroma_path, args.collection)
+        source = f"{args.chroma_path}/{args.collection}"
+    else:
+        vectors = synthetic_vectors(args.vectors + args.queries, args.seed)
+        source = "synthetic"
+    if len(vectors) <= args.queries + args.k:
+        parser.error(f"need more than --queries + --k vectors, found {len(vectors)}")
+
+    # Hold the query vectors out of the index, so no query finds itself
+    order = np.random.default_rng(args.seed).permutation(len(vectors))
+    queries, data = vectors[order[:args.queries]], vectors[order[args.queries:]]
+
+    workdir = Path(tempfile.mkdtemp(prefix="bench_hnsw_"))
+    try:
+        rows = []
+        for space in spaces:
+            rows.extend(bench_space(space, data, queries, args, workdir))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    results = {
+        "config": {"vectors": len(data), "queries": len(queries), "k": args.k,
+                   "source": source, "seed": args.seed},
+        "rows": rows,
+    }
+    print_report(results)
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+        logger.info(f"Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,530 @@
+#!/usr/bin/env python3
+"""
+bench_rag_pipeline.py
+────────────────────────────────────────────────────────────────────
+Reproducible throughput / latency benchmark for the three RAG pipelines
+(rag_vulnerable.py, rag_hardened.py, rag_hardened_v2.py) that needs no
+live Ollama or HuggingFace endpoint.
+
+High-level flow
+---------------
+1. **Synthetic collection** – build a ChromaDB collection of `--chunks`
+   deterministic OmniTech-style chunks (seeded, so every run indexes the
+   same text).
+2. **Stand-in LLM** – start tools/llm_stub_server.py on a free port with
+   the requested time-to-first-token and token rate, and point each
+   pipeline's generate() at it.
+3. **Run** – send a fixed question set through every pipeline (after a few
+   warmup queries) and time each stage with common/pipeline_metrics.py.
+4. **Report** – queries/sec, p50/p95/p99 per stage, and memory (RSS delta
+   and optional Python heap peak); optionally compare against a saved
+   baseline and exit non-zero on a regression.
+
+Usage
+-----
+python bench/bench_rag_pipeline.py [--chunks 500] [--repeat 3]
+       [--llm-ttft-ms 150] [--llm-tokens-per-sec 40]
+       [--pipelines vulnerable,hardened,hardened_v2] [--source lab|solution]
+       [--json results.json] [--baseline previous.json --tolerance 10]
+
+`--source solution` loads the completed lab files from extra/ instead of
+the (possibly unfinished) lab skeletons in rag/.
+"""
+
+# ───────────────────── standard-library imports ────────────────────
+import argparse
+import contextlib
+import importlib.machinery
+import importlib.util
+import io
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List
+import logging
+
+# ── Resolve shared helpers from the repo root ───────────────────────
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "tools"))
+from common.embedding_cache import QueryEmbeddingCache
+from common.pipeline_metrics import PipelineMetrics
+from llm_stub_server import StubSettings, serve_in_thread
+
+# ───────────────────── 3rd-party imports ───────────────────────────
+try:
+    from chromadb import PersistentClient
+    from chromadb.config import Settings, DEFAULT_TENANT, DEFAULT_DATABASE
+except ImportError:
+    print("ERROR: chromadb not installed. Install with: pip install chromadb")
+    sys.exit(1)
+
+logger = logging.getLogger("bench-rag")
+
+# ╔════════════════════════════════════════════════════════════════╗
+# 1.  Configuration / constants                                    ║
+# ╚════════════════════════════════════════════════════════════════╝
+
+# name -> (lab file, completed solution file, class name)
+PIPELINES = {
+    "vulnerable": ("rag/rag_vulnerable.py", "rag/rag_vulnerable.py", "RAGSystem"),
+    "hardened": ("rag/rag_hardened.py", "extra/rag_hardened_complete.txt", "HardenedRAGSystem"),
+    "hardened_v2": ("rag/rag_hardened_v2.py", "extra/rag_hardened_v2_complete.txt",
+                    "HardenedRAGSystemV2"),
+}
+
+COLLECTION_NAME = "pdf_documents"
+
+SOURCES = [
+    "OmniTech_Returns_Policy_2024.pdf",
+    "OmniTech_Global_Shipping_Logistics.pdf",
+    "OmniTech_Account_Security_Handbook.pdf",
+    "OmniTech_Device_Troubleshooting_Manual.pdf",
+]
+
+QUESTIONS = [
+    "How do I reset my password?",
+    "How do I get a refund?",
+    "What is the return policy?",
+    "How long does international shipping take?",
+    "My device will not turn on, what should I try?",
+    "Can I return an opened item?",
+    "How do I enable two-factor authentication?",
+    "What carriers does OmniTech ship with?",
+]
+
+TOPIC_SENTENCES = {
+    "returns": [
+        "Items may be returned within {n} days of delivery for a full refund.",
+        "Refunds are issued to the original payment method within {n} business days.",
+        "Opened electronics are subject to a {n} percent restocking fee.",
+        "Return shipping labels can be printed from the Orders page.",
+    ],
+    "shipping": [
+        "Standard shipping arrives in {n} to {m} business days.",
+        "International orders clear customs in approximately {n} days.",
+        "Express shipping is available in {n} countries.",
+        "Tracking numbers are emailed once the order leaves the warehouse.",
+    ],
+    "security": [
+        "To reset your password, open Settings and choose Security.",
+        "Two-factor authentication codes expire after {n} seconds.",
+        "Accounts are locked after {n} failed sign-in attempts.",
+        "OmniTech will never ask for your password by email or phone.",
+    ],
+    "devices": [
+        "Hold the power button for {n} seconds to force a restart.",
+        "If the battery indicator blinks {n} times, connect the charger.",
+        "Firmware updates install automatically overnight.",
+        "A factory reset erases all data stored on the device.",
+    ],
+}
+
+
+# ╔════════════════════════════════════════════════════════════════╗
+# 2.  Synthetic collection                                         ║
+# ╚════════════════════════════════════════════════════════════════╝
+
+def synthetic_chunks(count: int, seed: int = 42) -> List[Dict[str, Any]]:
+    """Deterministic OmniTech-style chunks spread across the trusted sources."""
+    rng = random.Random(seed)
+    topics = list(TOPIC_SENTENCES)
+    chunks = []
+    for i in range(count):
+        topic = topics[i % len(topics)]
+        sentences = [
+            rng.choice(TOPIC_SENTENCES[topic]).format(n=rng.randint(2, 60), m=rng.randint(61, 90))
+            for _ in range(rng.randint(4, 9))
+        ]
+        chunks.append({
+            "id": f"bench_chunk_{i}",
+            "text": " ".join(sentences),
+            "metadata": {
+                "source": SOURCES[i % len(SOURCES)],
+                "page": i // len(SOURCES) + 1,
+                "type": "text",
+                "chunk_index": i,
+            },
+        })
+    return chunks
+
+
+def build_collection(db_path: Path, count: int, seed: int, batch_size: int = 256) -> float:
+    """
+    (Re)create the synthetic collection; returns indexing time in seconds.
+    Anything already at `db_path` is deleted (main() only allows that with --overwrite).
+    """
+    if db_path.exists():
+        shutil.rmtree(db_path)
+    db_path.mkdir(parents=True)
+
+    client = PersistentClient(path=str(db_path), settings=Settings(),
+                              tenant=DEFAULT_TENANT, database=DEFAULT_DATABASE)
+    coll = client.get_or_create_collection(COLLECTION_NAME)
+
+    t0 = time.perf_counter()
+    chunks = synthetic_chunks(count, seed)
+    for i in range(0, len(chunks), batch_size):
+        batch = chunks[i:i + batch_size]
+        coll.add(
+            ids=[c["id"] for c in batch],
+            documents=[c["text"] for c in batch],
+            metadatas=[c["metadata"] for c in batch],
+        )
+    return time.perf_counter() - t0
+
+
+# ╔════════════════════════════════════════════════════════════════╗
+# 3.  Loading and instrumenting pipelines                          ║
+# ╚════════════════════════════════════════════════════════════════╝
+
+def load_module(name: str, source: str):
+    """Import a pipeline module from rag/ (lab) or extra/ (solution)."""
+    lab_file, solution_file, _ = PIPELINES[name]
+    path = ROOT / (lab_file if source == "lab" else solution_file)
+    loader = importlib.machinery.SourceFileLoader(f"bench_{name}", str(path))
+    spec = importlib.util.spec_from_loader(loader.name, loader)
+    module = importlib.util.module_from_spec(spec)
+    loader.exec_module(module)
+    return module
+
+
+def point_at_stub(module, base_url: str) -> None:
+    """Redirect the module's generate() to the stand-in LLM."""
+    if hasattr(module, "OLLAMA_API_URL"):
+        module.OLLAMA_API_URL = f"{base_url}/api/generate"
+    if hasattr(module, "HF_CLIENT"):
+        from huggingface_hub import InferenceClient
+        module.HF_CLIENT = InferenceClient(base_url=base_url, token="stub")
+
+
+class StageInstrumenter:
+    """Times the stage methods of pipelines that have no built-in metrics."""
+
+    STAGES = [
+        (None, "retrieve"),
+        ("security_guard", "filter_chunks"),
+        (None, "build_prompt"),
+        (None, "generate"),
+        ("security_guard", "scan_output"),
+    ]
+
+    def __init__(self, rag, metrics: PipelineMetrics):
+        self.metrics = metrics
+        self._local = threading.local()
+        for owner_attr, method in self.STAGES:
+            owner = getattr(rag, owner_attr, None) if owner_attr else rag
+            if owner is None or not hasattr(owner, method):
+                continue
+            setattr(owner, method, self._wrap(getattr(owner, method), method))
+
+    def _wrap(self, fn, stage: str):
+        def timed(*args, **kwargs):
+            trace = getattr(self._local, "trace", None)
+            if trace is None:
+                return fn(*args, **kwargs)
+            with trace.stage(stage):
+                return fn(*args, **kwargs)
+        return timed
+
+    def run(self, rag, question: str) -> None:
+        trace = self.metrics.start_query()
+        self._local.trace = trace
+        try:
+            result = rag.query(question)
+            trace.count("chunks_used", len(result.get("context_used", [])))
+        finally:
+            self._local.trace = None
+            self.metrics.record(trace)
+
+
+class _ThreadQuietStdout(io.TextIOBase):
+    """
+    sys.stdout stand-in that drops what threads inside silenced() print and
+    passes everything else through. contextlib.redirect_stdout swaps the
+    process-wide sys.stdout, so concurrent workers would restore each
+    other's streams; this decides per thread instead.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        if getattr(self.local, "quiet", False):
+            return len(text)
+        return self.stream.write(text)
+
+    def flush(self) -> None:
+        self.stream.flush()
+
+
+_STDOUT_LOCK = threading.Lock()
+
+
+@contextlib.contextmanager
+def silenced():
+    """Discard what the current thread prints (other threads are unaffected)."""
+    with _STDOUT_LOCK:
+        if not isinstance(sys.stdout, _ThreadQuietStdout):
+            sys.stdout = _ThreadQuietStdout(sys.stdout)
+        stdout = sys.stdout
+    previous = getattr(stdout.local, "quiet", False)
+    stdout.local.quiet = True
+    try:
+        yield
+    finally:
+        stdout.local.quiet = previous
+
+
+def rss_mb() -> float:
+    """Current resident set size in MB (Linux /proc; 0 elsewhere)."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+    except (OSError, ValueError):
+        return 0.0
+
+
+def peak_rss_mb() -> float:
+    """Process-wide peak RSS in MB."""
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    except ImportError:
+        return 0.0
+
+
+# ╔════════════════════════════════════════════════════════════════╗
+# 4.  Benchmark driver                                             ║
+# ╚════════════════════════════════════════════════════════════════╝
+
+def bench_pipeline(name: str, args, db_path: Path, base_url: str) -> Dict[str, Any]:
+    """Run the question set through one pipeline and summarize."""
+    try:
+        module = load_module(name, args.source)
+    except SyntaxError as e:
+        return {"skipped": f"{PIPELINES[name][0]} does not compile ({e.msg}, line {e.lineno}); "
+                           f"finish the lab or use --source solution"}
+    point_at_stub(module, base_url)
+    logging.getLogger().setLevel(logging.WARNING)
+
+    rss_before = rss_mb()
+    if args.trace_alloc:
+        tracemalloc.start()
+
+    cls = getattr(module, PIPELINES[name][2])
+    # A private query cache per pipeline so earlier pipelines cannot warm it for later ones
+    query_cache = QueryEmbeddingCache()
+    with silenced():
+        rag = cls(chroma_path=str(db_path), collection_name=COLLECTION_NAME,
+                  query_cache=query_cache)
+
+    # HardenedRAGSystemV2 times its own stages; the others get wrapped
+    builtin = isinstance(getattr(rag, "metrics", None), PipelineMetrics)
+    metrics = rag.metrics if builtin else PipelineMetrics()
+    instrumenter = None if builtin else StageInstrumenter(rag, metrics)
+
+    def ask(question: str) -> None:
+        if args.no_query_cache:
+            query_cache.clear()
+        with silenced():
+            if instrumenter:
+                instrumenter.run(rag, question)
+            else:
+                rag.query(question)
+
+    for q in QUESTIONS[:args.warmup]:
+        ask(q)
+    metrics.reset()     # Drop warmup samples
+    query_cache.hits = query_cache.misses = 0
+
+    workload = QUESTIONS * args.repeat
+    t0 = time.perf_counter()
+    if args.concurrency > 1:
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            list(pool.map(ask, workload))
+    else:
+        for q in workload:
+            ask(q)
+    elapsed = time.perf_counter() - t0
+
+    heap_peak = None
+    if args.trace_alloc:
+        heap_peak = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+        tracemalloc.stop()
+
+    snap = metrics.snapshot()
+    return {
+        "queries": len(workload),
+        "elapsed_s": round(elapsed, 3),
+        "qps": round(len(workload) / elapsed, 3) if elapsed else 0.0,
+        "total_ms": snap["total_ms"],
+        "stages_ms": snap["stages_ms"],
+        "counts": snap["counts"],
+        "query_cache_hit_rate": round(query_cache.hit_rate, 4),
+        "rss_delta_mb": round(rss_mb() - rss_before, 1),
+        "heap_peak_mb": round(heap_peak, 1) if heap_peak is not None else None,
+    }
+
+
+def print_report(results: Dict[str, Any]) -> None:
+    cfg = results["config"]
+    print("\n" + "=" * 78)
+    print(f"RAG PIPELINE BENCHMARK  chunks={cfg['chunks']}  queries/pipeline="
+          f"{len(QUESTIONS) * cfg['repeat']}  llm={cfg['llm_ttft_ms']:.0f}ms TTFT, "
+          f"{cfg['llm_tokens_per_sec']:g} tok/s")
+    print(f"  index build: {results['index_seconds']:.2f}s   peak RSS: {results['peak_rss_mb']:.0f} MB")
+    print("=" * 78)
+    for name, r in results["pipelines"].items():
+        print(f"\n[{name}]")
+        if "skipped" in r:
+            print(f"  SKIPPED: {r['skipped']}")
+            continue
+        t = r["total_ms"]
+        print(f"  {r['qps']:.2f} queries/sec   total p50={t['p50']:.1f}ms p95={t['p95']:.1f}ms "
+              f"p99={t['p99']:.1f}ms   RSS +{r['rss_delta_mb']:.1f} MB"
+              + (f"   heap peak {r['heap_peak_mb']:.1f} MB" if r["heap_peak_mb"] is not None else ""))
+        if "query_cache_hit_rate" in r:
+            print(f"  query embedding cache hit rate: {r['query_cache_hit_rate']:.1%}")
+        print(f"    {'stage':<16}{'p50':>10}{'p95':>10}{'p99':>10}")
+        for stage, s in r["stages_ms"].items():
+            print(f"    {stage:<16}{s['p50']:>10.2f}{s['p95']:>10.2f}{s['p99']:>10.2f}")
+    print()
+
+
+def compare_baseline(results: Dict[str, Any], baseline_path: Path, tolerance: float) -> List[str]:
+    """Return a list of regressions versus a previous --json output."""
+    baseline = json.loads(baseline_path.read_text())
+    regressions = []
+    for name, cur in results["pipelines"].items():
+        old = baseline.get("pipelines", {}).get(name)
+        if not old or "skipped" in old or "skipped" in cur:
+            continue
+        if cur["qps"] < old["qps"] * (1 - tolerance / 100):
+            regressions.append(f"{name}: qps {old['qps']:.2f} -> {cur['qps']:.2f}")
+        for stage, s in cur["stages_ms"].items():
+            prev = old.get("stages_ms", {}).get(stage)
+            if prev and s["p95"] > prev["p95"] * (1 + tolerance / 100) and s["p95"] - prev["p95"] > 1.0:
+                regressions.append(f"{name}/{stage}: p95 {prev['p95']:.1f}ms -> {s['p95']:.1f}ms")
+    return regressions
+
+
+def main():
+    """Parse command-line arguments and run the benchmark."""
+    parser = argparse.ArgumentParser(
+        description="Benchmark the RAG pipelines against a synthetic collection and a stub LLM.",
+    )
+    parser.add_argument("--chunks", type=int, default=500,
+                        help="Synthetic chunks to index (default: 500)")
+    parser.add_argument("--seed", type=int, default=42, help="Seed for synthetic text (default: 42)")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help=f"Times to run the {len(QUESTIONS)}-question set (default: 3)")
+    parser.add_argument("--warmup", type=int, default=2,
+                        help="Untimed warmup queries per pipeline (default: 2)")
+    parser.add_argument("--concurrency", type=int, default=1,
+                        help="Concurrent queries per pipeline (default: 1)")
+    parser.add_argument("--pipelines", default=",".join(PIPELINES),
+                        help=f"Comma-separated subset of {', '.join(PIPELINES)}")
+    parser.add_argument("--source", choices=["lab", "solution"], default="lab",
+                        help="Load pipelines from rag/ (lab) or extra/ (solution)")
+    parser.add_argument("--llm-ttft-ms", type=float, default=150.0,
+                        help="Stub LLM time to first token (default: 150)")
+    parser.add_argument("--llm-tokens-per-sec", type=float, default=40.0,
+                        help="Stub LLM decode rate; 0 = instant (default: 40)")
+    parser.add_argument("--answer-tokens", type=int, default=60,
+                        help="Stub LLM answer length (default: 60)")
+    parser.add_argument("--db-path", type=Path,
+                        help="Directory to build the collection in and keep afterwards; must be "
+                             "new or empty unless --overwrite (default: a temp dir, removed afterwards)")
+    parser.add_argument("--overwrite", action="store_true",
+                        help="Delete and rebuild --db-path even if it already holds files")
+    parser.add_argument("--no-query-cache", action="store_true",
+                        help="Clear the query embedding cache before every query (cold retrieval)")
+    parser.add_argument("--trace-alloc", action="store_true",
+                        help="Track Python heap peak with tracemalloc (slows queries)")
+    parser.add_argument("--json", type=Path, help="Write results as JSON to this path")
+    parser.add_argument("--baseline", type=Path, help="Compare against a previous --json file")
+    parser.add_argument("--tolerance", type=float, default=10.0,
+                        help="Allowed regression vs baseline in percent (default: 10)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    logger.setLevel(logging.INFO)     # The pipelines' own INFO logging is silenced while timing
+
+    names = [n.strip() for n in args.pipelines.split(",") if n.strip()]
+    unknown = [n for n in names if n not in PIPELINES]
+    if unknown:
+        parser.error(f"unknown pipeline(s): {', '.join(unknown)}")
+
+    # build_collection() wipes the directory: never a real index by accident
+    if args.db_path and args.db_path.exists() and not args.overwrite:
+        if not args.db_path.is_dir() or any(args.db_path.iterdir()):
+            parser.error(f"--db-path {args.db_path} already exists and is not empty; "
+                         f"pass --overwrite to delete and rebuild it")
+
+    workdir = Path(tempfile.mkdtemp(prefix="bench_rag_"))
+    db_path = (args.db_path or workdir / "chroma_bench_db").resolve()
+    cwd = os.getcwd()
+
+    settings = StubSettings(ttft_ms=args.llm_ttft_ms, tokens_per_sec=args.llm_tokens_per_sec,
+                            answer_tokens=args.answer_tokens)
+    server, base_url = serve_in_thread(settings=settings)
+    try:
+        # Run inside the work dir so relative paths (e.g. integrity_manifest.json) stay local
+        os.chdir(workdir)
+        logger.info(f"Building synthetic collection ({args.chunks} chunks) at {db_path}")
+        index_seconds = build_collection(db_path, args.chunks, args.seed)
+
+        results = {
+            "config": {
+                "chunks": args.chunks, "seed": args.seed, "repeat": args.repeat,
+                "concurrency": args.concurrency, "source": args.source,
+                "llm_ttft_ms": args.llm_ttft_ms,
+                "llm_tokens_per_sec": args.llm_tokens_per_sec,
+                "answer_tokens": args.answer_tokens,
+            },
+            "index_seconds": round(index_seconds, 3),
+            "pipelines": {},
+        }
+        for name in names:
+            logger.info(f"Benchmarking {name} ...")
+            results["pipelines"][name] = bench_pipeline(name, args, db_path, base_url)
+        results["peak_rss_mb"] = round(peak_rss_mb(), 1)
+    finally:
+        os.chdir(cwd)
+        server.shutdown()
+        # With --db-path the database lives elsewhere and is kept; the
+        # work dir only holds files the pipelines wrote
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print_report(results)
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+        logger.info(f"Results written to {args.json}")
+
+    if args.baseline:
+        regressions = compare_baseline(results, args.baseline, args.tolerance)
+        if regressions:
+            print("REGRESSIONS vs baseline:")
+            for r in regressions:
+                print(f"  - {r}")
+            sys.exit(1)
+        print(f"No regressions vs {args.baseline} (tolerance {args.tolerance:g}%)")
+
+
+if __name__ == "__main__":
+    main()
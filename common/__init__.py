@@ -0,0 +1,7 @@
+"""
+common
+────────────────────────────────────────────────────────────────────
+Shared helpers used by the RAG labs (rag/) and the indexing/search
+tools (tools/). Scripts add the repo root to sys.path before importing
+from here, the same way scripts/warmup.py does.
+"""
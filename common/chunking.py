@@ -0,0 +1,129 @@
+"""
+chunking.py
+────────────────────────────────────────────────────────────────────
+Sentence-aware, overlapping text chunking shared by tools/index_pdfs.py
+and tools/create_db.py.
+
+Chunks are produced as (start, end) character offsets into the original
+string instead of by concatenating sentence strings, so:
+
+  - each sentence boundary is found once with a single regex scan, and
+    each chunk is sliced from the page exactly once – total work is
+    linear in the length of the text plus the size of the chunks;
+  - the offsets can be stored in chunk metadata, pointing back into the
+    page text the chunk came from;
+  - spans are yielded lazily, so a caller can stream them.
+
+Sentences are split on ., ! or ? followed by whitespace. A "sentence"
+longer than chunk_size (e.g. a page with no punctuation) is cut at the
+last whitespace before the limit, and the overlap is shortened where
+needed, so no chunk is longer than chunk_size characters.
+
+bench/bench_chunking.py compares this against the previous
+string-concatenation chunker on large documents.
+"""
+
+import re
+from typing import Iterator, List, Optional, Tuple
+
+# Sentence boundary: ., ! or ? followed by whitespace
+_SENTENCE_BREAK = re.compile(r'[.!?]\s+')
+
+Span = Tuple[int, int]
+
+
+def _strip_span(text: str, start: int, end: int) -> Span:
+    """Move start/end inwards past whitespace."""
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+
+def _split_long(text: str, start: int, end: int, max_len: Optional[int]) -> Iterator[Span]:
+    """Yield (start, end) of one sentence, cut at whitespace into pieces of at most max_len."""
+    start, end = _strip_span(text, start, end)
+    while max_len and end - start > max_len:
+        limit = start + max_len
+        cut = max(text.rfind(" ", start, limit + 1), text.rfind("\n", start, limit + 1))
+        if cut <= start:
+            cut = limit                         # No whitespace: hard cut
+        piece = _strip_span(text, start, cut)
+        if piece[0] < piece[1]:
+            yield piece
+        start, end = _strip_span(text, cut, end)
+    if start < end:
+        yield start, end
+
+
+def sentence_spans(text: str, max_len: Optional[int] = None) -> Iterator[Span]:
+    """
+    Yield (start, end) offsets of the sentences in `text`, whitespace-trimmed.
+
+    Parameters
+    ----------
+    text : str
+        Text to split.
+    max_len : Optional[int]
+        Sentences longer than this are cut at whitespace (default: no limit).
+    """
+    start, stop = _strip_span(text, 0, len(text))
+    for match in _SENTENCE_BREAK.finditer(text, start, stop):
+        end = match.start() + 1                 # Keep the punctuation
+        if max_len and end - start > max_len:
+            yield from _split_long(text, start, end, max_len)
+        else:
+            yield start, end
+        start = match.end()
+    if start < stop:
+        yield from _split_long(text, start, stop, max_len)
+
+
+def chunk_spans(text: str, chunk_size: int = 800, overlap: int = 200) -> Iterator[Span]:
+    """
+    Yield (start, end) offsets of overlapping chunks that end on sentence boundaries.
+
+    Sentences are added to the current chunk until the next one would make
+    it longer than `chunk_size`; the following chunk then starts `overlap`
+    characters before the end of the previous one, so context isn't lost
+    at chunk boundaries. The overlap is shortened when it would make the
+    new chunk longer than `chunk_size`.
+
+    Parameters
+    ----------
+    text : str
+        The text to chunk.
+    chunk_size : int
+        Target size of each chunk in characters.
+    overlap : int
+        Number of characters to overlap between chunks (less than chunk_size).
+
+    Yields
+    ------
+    Tuple[int, int]
+        Chunk offsets; the chunk is text[start:end].
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1")
+    if not 0 <= overlap < chunk_size:
+        raise ValueError("overlap must be at least 0 and less than chunk_size")
+
+    start = end = -1
+    for sent_start, sent_end in sentence_spans(text, chunk_size):
+        if start < 0:
+            start = sent_start
+        elif sent_end - start > chunk_size:
+            yield start, end
+            # Next chunk begins with the tail of this one, as far as
+            # chunk_size allows
+            start = max(start, end - overlap, sent_end - chunk_size)
+            start = _strip_span(text, start, sent_start)[0]
+        end = sent_end
+    if start >= 0:
+        yield start, end
+
+
+def chunk_text(text: str, chunk_size: int = 800, overlap: int = 200) -> List[str]:
+    """Chunk strings for `text`; see chunk_spans()."""
+    return [text[start:end] for start, end in chunk_spans(text, chunk_size, overlap)]
@@ -0,0 +1,296 @@
+"""
+dedup.py
+────────────────────────────────────────────────────────────────────
+Near-duplicate chunk suppression for the indexers.
+
+Headers, footers, legal notices and repeated sections (in PDFs), and
+licence headers or copied boilerplate (in code) produce many chunks that
+are almost identical. Each one used to be embedded, stored, and compete
+for retrieval slots with the others.
+
+NearDuplicateFilter keeps one chunk per group of near-duplicates:
+  - each chunk is reduced to a MinHash signature over word shingles
+    (`shingle_size` consecutive words), whose agreement rate estimates
+    the Jaccard similarity of two chunks' shingle sets
+  - LSH banding finds candidate matches without comparing against every
+    stored chunk; a candidate counts when its estimated similarity is at
+    least `threshold`
+  - the first chunk of a group is stored as usual; later ones are skipped
+    and recorded as occurrences of it, and record_occurrences() writes
+    those into the stored chunk's metadata (`duplicate_count` and a JSON
+    `occurrences` list) once indexing is done
+  - before an incremental update deletes a source's chunks,
+    release_sources() takes it out of those records and names the other
+    sources whose duplicates it stood for, so they can be indexed again
+
+Signatures are kept for the stored chunks only (num_perm × 4 bytes each).
+"""
+
+import json
+import re
+import zlib
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+DEFAULT_THRESHOLD = 0.9
+DEFAULT_NUM_PERM = 64
+DEFAULT_SHINGLE_SIZE = 5
+
+# Occurrences written into a chunk's metadata (duplicate_count stays exact)
+MAX_STORED_OCCURRENCES = 100
+
+# Chroma rows read/updated per call in record_occurrences() and release_sources()
+_UPDATE_BATCH = 500
+
+# Largest prime below 2**32: hash values and signatures fit in uint32, and
+# a*x + b stays below 2**64 for a, b, x < 2**32
+_PRIME = np.uint64(4294967291)
+_WORD = re.compile(r"\w+")
+
+
+def _lsh_bands(threshold: float, num_perm: int) -> Tuple[int, int]:
+    """
+    (bands, rows) with bands * rows == num_perm for the LSH index.
+
+    Two chunks become candidates with probability 1 - (1 - s**rows)**bands
+    at similarity s, which rises steeply around (1/bands)**(1/rows); the
+    largest such point at or below `threshold` keeps recall high while
+    limiting candidates that fail the exact check.
+    """
+    options = [(b, num_perm // b) for b in range(1, num_perm + 1) if num_perm % b == 0]
+    below = [o for o in options if (1 / o[0]) ** (1 / o[1]) <= threshold]
+    if not below:
+        return options[-1]                              # One row per band
+    return max(below, key=lambda o: (1 / o[0]) ** (1 / o[1]))
+
+
+class NearDuplicateFilter:
+    """MinHash/LSH near-duplicate detector over chunk texts."""
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD,
+                 num_perm: int = DEFAULT_NUM_PERM,
+                 shingle_size: int = DEFAULT_SHINGLE_SIZE, seed: int = 1):
+        if not 0.0 < threshold <= 1.0:
+            raise ValueError("threshold must be in (0, 1]")
+        if num_perm < 1 or shingle_size < 1:
+            raise ValueError("num_perm and shingle_size must be at least 1")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.bands, self.rows = _lsh_bands(threshold, num_perm)
+
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, int(_PRIME), size=num_perm, dtype=np.uint64)[:, None]
+        self._b = rng.integers(0, int(_PRIME), size=num_perm, dtype=np.uint64)[:, None]
+
+        self._keys: List[Optional[str]] = []            # Stored chunk keys (None: forgotten)
+        self._index_of: Dict[str, int] = {}
+        self._signatures: List[Optional[np.ndarray]] = []
+        self._buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(self.bands)]
+
+        # Stored chunk key -> occurrences of its near-duplicates (and their size)
+        self.occurrences: Dict[str, List[Dict[str, Any]]] = {}
+        self._chars: Dict[str, int] = {}
+        self.seen = 0
+        self.duplicates = 0
+        self.forgotten = 0      # Let through by check(), then not stored (see forget())
+        self.chars_saved = 0
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        """MinHash signature of the text's word shingles (None if it has no words)."""
+        words = _WORD.findall(text.lower())
+        if not words:
+            return None
+        k = min(self.shingle_size, len(words))
+        shingles = {" ".join(words[i:i + k]) for i in range(len(words) - k + 1)}
+        hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles),
+                             dtype=np.uint64, count=len(shingles)) % _PRIME
+        return ((self._a * hashes[None, :] + self._b) % _PRIME).min(axis=1).astype(np.uint32)
+
+    def check(self, key: str, text: str,
+              occurrence: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """
+        Key of the stored chunk `text` duplicates, or None if it should be stored.
+
+        Parameters
+        ----------
+        key : str
+            ID the chunk would be stored under.
+        text : str
+            Chunk text.
+        occurrence : Optional[Dict[str, Any]]
+            Where this chunk came from (e.g. source and page); recorded on
+            the stored chunk if this one is a duplicate (default: {"id": key}).
+
+        Returns
+        -------
+        Optional[str]
+            The stored chunk's key for a duplicate; None for a new chunk,
+            which is registered under `key`.
+        """
+        self.seen += 1
+        signature = self.signature(text)
+        if signature is None:
+            return None
+
+        bands = [signature[i * self.rows:(i + 1) * self.rows].tobytes()
+                 for i in range(self.bands)]
+        checked = set()
+        for bucket, band in zip(self._buckets, bands):
+            for index in bucket.get(band, ()):
+                if index in checked or self._keys[index] is None:
+                    continue
+                checked.add(index)
+                if np.mean(self._signatures[index] == signature) >= self.threshold:
+                    original = self._keys[index]
+                    self.occurrences.setdefault(original, []).append(occurrence or {"id": key})
+                    self._chars[original] = self._chars.get(original, 0) + len(text)
+                    self.duplicates += 1
+                    self.chars_saved += len(text)
+                    return original
+
+        index = len(self._keys)
+        self._keys.append(key)
+        self._index_of[key] = index
+        self._signatures.append(signature)
+        for bucket, band in zip(self._buckets, bands):
+            bucket.setdefault(band, []).append(index)
+        return None
+
+    def forget(self, keys: List[str]) -> int:
+        """
+        Unregister chunks that check() let through but that could not be
+        stored (e.g. the add failed), so later duplicates are not skipped
+        in favour of a chunk that is not in the collection.
+
+        Returns
+        -------
+        int
+            Duplicates that had been recorded against those chunks; they
+            are no longer counted as duplicates and were not stored either.
+        """
+        dropped = 0
+        for key in keys:
+            index = self._index_of.pop(key, None)
+            if index is None:
+                continue
+            self._keys[index] = None
+            self._signatures[index] = None
+            found = self.occurrences.pop(key, [])
+            dropped += len(found)
+            self.forgotten += 1 + len(found)
+            self.duplicates -= len(found)
+            self.chars_saved -= self._chars.pop(key, 0)
+        return dropped
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "seen": self.seen,
+            "stored": self.seen - self.duplicates - self.forgotten,
+            "duplicates": self.duplicates,
+            "forgotten": self.forgotten,
+            "groups": len(self.occurrences),
+            "chars_saved": self.chars_saved,
+            "saved_rate": self.duplicates / self.seen if self.seen else 0.0,
+            "threshold": self.threshold,
+        }
+
+    def format_stats(self) -> str:
+        s = self.stats()
+        return (f"{s['duplicates']} of {s['seen']} chunks were near-duplicates of "
+                f"{s['groups']} stored chunks ({s['saved_rate']:.1%} not embedded, "
+                f"{s['chars_saved']:,} chars; threshold {s['threshold']:g})")
+
+
+def record_occurrences(collection: Any, dedup: NearDuplicateFilter) -> int:
+    """
+    Write `duplicate_count` and `occurrences` (JSON) into the metadata of
+    every stored chunk that had near-duplicates; returns the number updated.
+    """
+    keys = list(dedup.occurrences)
+    for start in range(0, len(keys), _UPDATE_BATCH):
+        ids = keys[start:start + _UPDATE_BATCH]
+        stored = collection.get(ids=ids, include=["metadatas"])
+        metadatas = []
+        for key, metadata in zip(stored["ids"], stored["metadatas"]):
+            found = dedup.occurrences[key]
+            metadata = dict(metadata or {})
+            metadata["duplicate_count"] = len(found)
+            metadata["occurrences"] = json.dumps(found[:MAX_STORED_OCCURRENCES])
+            metadatas.append(metadata)
+        if metadatas:
+            collection.update(ids=stored["ids"], metadatas=metadatas)
+    return len(keys)
+
+
+def release_sources(collection: Any, field: str, sources: Set[str]) -> Tuple[Set[str], bool]:
+    """
+    Detach `sources` from the near-duplicate records before their chunks
+    are deleted (e.g. when a file changes or is removed).
+
+    Stored chunks of other sources drop their occurrences in `sources`
+    (and `duplicate_count` goes down accordingly). The chunks of `sources`
+    themselves may stand for near-duplicates elsewhere that were never
+    stored; those other sources are returned, as they must be indexed
+    again once the chunks are gone.
+
+    Parameters
+    ----------
+    collection : Any
+        Chroma collection written with record_occurrences().
+    field : str
+        Metadata field naming a chunk's source ("file_path", "source").
+    sources : Set[str]
+        Values of `field` whose chunks are about to be deleted.
+
+    Returns
+    -------
+    Tuple[Set[str], bool]
+        Other sources to index again, and whether that set is complete
+        (False if an occurrence list was cut at MAX_STORED_OCCURRENCES).
+    """
+    rows = collection.get(where={"duplicate_count": {"$gt": 0}}, include=["metadatas"])
+    dependents: Set[str] = set()
+    complete = True
+    ids, metadatas = [], []
+    for chunk_id, metadata in zip(rows["ids"], rows["metadatas"]):
+        found = json.loads(metadata.get("occurrences") or "[]")
+        if metadata.get(field) in sources:
+            dependents.update(o[field] for o in found if o.get(field) not in (None, *sources))
+            complete = complete and metadata["duplicate_count"] <= len(found)
+            continue
+        kept = [o for o in found if o.get(field) not in sources]
+        if len(kept) < len(found):
+            metadata = dict(metadata)
+            metadata["duplicate_count"] = max(0, metadata["duplicate_count"] - (len(found) - len(kept)))
+            metadata["occurrences"] = json.dumps(kept)
+            ids.append(chunk_id)
+            metadatas.append(metadata)
+    for start in range(0, len(ids), _UPDATE_BATCH):
+        collection.update(ids=ids[start:start + _UPDATE_BATCH],
+                          metadatas=metadatas[start:start + _UPDATE_BATCH])
+    return dependents, complete
+
+
+def add_dedup_arguments(parser) -> None:
+    """Register the --dedup-* flags shared by the indexing CLIs."""
+    group = parser.add_argument_group("near-duplicate suppression")
+    group.add_argument("--no-dedup", action="store_true",
+                       help="Store every chunk, including near-duplicates")
+    group.add_argument("--dedup-threshold", type=float, default=DEFAULT_THRESHOLD,
+                       help=f"Estimated Jaccard similarity at which a chunk counts as a "
+                            f"duplicate (default: {DEFAULT_THRESHOLD})")
+    group.add_argument("--dedup-shingle", type=int, default=DEFAULT_SHINGLE_SIZE,
+                       help=f"Words per shingle (default: {DEFAULT_SHINGLE_SIZE})")
+
+
+def dedup_from_args(args) -> Optional[NearDuplicateFilter]:
+    """NearDuplicateFilter from the --dedup-* flags, or None with --no-dedup."""
+    if args.no_dedup:
+        return None
+    if not 0.0 < args.dedup_threshold <= 1.0:
+        raise ValueError("--dedup-threshold must be greater than 0 and at most 1")
+    if args.dedup_shingle < 1:
+        raise ValueError("--dedup-shingle must be at least 1")
+    return NearDuplicateFilter(threshold=args.dedup_threshold, shingle_size=args.dedup_shingle)
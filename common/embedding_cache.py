@@ -0,0 +1,173 @@
+"""
+embedding_cache.py
+────────────────────────────────────────────────────────────────────
+Query-embedding LRU cache for retrieval.
+
+Chroma re-embeds the query text with the MiniLM ONNX model on every
+collection.query(query_texts=...) call, even when the same question was
+asked a moment ago by the same or another user. For short queries on CPU
+that embedding step is a sizeable share of retrieval latency.
+
+QueryEmbeddingCache embeds through the same embedding function the
+collections were built with (Chroma's default ONNX all-MiniLM-L6-v2), keeps
+the vectors in a size-bounded LRU keyed by (model id, normalized text), and
+hands them to Chroma via query_embeddings=. Hit/miss counters are kept so
+the hit rate can be reported.
+
+Normalization collapses whitespace and lowercases the text; MiniLM's
+tokenizer is uncased, so this never changes the resulting vector.
+"""
+
+import logging
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CAPACITY = 1024
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(text: str) -> str:
+    """Canonical cache form of a query: trimmed, single-spaced, lowercased."""
+    return _WHITESPACE.sub(" ", text).strip().lower()
+
+
+def default_embedding_function(runtime: Any = None) -> Callable[[List[str]], List[Any]]:
+    """
+    The model Chroma uses when a collection is created without an embedding
+    function (ONNX all-MiniLM-L6-v2), run with `runtime` (an
+    EmbeddingRuntimeConfig; default: the calibrated config), or the shared
+    embedding daemon when EMBED_SERVER_URL is set.
+
+    The daemon runs the model with its own runtime settings (pass the
+    --embed-* flags to tools/embed_server.py), so an explicit `runtime` is
+    ignored in that case, with a warning.
+    """
+    from common.remote_embeddings import RemoteEmbeddingFunction, embedding_server_url
+    url = embedding_server_url()
+    if url:
+        if runtime is not None:
+            logger.warning(f"Ignoring embedding runtime ({runtime}): EMBED_SERVER_URL is set, "
+                           f"so {url} embeds with the settings tools/embed_server.py was "
+                           f"started with")
+        return RemoteEmbeddingFunction(url)
+    from common.embeddings import TunedMiniLM
+    return TunedMiniLM(runtime)
+
+
+def embedding_model_id(embedding_function: Any) -> str:
+    """Stable identifier for an embedding function's model (part of the cache key)."""
+    return getattr(embedding_function, "MODEL_NAME", None) or type(embedding_function).__name__
+
+
+class QueryEmbeddingCache:
+    """Thread-safe LRU of query vectors keyed by (model id, normalized text)."""
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY,
+                 embedding_function: Optional[Callable[[List[str]], List[Any]]] = None,
+                 model_id: Optional[str] = None):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self._embedding_function = embedding_function
+        self._model_id = model_id
+        self._entries: "OrderedDict[Tuple[str, str], Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # ── embedding function (loaded lazily so importing stays cheap) ─
+
+    @property
+    def embedding_function(self) -> Callable[[List[str]], List[Any]]:
+        if self._embedding_function is None:
+            self._embedding_function = default_embedding_function()
+        return self._embedding_function
+
+    @property
+    def model_id(self) -> str:
+        if self._model_id is None:
+            self._model_id = embedding_model_id(self.embedding_function)
+        return self._model_id
+
+    # ── lookups ────────────────────────────────────────────────────
+
+    def embed(self, texts: Sequence[str]) -> List[Any]:
+        """Return one vector per text, embedding only the cache misses (in one batch)."""
+        keys = [(self.model_id, normalize_query(t)) for t in texts]
+        vectors: List[Any] = [None] * len(keys)
+        missing: Dict[Tuple[str, str], List[int]] = {}
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    vectors[i] = self._entries[key]
+                    self.hits += 1
+                else:
+                    missing.setdefault(key, []).append(i)
+                    self.misses += 1
+
+        if missing:
+            # Embed outside the lock so concurrent hits are never blocked by the model
+            fresh = self.embedding_function([key[1] for key in missing])
+            with self._lock:
+                for (key, positions), vector in zip(missing.items(), fresh):
+                    for i in positions:
+                        vectors[i] = vector
+                    self._entries[key] = vector
+                    self._entries.move_to_end(key)
+                while len(self._entries) > self.capacity:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return vectors
+
+    def embed_query(self, text: str) -> Any:
+        """Vector for a single query string."""
+        return self.embed([text])[0]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    # ── reporting ──────────────────────────────────────────────────
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "model": self._model_id,
+                "size": len(self._entries),
+                "capacity": self.capacity,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hit_rate, 4),
+            }
+
+    def format_stats(self) -> str:
+        s = self.stats()
+        return (f"Query embedding cache: {s['hits']} hits / {s['hits'] + s['misses']} lookups "
+                f"({s['hit_rate']:.1%} hit rate), {s['size']}/{s['capacity']} entries")
+
+
+_shared_cache: Optional[QueryEmbeddingCache] = None
+_shared_lock = threading.Lock()
+
+
+def get_query_cache(capacity: int = DEFAULT_CAPACITY) -> QueryEmbeddingCache:
+    """Process-wide cache shared by every pipeline instance using the default model."""
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = QueryEmbeddingCache(capacity=capacity)
+        return _shared_cache
@@ -0,0 +1,204 @@
+"""
+embedding_store.py
+────────────────────────────────────────────────────────────────────
+On-disk, content-addressed embedding cache for the indexers.
+
+index_pdfs.py and index_code.py rebuild their Chroma collection from
+scratch on every run, and used to let Chroma re-embed every chunk even
+though almost all chunk texts are byte-identical to the previous run.
+
+EmbeddingDiskCache stores vectors in a single SQLite file keyed by
+(embedding model id, SHA-256 of the chunk text):
+  - lookups and writes are batched (one IN query / one transaction per batch)
+  - only the misses are sent to the embedding model, in a single call
+  - the indexers pass the vectors to coll.add(embeddings=...)
+  - entries unused for `max_age_days` are dropped, and the least recently
+    used entries go first once `max_entries` is exceeded (see prune())
+
+The cache file lives outside the Chroma directory, so the indexers'
+reset_chroma() does not wipe it.
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+from common.embedding_cache import default_embedding_function, embedding_model_id
+
+DEFAULT_CACHE_PATH = Path("./.embedding_cache.sqlite3")
+DEFAULT_MAX_AGE_DAYS = 30.0
+DEFAULT_MAX_ENTRIES = 200_000
+
+# Stay well below SQLite's host-parameter limit (999 on older builds)
+_SQL_BATCH = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    model     TEXT NOT NULL,
+    digest    BLOB NOT NULL,
+    dim       INTEGER NOT NULL,
+    vector    BLOB NOT NULL,
+    created   REAL NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (model, digest)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used);
+"""
+
+
+def text_digest(text: str) -> bytes:
+    """SHA-256 of the chunk text exactly as it is sent to the embedding model."""
+    return hashlib.sha256(text.encode("utf-8", errors="surrogatepass")).digest()
+
+
+class EmbeddingDiskCache:
+    """SQLite-backed cache of chunk embeddings keyed by (model id, SHA-256 of text)."""
+
+    def __init__(self, path: Union[str, Path] = DEFAULT_CACHE_PATH,
+                 embedding_function: Optional[Callable[[List[str]], List[Any]]] = None,
+                 model_id: Optional[str] = None,
+                 max_age_days: Optional[float] = DEFAULT_MAX_AGE_DAYS,
+                 max_entries: Optional[int] = DEFAULT_MAX_ENTRIES):
+        self.path = Path(path)
+        self.max_age_days = max_age_days
+        self.max_entries = max_entries
+        self._embedding_function = embedding_function
+        self._model_id = model_id
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    # ── embedding function (loaded lazily: a fully cached run never loads it) ─
+
+    @property
+    def embedding_function(self) -> Callable[[List[str]], List[Any]]:
+        if self._embedding_function is None:
+            self._embedding_function = default_embedding_function()
+        return self._embedding_function
+
+    @property
+    def model_id(self) -> str:
+        if self._model_id is None:
+            self._model_id = embedding_model_id(self.embedding_function)
+        return self._model_id
+
+    # ── batched lookup / store ─────────────────────────────────────
+
+    def _lookup(self, digests: List[bytes]) -> Dict[bytes, np.ndarray]:
+        found: Dict[bytes, np.ndarray] = {}
+        now = time.time()
+        for i in range(0, len(digests), _SQL_BATCH):
+            part = digests[i:i + _SQL_BATCH]
+            marks = ",".join("?" * len(part))
+            rows = self._conn.execute(
+                f"SELECT digest, vector FROM embeddings WHERE model = ? AND digest IN ({marks})",
+                [self.model_id, *part],
+            ).fetchall()
+            for digest, blob in rows:
+                found[bytes(digest)] = np.frombuffer(blob, dtype=np.float32)
+            if rows:
+                self._conn.execute(
+                    f"UPDATE embeddings SET last_used = ? WHERE model = ? AND digest IN ({marks})",
+                    [now, self.model_id, *part],
+                )
+        return found
+
+    def embed(self, texts: Sequence[str]) -> List[np.ndarray]:
+        """Return one float32 vector per text, embedding only texts not seen before."""
+        if not texts:
+            return []
+        digests = [text_digest(t) for t in texts]
+
+        with self._lock:
+            found = self._lookup(list(dict.fromkeys(digests)))
+
+        # Unique misses only: identical chunks in one batch are embedded once
+        missing: Dict[bytes, str] = {}
+        for digest, text in zip(digests, texts):
+            if digest not in found and digest not in missing:
+                missing[digest] = text
+
+        if missing:
+            vectors = self.embedding_function(list(missing.values()))
+            now = time.time()
+            rows = []
+            for digest, vector in zip(missing, vectors):
+                vec = np.asarray(vector, dtype=np.float32)
+                found[digest] = vec
+                rows.append((self.model_id, digest, vec.shape[0], vec.tobytes(), now, now))
+            with self._lock:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (model, digest, dim, vector, created, last_used) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+                self._conn.commit()
+        else:
+            with self._lock:
+                self._conn.commit()     # Persist the last_used touches
+
+        missed = sum(1 for d in digests if d in missing)
+        self.misses += missed
+        self.hits += len(digests) - missed
+        return [found[d] for d in digests]
+
+    # ── eviction ───────────────────────────────────────────────────
+
+    def prune(self) -> int:
+        """Drop entries unused for max_age_days, then the LRU overflow beyond max_entries."""
+        removed = 0
+        with self._lock:
+            if self.max_age_days is not None:
+                cutoff = time.time() - self.max_age_days * 86400
+                removed += self._conn.execute(
+                    "DELETE FROM embeddings WHERE last_used < ?", (cutoff,)
+                ).rowcount
+            if self.max_entries is not None:
+                (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+                overflow = count - self.max_entries
+                if overflow > 0:
+                    removed += self._conn.execute(
+                        "DELETE FROM embeddings WHERE (model, digest) IN ("
+                        "SELECT model, digest FROM embeddings ORDER BY last_used LIMIT ?)",
+                        (overflow,),
+                    ).rowcount
+            self._conn.commit()
+        return removed
+
+    # ── reporting / lifecycle ──────────────────────────────────────
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            (entries,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "path": str(self.path),
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def close(self, prune: bool = True) -> None:
+        """Apply eviction (by default) and close the database."""
+        if prune:
+            self.prune()
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self) -> "EmbeddingDiskCache":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
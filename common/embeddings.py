@@ -0,0 +1,254 @@
+"""
+embeddings.py
+────────────────────────────────────────────────────────────────────
+Tunable ONNX runtime for the MiniLM embedding model.
+
+Chroma's default embedding function (ONNX all-MiniLM-L6-v2) always runs
+with onnxruntime's default thread pools, a fixed batch of 32, pads every
+input to 256 tokens and re-optimizes the graph each time a process loads
+it. EmbeddingRuntimeConfig exposes those knobs:
+
+  - intra_op_threads / inter_op_threads  onnxruntime thread pools (0 = ORT default)
+  - batch_size                           texts per model call
+  - graph_optimization                   disable | basic | extended | all
+  - cache_optimized_model                save the optimized graph next to the
+                                         model and load it directly next time
+  - dynamic_padding                      pad each batch to its longest input
+                                         (inputs sorted by length first)
+                                         instead of always to 256 tokens
+
+TunedMiniLM applies a config while staying a drop-in replacement for
+Chroma's function: same model files, same MODEL_NAME and the same
+vectors, so caches and existing collections stay valid.
+
+tools/calibrate_embeddings.py measures the combinations on the current
+machine and saves the fastest to DEFAULT_CONFIG_PATH, which
+load_runtime_config() picks up by default.
+"""
+
+import json
+import logging
+import os
+from functools import cached_property
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG_PATH = Path.home() / ".cache" / "ai-security" / "embedding_runtime.json"
+CONFIG_ENV = "EMBED_RUNTIME_CONFIG"
+
+GRAPH_OPTIMIZATION_LEVELS = {
+    "disable": "ORT_DISABLE_ALL",
+    "basic": "ORT_ENABLE_BASIC",
+    "extended": "ORT_ENABLE_EXTENDED",
+    "all": "ORT_ENABLE_ALL",
+}
+
+MAX_SEQUENCE_LENGTH = 256       # Same truncation as Chroma / sentence-transformers
+
+
+class EmbeddingRuntimeConfig:
+    """onnxruntime and batching settings for the MiniLM embedding model."""
+
+    FIELDS = ("intra_op_threads", "inter_op_threads", "batch_size",
+              "graph_optimization", "cache_optimized_model", "dynamic_padding")
+
+    def __init__(self, intra_op_threads: int = 0, inter_op_threads: int = 0,
+                 batch_size: int = 32, graph_optimization: str = "all",
+                 cache_optimized_model: bool = True, dynamic_padding: bool = True):
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        if graph_optimization not in GRAPH_OPTIMIZATION_LEVELS:
+            raise ValueError(f"graph_optimization must be one of {sorted(GRAPH_OPTIMIZATION_LEVELS)}")
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+        self.batch_size = batch_size
+        self.graph_optimization = graph_optimization
+        self.cache_optimized_model = cache_optimized_model
+        self.dynamic_padding = dynamic_padding
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.FIELDS}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "EmbeddingRuntimeConfig":
+        return cls(**{k: v for k, v in data.items() if k in cls.FIELDS})
+
+    def updated(self, **overrides: Any) -> "EmbeddingRuntimeConfig":
+        """Copy with the given fields replaced (None values are ignored, for CLI flags)."""
+        data = self.as_dict()
+        data.update({k: v for k, v in overrides.items() if v is not None})
+        return self.from_dict(data)
+
+    def save(self, path: Union[str, Path] = DEFAULT_CONFIG_PATH,
+             extra: Optional[Dict[str, Any]] = None) -> Path:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps({**self.as_dict(), **(extra or {})}, indent=2))
+        return path
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{k}={v!r}" for k, v in self.as_dict().items())
+        return f"EmbeddingRuntimeConfig({fields})"
+
+
+def load_runtime_config(path: Optional[Union[str, Path]] = None) -> EmbeddingRuntimeConfig:
+    """
+    Calibrated settings from `path`, $EMBED_RUNTIME_CONFIG or DEFAULT_CONFIG_PATH,
+    falling back to the defaults when no file exists.
+    """
+    path = Path(path or os.environ.get(CONFIG_ENV) or DEFAULT_CONFIG_PATH)
+    if not path.exists():
+        return EmbeddingRuntimeConfig()
+    try:
+        return EmbeddingRuntimeConfig.from_dict(json.loads(path.read_text()))
+    except (ValueError, TypeError) as e:
+        logger.warning(f"Ignoring invalid embedding runtime config {path}: {e}")
+        return EmbeddingRuntimeConfig()
+
+
+def _onnx_minilm_class():
+    from chromadb.utils.embedding_functions.onnx_mini_lm_l6_v2 import ONNXMiniLM_L6_V2
+    return ONNXMiniLM_L6_V2
+
+
+class _TunedMiniLMMixin:
+    """Overrides for ONNXMiniLM_L6_V2; combined with it lazily in TunedMiniLM()."""
+
+    runtime: EmbeddingRuntimeConfig
+
+    @cached_property
+    def tokenizer(self) -> Any:
+        tokenizer = self.Tokenizer.from_file(
+            os.path.join(self.DOWNLOAD_PATH, self.EXTRACTED_FOLDER_NAME, "tokenizer.json"))
+        tokenizer.enable_truncation(max_length=MAX_SEQUENCE_LENGTH)
+        if self.runtime.dynamic_padding:
+            tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")     # Pad to longest in batch
+        else:
+            tokenizer.enable_padding(pad_id=0, pad_token="[PAD]", length=MAX_SEQUENCE_LENGTH)
+        return tokenizer
+
+    def optimized_model_path(self) -> Path:
+        """Where the optimized graph for this ORT version and level is cached."""
+        folder = Path(self.DOWNLOAD_PATH) / self.EXTRACTED_FOLDER_NAME
+        return folder / f"model.{self.runtime.graph_optimization}.ort{self.ort.__version__}.onnx"
+
+    @cached_property
+    def model(self) -> Any:
+        ort = self.ort
+        providers = self._preferred_providers or ort.get_available_providers()
+        providers = [p for p in providers if p != "CoreMLExecutionProvider"]
+
+        so = ort.SessionOptions()
+        so.log_severity_level = 3
+        if self.runtime.intra_op_threads:
+            so.intra_op_num_threads = self.runtime.intra_op_threads
+        if self.runtime.inter_op_threads:
+            so.inter_op_num_threads = self.runtime.inter_op_threads
+            so.execution_mode = ort.ExecutionMode.ORT_PARALLEL
+
+        source = Path(self.DOWNLOAD_PATH) / self.EXTRACTED_FOLDER_NAME / "model.onnx"
+        level = getattr(ort.GraphOptimizationLevel, GRAPH_OPTIMIZATION_LEVELS[self.runtime.graph_optimization])
+        optimized = self.optimized_model_path()
+
+        pending = None
+        if self.runtime.cache_optimized_model and self.runtime.graph_optimization != "disable":
+            if optimized.exists():
+                # Already optimized for this machine: skip the optimization passes
+                source, level = optimized, ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+            else:
+                # Written under a private name and renamed, so concurrent loaders never see a partial file
+                pending = optimized.with_name(f"{optimized.name}.{os.getpid()}.tmp")
+                so.optimized_model_filepath = str(pending)
+        so.graph_optimization_level = level
+
+        session = ort.InferenceSession(str(source), providers=providers, sess_options=so)
+        if pending is not None and pending.exists():
+            os.replace(pending, optimized)
+        return session
+
+    def _forward(self, documents: List[str], batch_size: int = 32) -> np.ndarray:
+        """Same pooling as Chroma's _forward, with the configured batch size and padding."""
+        batch_size = self.runtime.batch_size
+        order = list(range(len(documents)))
+        if self.runtime.dynamic_padding:
+            # Group similar lengths so each batch pads to as little as possible
+            order.sort(key=lambda i: len(documents[i]))
+
+        result = np.empty((len(documents), 0), dtype=np.float32)
+        for start in range(0, len(order), batch_size):
+            idx = order[start:start + batch_size]
+            encoded = self.tokenizer.encode_batch([documents[i] for i in idx])
+            input_ids = np.array([e.ids for e in encoded], dtype=np.int64)
+            attention_mask = np.array([e.attention_mask for e in encoded], dtype=np.int64)
+            last_hidden_state = self.model.run(None, {
+                "input_ids": input_ids,
+                "attention_mask": attention_mask,
+                "token_type_ids": np.zeros_like(input_ids),
+            })[0]
+
+            # Mean pooling over real (unpadded) tokens, then L2 normalization
+            mask = attention_mask[:, :, None].astype(last_hidden_state.dtype)
+            pooled = (last_hidden_state * mask).sum(1) / np.clip(mask.sum(1), 1e-9, None)
+            if result.shape[1] == 0:
+                result = np.empty((len(documents), pooled.shape[1]), dtype=np.float32)
+            result[idx] = self._normalize(pooled).astype(np.float32)
+        return result
+
+
+_tuned_class = None
+
+
+def TunedMiniLM(runtime: Optional[EmbeddingRuntimeConfig] = None,
+                preferred_providers: Optional[List[str]] = None):
+    """
+    Chroma's ONNX all-MiniLM-L6-v2 embedding function with `runtime` applied.
+
+    A factory rather than a module-level subclass so importing this module
+    does not import chromadb.
+    """
+    global _tuned_class
+    if _tuned_class is None:
+        _tuned_class = type("TunedMiniLM", (_TunedMiniLMMixin, _onnx_minilm_class()), {})
+    function = _tuned_class(preferred_providers=preferred_providers)
+    function.runtime = runtime or load_runtime_config()
+    return function
+
+
+def add_runtime_arguments(parser) -> None:
+    """Register the --embed-* runtime flags shared by the indexing CLIs."""
+    group = parser.add_argument_group("embedding runtime (defaults: calibrated config, see "
+                                      "tools/calibrate_embeddings.py)")
+    group.add_argument("--embed-config", type=Path,
+                       help=f"Runtime config JSON (default: {DEFAULT_CONFIG_PATH} if present)")
+    group.add_argument("--embed-threads", type=int,
+                       help="onnxruntime intra-op threads (0 = onnxruntime default)")
+    group.add_argument("--embed-inter-op-threads", type=int,
+                       help="onnxruntime inter-op threads (0 = onnxruntime default)")
+    group.add_argument("--embed-batch-size", type=int,
+                       help="Texts per model call")
+    group.add_argument("--graph-opt-level", choices=sorted(GRAPH_OPTIMIZATION_LEVELS),
+                       help="onnxruntime graph optimization level")
+    group.add_argument("--no-optimized-model-cache", action="store_true",
+                       help="Re-optimize the graph on every load instead of caching it on disk")
+
+
+def runtime_arguments_given(args) -> bool:
+    """Whether any --embed-* runtime flag was passed on the command line."""
+    return (args.embed_config is not None or args.embed_threads is not None
+            or args.embed_inter_op_threads is not None or args.embed_batch_size is not None
+            or args.graph_opt_level is not None or args.no_optimized_model_cache)
+
+
+def runtime_from_args(args) -> EmbeddingRuntimeConfig:
+    """Build a runtime config from the calibrated defaults plus any --embed-* overrides."""
+    return load_runtime_config(args.embed_config).updated(
+        intra_op_threads=args.embed_threads,
+        inter_op_threads=args.embed_inter_op_threads,
+        batch_size=args.embed_batch_size,
+        graph_optimization=args.graph_opt_level,
+        cache_optimized_model=False if args.no_optimized_model_cache else None,
+    )
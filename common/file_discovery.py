@@ -0,0 +1,265 @@
+"""
+file_discovery.py
+────────────────────────────────────────────────────────────────────
+Fast enumeration of the files of a source tree for tools/index_code.py,
+honouring the project's ignore rules.
+
+os.walk() with a fixed list of directory names to skip misses project
+.gitignore rules (so ignored artifacts get indexed) and still stats every
+file under large ignored trees. discover_files() instead:
+
+  - in a git work tree, asks git for the file list: tracked files plus
+    untracked files that are not ignored (`git ls-files --cached --others
+    --exclude-standard`), which reads the index rather than the disk
+  - otherwise, or without a git binary, walks the tree with os.scandir on
+    a thread pool, applying .gitignore files (and .git/info/exclude) the
+    way git does and never descending into an ignored directory
+
+Either way directories in `skip_dirs` and hidden directories are left
+out as before, and the result is sorted.
+"""
+
+import os
+import re
+import subprocess
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Collection, Iterable, List, Optional, Tuple, Union
+
+DEFAULT_WORKERS = 8
+
+# git ls-files can take a while on a very large index, but not this long
+GIT_TIMEOUT_S = 60
+
+
+# ╔════════════════════════════════════════════════════════════════╗
+# 1.  .gitignore rules                                             ║
+# ╚════════════════════════════════════════════════════════════════╝
+
+def _glob_to_regex(pattern: str) -> str:
+    """Regex for a gitignore glob: * and ? stay within a path segment, ** spans them."""
+    out, i = [], 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+            continue
+        if pattern.startswith("/**", i) and i + 3 == len(pattern):
+            out.append("/.*")
+            i += 3
+            continue
+        c = pattern[i]
+        if c == "*":
+            out.append(".*" if pattern.startswith("**", i) else "[^/]*")
+            i += 2 if pattern.startswith("**", i) else 1
+            continue
+        if c == "?":
+            out.append("[^/]")
+        elif c == "[":
+            end = pattern.find("]", i + 2)
+            if end < 0:
+                out.append(re.escape(c))
+            else:
+                body = pattern[i + 1:end]
+                if body[0] in "!^":
+                    body = "^" + body[1:]
+                out.append("[" + body.replace("\\", "\\\\") + "]")
+                i = end
+        elif c == "\\" and i + 1 < len(pattern):
+            i += 1
+            out.append(re.escape(pattern[i]))
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return "".join(out)
+
+
+class IgnoreRules:
+    """The patterns of one .gitignore file, relative to the directory it is in."""
+
+    def __init__(self, base: Union[str, Path], lines: Iterable[str]):
+        self.base = str(base)
+        self.rules: List[Tuple[re.Pattern, bool, bool, bool]] = []  # regex, negate, dir_only, anchored
+        for line in lines:
+            line = line.rstrip("\n\r")
+            if not line.strip() or line.startswith("#"):
+                continue
+            if not line.endswith("\\ "):
+                line = line.rstrip()
+            negate = line.startswith("!")
+            if negate:
+                line = line[1:]
+            dir_only = line.endswith("/")
+            line = line.rstrip("/")
+            if not line:
+                continue
+            # A slash anywhere but at the end ties the pattern to this directory
+            anchored = "/" in line
+            line = line.lstrip("/")
+            self.rules.append((re.compile(_glob_to_regex(line) + r"\Z"), negate, dir_only, anchored))
+
+    @classmethod
+    def from_file(cls, path: Path, base: Optional[Path] = None) -> Optional["IgnoreRules"]:
+        """Rules of an ignore file (relative to its directory, or `base`), or None if unreadable."""
+        try:
+            text = path.read_text(encoding="utf-8", errors="ignore")
+        except OSError:
+            return None
+        rules = cls(base if base is not None else path.parent, text.splitlines())
+        return rules if rules.rules else None
+
+    def match(self, path: str, is_dir: bool) -> Optional[bool]:
+        """True (ignored), False (re-included with !) or None (no rule matches `path`)."""
+        rel = os.path.relpath(path, self.base).replace(os.sep, "/")
+        if rel.startswith("../"):
+            return None
+        name = rel.rsplit("/", 1)[-1]
+        result = None
+        for regex, negate, dir_only, anchored in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if regex.match(rel if anchored else name):
+                result = not negate
+        return result
+
+
+def is_ignored(rule_sets: Iterable[IgnoreRules], path: str, is_dir: bool) -> bool:
+    """Whether `path` is ignored; later (deeper) rule sets override earlier ones."""
+    ignored = False
+    for rules in rule_sets:
+        result = rules.match(path, is_dir)
+        if result is not None:
+            ignored = result
+    return ignored
+
+
+def inherited_rules(root: Path) -> List[IgnoreRules]:
+    """
+    Rules that apply at `root` from above it: .git/info/exclude and the
+    .gitignore files from the enclosing repository's top down to root's parent.
+    """
+    top = next((d for d in [root, *root.parents] if (d / ".git").exists()), None)
+    if top is None:
+        return []
+    chain = [root, *root.parents]
+    rule_sets = [IgnoreRules.from_file(top / ".git" / "info" / "exclude", base=top)]
+    for directory in reversed(chain[1:chain.index(top) + 1]):     # top .. root's parent
+        rule_sets.append(IgnoreRules.from_file(directory / ".gitignore"))
+    return [r for r in rule_sets if r is not None]
+
+
+# ╔════════════════════════════════════════════════════════════════╗
+# 2.  Discovery                                                    ║
+# ╚════════════════════════════════════════════════════════════════╝
+
+def _skipped_dir(name: str, skip_dirs: Collection[str]) -> bool:
+    return name in skip_dirs or name.startswith(".")
+
+
+def git_files(root: Path, skip_dirs: Collection[str] = ()) -> Optional[List[Path]]:
+    """
+    Files under `root` from the git index – tracked, plus untracked ones
+    that are not ignored – or None if root is not in a git work tree (or
+    git is unavailable).
+    """
+    try:
+        output = subprocess.run(
+            ["git", "ls-files", "-z", "--cached", "--others", "--exclude-standard"],
+            cwd=root, capture_output=True, check=True, timeout=GIT_TIMEOUT_S,
+        ).stdout
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+    files = []
+    for rel in dict.fromkeys(output.decode("utf-8", errors="surrogateescape").split("\0")):
+        if not rel:
+            continue
+        parts = rel.split("/")
+        if any(_skipped_dir(part, skip_dirs) for part in parts[:-1]):
+            continue
+        path = root / rel
+        # Tracked files deleted from the work tree, and submodules, are not files
+        if path.is_file():
+            files.append(path)
+    return sorted(files)
+
+
+def _scan_tree(root: Path, skip_dirs: Collection[str],
+               workers: int) -> Tuple[List[Path], List[Path]]:
+    """(files, directories) under `root`, scanned in parallel, honouring .gitignore files."""
+
+    def scan(directory: str, rule_sets: List[IgnoreRules]):
+        own = IgnoreRules.from_file(Path(directory) / ".gitignore")
+        if own is not None:
+            rule_sets = rule_sets + [own]
+        files, subdirs = [], []
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                    if is_dir and _skipped_dir(entry.name, skip_dirs):
+                        continue
+                    if not is_dir and not entry.is_file(follow_symlinks=False):
+                        continue
+                    if is_ignored(rule_sets, entry.path, is_dir):
+                        continue
+                    (subdirs if is_dir else files).append(entry.path)
+        except OSError:
+            pass
+        return files, [(d, rule_sets) for d in subdirs]
+
+    found: List[Path] = []
+    directories: List[Path] = [root]
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        pending = {pool.submit(scan, str(root), inherited_rules(root))}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                files, subdirs = future.result()
+                found.extend(Path(f) for f in files)
+                directories.extend(Path(d) for d, _ in subdirs)
+                pending |= {pool.submit(scan, d, rule_sets) for d, rule_sets in subdirs}
+    return sorted(found), sorted(directories)
+
+
+def walk_files(root: Path, skip_dirs: Collection[str] = (),
+               workers: int = DEFAULT_WORKERS) -> List[Path]:
+    """Files under `root`, scanned in parallel, honouring .gitignore files."""
+    return _scan_tree(root, skip_dirs, workers)[0]
+
+
+def walk_dirs(root: Path, skip_dirs: Collection[str] = (),
+              workers: int = DEFAULT_WORKERS) -> List[Path]:
+    """`root` and the directories under it that are not skipped or ignored."""
+    return _scan_tree(root, skip_dirs, workers)[1]
+
+
+def discover_files(root: Union[str, Path], skip_dirs: Collection[str] = (),
+                   use_git: bool = True,
+                   workers: int = DEFAULT_WORKERS) -> Tuple[List[Path], str]:
+    """
+    All files under `root` that the project does not ignore.
+
+    Parameters
+    ----------
+    root : Union[str, Path]
+        Directory to enumerate.
+    skip_dirs : Collection[str]
+        Directory names never descended into (hidden directories are
+        always skipped).
+    use_git : bool
+        Ask git first when root is in a work tree.
+    workers : int
+        Threads for the directory walk.
+
+    Returns
+    -------
+    Tuple[List[Path], str]
+        Sorted file paths, and how they were found: "git" or "walk".
+    """
+    root = Path(root)
+    if use_git:
+        files = git_files(root, skip_dirs)
+        if files is not None:
+            return files, "git"
+    return walk_files(root, skip_dirs, workers), "walk"
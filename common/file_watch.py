@@ -0,0 +1,194 @@
+"""
+file_watch.py
+────────────────────────────────────────────────────────────────────
+Change notifications for a source tree, for `index_code.py --watch`.
+
+FileWatcher.batches() yields the paths that changed each time a burst of
+changes has settled:
+
+  - on Linux through inotify (called via ctypes, so no extra dependency):
+    one watch per directory that is not skipped or ignored (see
+    common/file_discovery.py), added for new directories as they appear.
+    The process sleeps in select() while nothing changes.
+  - elsewhere, or when inotify is unavailable (e.g. the per-user watch
+    limit is reached), by polling: every `poll_interval` seconds it
+    yields None, meaning "anything may have changed – compare with your
+    last snapshot". An inotify queue overflow also yields None.
+
+Bursts are debounced: after the first event, events are collected until
+none arrive for `debounce` seconds (but for at most `max_delay` seconds,
+so a file that is written continuously is still picked up).
+"""
+
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import sys
+import time
+from pathlib import Path
+from typing import Collection, Dict, Iterator, List, Optional, Set, Tuple, Union
+
+from common.file_discovery import walk_dirs
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DEBOUNCE_S = 1.0
+DEFAULT_MAX_DELAY_S = 10.0
+DEFAULT_POLL_INTERVAL_S = 2.0
+
+# inotify(7) event bits
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+
+_WATCH_MASK = (IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE
+               | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF)
+_EVENT = struct.Struct("iIII")              # wd, mask, cookie, len (then the name)
+_READ_SIZE = 64 * 1024
+
+
+class _Inotify:
+    """Minimal inotify binding: watch directories, read (path, mask) events."""
+
+    def __init__(self):
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, f"inotify_init1: {os.strerror(err)}")
+        self.directories: Dict[int, Path] = {}
+
+    def add(self, directory: Path) -> None:
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(directory), _WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, f"inotify_add_watch {directory}: {os.strerror(err)}")
+        self.directories[wd] = directory
+
+    def read(self, timeout: Optional[float]) -> Optional[List[Tuple[Path, int]]]:
+        """Events within `timeout` seconds (None: wait), [] if none, None on queue overflow."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, _READ_SIZE)
+        except BlockingIOError:
+            return []
+
+        events, offset = [], 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                return None
+            if mask & IN_IGNORED:               # Watched directory is gone
+                self.directories.pop(wd, None)
+                continue
+            directory = self.directories.get(wd)
+            if directory is not None:
+                events.append((directory / os.fsdecode(name) if name else directory, mask))
+        return events
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class FileWatcher:
+    """Debounced change batches for a directory tree (inotify, or polling)."""
+
+    def __init__(self, root: Union[str, Path], skip_dirs: Collection[str] = (),
+                 debounce: float = DEFAULT_DEBOUNCE_S,
+                 poll_interval: float = DEFAULT_POLL_INTERVAL_S,
+                 max_delay: float = DEFAULT_MAX_DELAY_S,
+                 use_inotify: bool = True):
+        self.root = Path(root)
+        self.skip_dirs = skip_dirs
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.max_delay = max(max_delay, debounce)
+        self.mode = "polling"
+        self._inotify: Optional[_Inotify] = None
+
+        if use_inotify and sys.platform.startswith("linux"):
+            try:
+                self._inotify = _Inotify()
+                for directory in walk_dirs(self.root, skip_dirs):
+                    self._inotify.add(directory)
+                self.mode = "inotify"
+            except (OSError, AttributeError) as err:
+                logger.warning(f"inotify unavailable ({err}); polling every {poll_interval:g}s")
+                self.close()
+
+    @property
+    def watched_directories(self) -> int:
+        return len(self._inotify.directories) if self._inotify else 0
+
+    def _watch_new_directory(self, directory: Path) -> None:
+        if directory.name in self.skip_dirs or directory.name.startswith("."):
+            return
+        try:
+            for sub in walk_dirs(directory, self.skip_dirs):
+                self._inotify.add(sub)
+        except OSError as err:
+            logger.warning(f"Not watching {directory}: {err}")
+
+    def batches(self) -> Iterator[Optional[Set[Path]]]:
+        """
+        Yield the set of changed paths (files or directories) per settled
+        burst, or None when everything must be rescanned (polling mode,
+        or lost events).
+        """
+        if self._inotify is None:
+            while True:
+                time.sleep(self.poll_interval)
+                yield None
+
+        while True:
+            events = self._inotify.read(None)           # Sleep until something happens
+            if events is None:
+                yield None
+                continue
+            if not events:
+                continue
+
+            changed: Set[Path] = set()
+            overflow = False
+            deadline = time.monotonic() + self.max_delay
+            while events:
+                for path, mask in events:
+                    if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                        self._watch_new_directory(path)
+                    changed.add(path)
+                # Keep collecting until the burst has been quiet for `debounce`
+                remaining = min(self.debounce, deadline - time.monotonic())
+                if remaining <= 0:
+                    break
+                events = self._inotify.read(remaining)
+                if events is None:
+                    overflow = True
+                    break
+            yield None if overflow else changed
+
+    def close(self) -> None:
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+
+    def __enter__(self) -> "FileWatcher":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
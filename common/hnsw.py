@@ -0,0 +1,97 @@
+"""
+hnsw.py
+────────────────────────────────────────────────────────────────────
+Distance-space and HNSW index settings for the Chroma collections, and
+the conversion from a Chroma distance back to cosine similarity.
+
+index_pdfs.py and index_code.py used to create collections with Chroma's
+defaults (squared L2, M=16, ef_construction=100, ef_search=100). The
+--hnsw-* flags registered here let them choose instead:
+
+  - space            l2 | cosine | ip
+  - M                graph degree (Chroma: max_neighbors); more = better
+                     recall, bigger index, slower inserts
+  - ef_construction  candidate list size while building
+  - ef_search        candidate list size while querying; the main
+                     recall/latency knob, stored with the collection
+                     (a process that already has the index open keeps
+                     the old value until it reopens the client)
+
+bench/bench_hnsw_recall.py measures recall@k, latency and index size for
+these settings against exact search, so they can be picked from data.
+"""
+
+from typing import Any, Dict, Optional
+
+SPACES = ("l2", "cosine", "ip")
+
+# Chroma's own defaults, used when a flag is not given
+DEFAULT_SPACE = "l2"
+DEFAULT_M = 16
+DEFAULT_EF_CONSTRUCTION = 100
+DEFAULT_EF_SEARCH = 100
+
+
+def hnsw_configuration(space: Optional[str] = None, m: Optional[int] = None,
+                       ef_construction: Optional[int] = None,
+                       ef_search: Optional[int] = None) -> Dict[str, Any]:
+    """`configuration=` argument for create_collection(); unset values keep Chroma's defaults."""
+    if space is not None and space not in SPACES:
+        raise ValueError(f"space must be one of {SPACES}")
+    hnsw = {
+        "space": space,
+        "max_neighbors": m,
+        "ef_construction": ef_construction,
+        "ef_search": ef_search,
+    }
+    return {"hnsw": {k: v for k, v in hnsw.items() if v is not None}}
+
+
+def collection_space(collection: Any) -> str:
+    """Distance space of a Chroma collection (or MmapCollection); 'l2' if unknown."""
+    space = getattr(collection, "space", None)       # MmapCollection
+    if space:
+        return space
+    configuration = getattr(collection, "configuration", None) or {}
+    hnsw = configuration.get("hnsw") or {}
+    if hnsw.get("space"):
+        return hnsw["space"]
+    metadata = getattr(collection, "metadata", None) or {}
+    return metadata.get("hnsw:space", DEFAULT_SPACE)
+
+
+def distance_to_score(distance: float, space: str = DEFAULT_SPACE) -> float:
+    """
+    Cosine similarity for a distance Chroma returned in `space`.
+
+    MiniLM embeddings are unit length, so squared L2 distance d = 2 - 2*cos;
+    Chroma's cosine distance is 1 - cos and its ip distance is 1 - dot.
+    """
+    if space == "l2":
+        return 1.0 - distance / 2.0
+    if space in ("cosine", "ip"):
+        return 1.0 - distance
+    raise ValueError(f"Unknown distance space '{space}'")
+
+
+def add_hnsw_arguments(parser) -> None:
+    """Register the --hnsw-* flags shared by the indexing CLIs."""
+    group = parser.add_argument_group("vector index (defaults: Chroma's, see bench/bench_hnsw_recall.py)")
+    group.add_argument("--hnsw-space", choices=SPACES,
+                       help=f"Distance space (default: {DEFAULT_SPACE})")
+    group.add_argument("--hnsw-m", type=int,
+                       help=f"HNSW graph degree M (default: {DEFAULT_M})")
+    group.add_argument("--hnsw-ef-construction", type=int,
+                       help=f"HNSW build candidate list size (default: {DEFAULT_EF_CONSTRUCTION})")
+    group.add_argument("--hnsw-ef-search", type=int,
+                       help=f"HNSW query candidate list size (default: {DEFAULT_EF_SEARCH})")
+
+
+def hnsw_from_args(args) -> Dict[str, Any]:
+    """Collection configuration from the --hnsw-* flags."""
+    for flag in ("hnsw_m", "hnsw_ef_construction", "hnsw_ef_search"):
+        value = getattr(args, flag)
+        if value is not None and value < 1:
+            raise ValueError(f"--{flag.replace('_', '-')} must be at least 1")
+    return hnsw_configuration(args.hnsw_space, args.hnsw_m,
+                              args.hnsw_ef_construction, args.hnsw_ef_search)
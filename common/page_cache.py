@@ -0,0 +1,205 @@
+"""
+page_cache.py
+────────────────────────────────────────────────────────────────────
+On-disk cache of per-page PDF extraction output for index_pdfs.py.
+
+Parsing a PDF with PyMuPDF – page text plus table detection – is the
+slow part of indexing, and its output does not depend on --chunk-size or
+--chunk-overlap. PageTextCache stores each page's text and tables (rows,
+bounding box and [TABLE] text) in a single SQLite file keyed by
+(SHA-256 of the PDF file, extractor key):
+  - the extractor key names the extraction code version, the PyMuPDF
+    version and anything else that changes the output (e.g. the table
+    prefilter mode), so stale entries are never read
+  - a document only counts as cached once all its pages are written
+    (complete()), so an interrupted run re-parses it
+  - pages are read back in page order in small batches, keeping the
+    streaming pipeline's memory bound
+  - documents unused for `max_age_days` are dropped on close()
+
+Re-chunking experiments then skip parsing entirely and only re-chunk and
+re-embed (and the embedding cache skips most of the latter).
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+DEFAULT_PAGE_CACHE_PATH = Path("./.pdf_page_cache.sqlite3")
+DEFAULT_MAX_AGE_DAYS = 30.0
+
+# Pages read per query when streaming a cached document
+_READ_BATCH = 64
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    digest     TEXT NOT NULL,
+    extractor  TEXT NOT NULL,
+    page_count INTEGER NOT NULL,
+    created    REAL NOT NULL,
+    last_used  REAL NOT NULL,
+    PRIMARY KEY (digest, extractor)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS pages (
+    digest    TEXT NOT NULL,
+    extractor TEXT NOT NULL,
+    page      INTEGER NOT NULL,
+    text      TEXT NOT NULL,
+    tables    TEXT NOT NULL,
+    skipped   INTEGER NOT NULL,
+    PRIMARY KEY (digest, extractor, page)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS documents_last_used ON documents (last_used);
+"""
+
+
+def file_digest(path: Union[str, Path]) -> str:
+    """SHA-256 (hex) of a file's bytes, read in 1 MiB blocks."""
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+class PageTextCache:
+    """SQLite-backed cache of extracted PDF pages keyed by (file SHA-256, extractor key)."""
+
+    def __init__(self, path: Union[str, Path] = DEFAULT_PAGE_CACHE_PATH,
+                 max_age_days: Optional[float] = DEFAULT_MAX_AGE_DAYS):
+        self.path = Path(path)
+        self.max_age_days = max_age_days
+        self.hits = 0       # Documents served from the cache
+        self.misses = 0     # Documents parsed
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    # ── reading ────────────────────────────────────────────────────
+
+    def page_count(self, digest: str, extractor: str) -> Optional[int]:
+        """Page count of a completely cached document (counted as a hit), else None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT page_count FROM documents WHERE digest = ? AND extractor = ?",
+                (digest, extractor),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE documents SET last_used = ? WHERE digest = ? AND extractor = ?",
+                (time.time(), digest, extractor),
+            )
+            self._conn.commit()
+        self.hits += 1
+        return row[0]
+
+    def record_miss(self) -> None:
+        """Count a document parsed without looking it up (e.g. a forced re-parse)."""
+        with self._lock:
+            self.misses += 1
+
+    def iter_pages(self, digest: str, extractor: str) -> Iterator[Dict[str, Any]]:
+        """Yield the cached pages of a document in order: page, text, tables, skipped."""
+        last = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT page, text, tables, skipped FROM pages "
+                    "WHERE digest = ? AND extractor = ? AND page > ? ORDER BY page LIMIT ?",
+                    (digest, extractor, last, _READ_BATCH),
+                ).fetchall()
+            if not rows:
+                return
+            for page, text, tables, skipped in rows:
+                yield {"page": page, "text": text, "tables": json.loads(tables),
+                       "skipped": bool(skipped)}
+            last = rows[-1][0]
+
+    # ── writing ────────────────────────────────────────────────────
+
+    def begin(self, digest: str, extractor: str) -> None:
+        """Forget any (partial) entry for this document before writing it again."""
+        with self._lock:
+            self._conn.execute("DELETE FROM documents WHERE digest = ? AND extractor = ?",
+                               (digest, extractor))
+            self._conn.execute("DELETE FROM pages WHERE digest = ? AND extractor = ?",
+                               (digest, extractor))
+            self._conn.commit()
+
+    def add_pages(self, digest: str, extractor: str, pages: List[Dict[str, Any]]) -> None:
+        """Write extracted pages (dicts with page, text, tables, skipped)."""
+        rows = [(digest, extractor, p["page"], p["text"], json.dumps(p["tables"]), int(p["skipped"]))
+                for p in pages]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO pages (digest, extractor, page, text, tables, skipped) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+
+    def complete(self, digest: str, extractor: str, page_count: int) -> None:
+        """Mark a document as fully written, making it readable."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO documents (digest, extractor, page_count, created, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (digest, extractor, page_count, now, now),
+            )
+            self._conn.commit()
+
+    # ── eviction ───────────────────────────────────────────────────
+
+    def prune(self) -> int:
+        """Drop documents unused for max_age_days, and pages of incomplete documents."""
+        removed = 0
+        with self._lock:
+            if self.max_age_days is not None:
+                cutoff = time.time() - self.max_age_days * 86400
+                removed = self._conn.execute(
+                    "DELETE FROM documents WHERE last_used < ?", (cutoff,)
+                ).rowcount
+            self._conn.execute(
+                "DELETE FROM pages WHERE (digest, extractor) NOT IN "
+                "(SELECT digest, extractor FROM documents)"
+            )
+            self._conn.commit()
+        return removed
+
+    # ── reporting / lifecycle ──────────────────────────────────────
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            (documents,) = self._conn.execute("SELECT COUNT(*) FROM documents").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "path": str(self.path),
+            "documents": documents,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def close(self, prune: bool = True) -> None:
+        """Apply eviction (by default) and close the database."""
+        if prune:
+            self.prune()
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self) -> "PageTextCache":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
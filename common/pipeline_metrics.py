@@ -0,0 +1,196 @@
+"""
+pipeline_metrics.py
+────────────────────────────────────────────────────────────────────
+Lightweight per-stage latency instrumentation for the RAG pipelines.
+
+Each query gets a QueryTrace that records how long every stage took
+(scan_query, retrieve, filter_chunks, build_prompt, generate,
+scan_output), plus counters such as chunk counts and prompt tokens.
+PipelineMetrics folds finished traces into rolling windows so p50/p95/p99
+can be reported, dumped to JSON, or exported as Prometheus text.
+
+Only time.perf_counter() and a bounded deque per series are used, so the
+overhead per query is a few microseconds and memory stays fixed.
+"""
+
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+DEFAULT_WINDOW = 1000
+PERCENTILES = (50, 95, 99)
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap prompt-size estimate (~4 characters per token for English text)."""
+    return (len(text) + 3) // 4
+
+
+class QueryTrace:
+    """Timings and counters for a single pipeline run."""
+
+    def __init__(self):
+        self.stages_ms: Dict[str, float] = {}
+        self.counts: Dict[str, Union[int, float]] = {}
+        self.outcome = "ok"
+        self._t0 = time.perf_counter()
+        self.total_ms: Optional[float] = None
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Time the enclosed block as stage `name`."""
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages_ms[name] = self.stages_ms.get(name, 0.0) + (time.perf_counter() - t0) * 1000
+
+    def count(self, name: str, value: Union[int, float]) -> None:
+        """Record a per-query counter (chunk counts, prompt tokens, ...)."""
+        self.counts[name] = value
+
+    def finish(self, outcome: str = "ok") -> "QueryTrace":
+        """Stop the wall clock for this query."""
+        if self.total_ms is None:
+            self.total_ms = (time.perf_counter() - self._t0) * 1000
+            self.outcome = outcome
+        return self
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "outcome": self.outcome,
+            "total_ms": round(self.total_ms if self.total_ms is not None else 0.0, 3),
+            "stages_ms": {k: round(v, 3) for k, v in self.stages_ms.items()},
+            "counts": dict(self.counts),
+        }
+
+
+class RollingHistogram:
+    """Keeps the last `window` samples of a series and reports percentiles."""
+
+    def __init__(self, window: int = DEFAULT_WINDOW):
+        self.samples: deque = deque(maxlen=window)
+        self.count = 0          # Lifetime samples (the window only keeps the last N)
+
+    def add(self, value: float) -> None:
+        self.samples.append(value)
+        self.count += 1
+
+    def summary(self) -> Dict[str, float]:
+        values = sorted(self.samples)
+        if not values:
+            return {"count": self.count}
+        result = {
+            "count": self.count,
+            "mean": round(sum(values) / len(values), 3),
+            "max": round(values[-1], 3),
+        }
+        for p in PERCENTILES:
+            # Nearest-rank percentile over the current window
+            idx = min(len(values) - 1, max(0, -(-p * len(values) // 100) - 1))
+            result[f"p{p}"] = round(values[idx], 3)
+        return result
+
+
+class PipelineMetrics:
+    """Aggregates QueryTraces into rolling per-stage and per-counter histograms."""
+
+    def __init__(self, window: int = DEFAULT_WINDOW):
+        self.window = window
+        self.queries = 0
+        self.outcomes: Dict[str, int] = {}
+        self._stages: Dict[str, RollingHistogram] = {}
+        self._counts: Dict[str, RollingHistogram] = {}
+        self._total = RollingHistogram(window)
+        self._lock = threading.Lock()
+
+    def reset(self) -> None:
+        """Forget all recorded queries (e.g. after warmup)."""
+        with self._lock:
+            self.queries = 0
+            self.outcomes = {}
+            self._stages = {}
+            self._counts = {}
+            self._total = RollingHistogram(self.window)
+
+    def start_query(self) -> QueryTrace:
+        return QueryTrace()
+
+    def record(self, trace: QueryTrace, outcome: str = "ok") -> Dict[str, Any]:
+        """Finish `trace`, fold it into the histograms and return it as a dict."""
+        trace.finish(outcome)
+        with self._lock:
+            self.queries += 1
+            self.outcomes[trace.outcome] = self.outcomes.get(trace.outcome, 0) + 1
+            self._total.add(trace.total_ms)
+            for name, ms in trace.stages_ms.items():
+                self._stages.setdefault(name, RollingHistogram(self.window)).add(ms)
+            for name, value in trace.counts.items():
+                self._counts.setdefault(name, RollingHistogram(self.window)).add(value)
+        return trace.as_dict()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Percentile summary of every stage and counter over the rolling window."""
+        with self._lock:
+            return {
+                "queries": self.queries,
+                "window": self.window,
+                "outcomes": dict(self.outcomes),
+                "total_ms": self._total.summary(),
+                "stages_ms": {k: h.summary() for k, h in self._stages.items()},
+                "counts": {k: h.summary() for k, h in self._counts.items()},
+            }
+
+    def dump(self, path: Union[str, Path]) -> Path:
+        """Write the current snapshot to `path` as JSON."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.snapshot(), indent=2))
+        return path
+
+    def to_prometheus(self, prefix: str = "rag") -> str:
+        """Export the snapshot in Prometheus text exposition format (summary quantiles)."""
+        snap = self.snapshot()
+        lines: List[str] = [
+            f"# TYPE {prefix}_queries_total counter",
+            f"{prefix}_queries_total {snap['queries']}",
+            f"# TYPE {prefix}_stage_latency_ms summary",
+        ]
+        series = dict(snap["stages_ms"])
+        series["total"] = snap["total_ms"]
+        for stage, summary in series.items():
+            for p in PERCENTILES:
+                if f"p{p}" in summary:
+                    lines.append(f'{prefix}_stage_latency_ms{{stage="{stage}",quantile="{p / 100}"}} '
+                                 f'{summary[f"p{p}"]}')
+            lines.append(f'{prefix}_stage_latency_ms_count{{stage="{stage}"}} {summary["count"]}')
+        return "\n".join(lines) + "\n"
+
+    def format_report(self) -> str:
+        """Human-readable table of stage latencies for the REPLs."""
+        snap = self.snapshot()
+        if not snap["queries"]:
+            return "No queries measured yet."
+
+        report = "\nPIPELINE LATENCY (ms, rolling window of last "
+        report += f"{min(snap['queries'], self.window)} queries)\n"
+        report += "=" * 60 + "\n"
+        report += f"  {'stage':<16}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}\n"
+        report += "-" * 60 + "\n"
+        rows = list(snap["stages_ms"].items()) + [("TOTAL", snap["total_ms"])]
+        for stage, s in rows:
+            if "p50" not in s:
+                continue
+            report += (f"  {stage:<16}{s['p50']:>10.1f}{s['p95']:>10.1f}"
+                       f"{s['p99']:>10.1f}{s['max']:>10.1f}\n")
+        if snap["counts"]:
+            report += "-" * 60 + "\n"
+            for name, s in snap["counts"].items():
+                if "p50" in s:
+                    report += f"  {name:<16}{s['p50']:>10.0f}{s['p95']:>10.0f}{s['p99']:>10.0f}{s['max']:>10.0f}\n"
+        report += "=" * 60
+        return report
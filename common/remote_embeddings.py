@@ -0,0 +1,122 @@
+"""
+remote_embeddings.py
+────────────────────────────────────────────────────────────────────
+Chroma-compatible embedding function backed by tools/embed_server.py.
+
+RemoteEmbeddingFunction posts texts to the local embedding daemon, which
+keeps one warm MiniLM model and micro-batches requests from every client.
+It can be passed anywhere a Chroma embedding function is accepted, and
+common.embedding_cache.default_embedding_function() returns it whenever
+EMBED_SERVER_URL is set, so the query cache, the indexers' disk cache and
+search.py all share the daemon without further changes.
+
+If the daemon is unreachable the function falls back to loading the
+model in-process (once, with a warning) unless fallback is disabled.
+"""
+
+import base64
+import logging
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import requests
+
+try:
+    from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+except ImportError:         # Keep the client usable without chromadb installed
+    Documents = List[str]
+    Embeddings = List[Any]
+    EmbeddingFunction = object
+
+logger = logging.getLogger(__name__)
+
+EMBED_SERVER_ENV = "EMBED_SERVER_URL"
+DEFAULT_TIMEOUT = 30.0
+
+# Model the daemon serves by default (Chroma's ONNX all-MiniLM-L6-v2)
+LOCAL_MODEL_NAME = "all-MiniLM-L6-v2"
+
+
+class RemoteEmbeddingFunction(EmbeddingFunction):
+    """Embeds through the shared embedding daemon instead of an in-process model."""
+
+    def __init__(self, url: Optional[str] = None, timeout: float = DEFAULT_TIMEOUT,
+                 fallback_to_local: bool = True):
+        self.url = (url or os.environ.get(EMBED_SERVER_ENV) or "http://127.0.0.1:8765").rstrip("/")
+        self.timeout = timeout
+        self.fallback_to_local = fallback_to_local
+        self._local = threading.local()     # One keep-alive session per thread
+        self._fallback = None
+        self._model_name: Optional[str] = None
+
+    # ── Chroma embedding-function protocol ─────────────────────────
+
+    def __call__(self, input: Documents) -> Embeddings:
+        texts = list(input)
+        if not texts:
+            return []
+        if self._fallback is not None:
+            return self._fallback(texts)
+        try:
+            response = self._session().post(
+                f"{self.url}/embed",
+                json={"texts": texts, "encoding": "base64"},
+                timeout=self.timeout,
+            )
+            response.raise_for_status()
+        except requests.RequestException as e:
+            if not self.fallback_to_local:
+                raise
+            return self._use_local(e)(texts)
+
+        body = response.json()
+        self._model_name = body.get("model", self._model_name)
+        flat = np.frombuffer(base64.b64decode(body["embeddings"]), dtype="<f4")
+        return list(flat.reshape(len(texts), body["dim"]))
+
+    @staticmethod
+    def name() -> str:
+        return "remote_embed_server"
+
+    def get_config(self) -> Dict[str, Any]:
+        return {"url": self.url, "timeout": self.timeout}
+
+    @staticmethod
+    def build_from_config(config: Dict[str, Any]) -> "RemoteEmbeddingFunction":
+        return RemoteEmbeddingFunction(config.get("url"), config.get("timeout", DEFAULT_TIMEOUT))
+
+    # ── cache-key identity ─────────────────────────────────────────
+
+    @property
+    def MODEL_NAME(self) -> str:
+        """Model id reported by the daemon, so cache keys match in-process embedding."""
+        if self._model_name is None:
+            try:
+                health = self._session().get(f"{self.url}/health", timeout=self.timeout).json()
+                self._model_name = health.get("model", LOCAL_MODEL_NAME)
+            except (requests.RequestException, ValueError):
+                self._model_name = LOCAL_MODEL_NAME
+        return self._model_name
+
+    # ── helpers ────────────────────────────────────────────────────
+
+    def _session(self) -> requests.Session:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def _use_local(self, error: Exception):
+        logger.warning(f"Embedding server at {self.url} unavailable ({error}); "
+                       f"loading the model in-process instead")
+        from common.embeddings import TunedMiniLM
+        self._fallback = TunedMiniLM()
+        self._model_name = self._fallback.MODEL_NAME
+        return self._fallback
+
+
+def embedding_server_url() -> Optional[str]:
+    """The configured daemon URL, or None when tools should embed in-process."""
+    return os.environ.get(EMBED_SERVER_ENV) or None
@@ -0,0 +1,139 @@
+"""
+security_log.py
+────────────────────────────────────────────────────────────────────
+Bounded security event log for long-lived RAG instances.
+
+The guards used to append every event to a plain list, so memory grew
+with every query served and each report re-walked the whole history to
+count BLOCKED / FLAGGED / WARNING results.
+
+SecurityEventLog keeps:
+  - a fixed-capacity ring of the most recent events (collections.deque)
+  - running counters per result, per check and per (check, result)
+  - an optional JSONL spill file that receives events as they fall out
+    of the ring, so nothing is lost for auditing
+
+Appending, counting and reporting all cost O(1) / O(capacity), no matter
+how many queries the instance has handled.
+"""
+
+import json
+import threading
+from collections import Counter, deque
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+DEFAULT_CAPACITY = 500
+
+
+class SecurityEventLog:
+    """Fixed-capacity ring buffer of security events with O(1) counters."""
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY,
+                 spill_path: Optional[Union[str, Path]] = None):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self.spill_path = Path(spill_path) if spill_path else None
+        self.total = 0           # Events recorded over the lifetime of the log
+        self.spilled = 0         # Events evicted from the ring (written to spill file if set)
+        self._events: deque = deque(maxlen=capacity)
+        self._by_result: Counter = Counter()
+        self._by_check: Counter = Counter()
+        self._by_check_result: Counter = Counter()
+        self._spill_file = None
+        self._lock = threading.Lock()
+
+    # ── list-like surface (existing callers use append/len/iter) ───
+
+    def append(self, event: Dict[str, Any]) -> None:
+        """Record an event, evicting (and spilling) the oldest one if full."""
+        check = event.get("check", "unknown")
+        result = event.get("result", "UNKNOWN")
+
+        with self._lock:
+            if len(self._events) == self.capacity:
+                self._spill(self._events[0])
+                self.spilled += 1
+            self._events.append(event)
+            self.total += 1
+            self._by_result[result] += 1
+            self._by_check[check] += 1
+            self._by_check_result[(check, result)] += 1
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    def __bool__(self) -> bool:
+        return self.total > 0
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return iter(self.recent())
+
+    # ── O(1) statistics ────────────────────────────────────────────
+
+    def count(self, result: Optional[str] = None, check: Optional[str] = None) -> int:
+        """Lifetime count of events, optionally filtered by result and/or check."""
+        if result is not None and check is not None:
+            return self._by_check_result[(check, result)]
+        if result is not None:
+            return self._by_result[result]
+        if check is not None:
+            return self._by_check[check]
+        return self.total
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of the running counters (size bounded by the number of check types)."""
+        with self._lock:
+            by_check: Dict[str, Dict[str, int]] = {}
+            for (check, result), n in self._by_check_result.items():
+                by_check.setdefault(check, {})[result] = n
+            return {
+                "total": self.total,
+                "retained": len(self._events),
+                "spilled": self.spilled,
+                "capacity": self.capacity,
+                "by_result": dict(self._by_result),
+                "by_check": by_check,
+                "spill_path": str(self.spill_path) if self.spill_path else None,
+            }
+
+    def recent(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Return a copy of the retained events (oldest first), optionally only the last `limit`."""
+        with self._lock:
+            events = list(self._events)
+        return events[-limit:] if limit else events
+
+    @property
+    def first_retained_seq(self) -> int:
+        """1-based sequence number of the oldest event still in the ring."""
+        return self.total - len(self._events) + 1
+
+    # ── spill file ─────────────────────────────────────────────────
+
+    def _spill(self, event: Dict[str, Any]) -> None:
+        """Append an evicted event to the JSONL spill file (caller holds the lock)."""
+        if not self.spill_path:
+            return
+        if self._spill_file is None:
+            self.spill_path.parent.mkdir(parents=True, exist_ok=True)
+            self._spill_file = open(self.spill_path, "a", encoding="utf-8", buffering=1)
+        self._spill_file.write(json.dumps(event, default=str) + "\n")
+
+    def flush(self) -> None:
+        """Write the events still in the ring to the spill file and clear the ring."""
+        if not self.spill_path:
+            return
+        with self._lock:
+            while self._events:
+                self._spill(self._events.popleft())
+                self.spilled += 1
+            if self._spill_file is not None:
+                self._spill_file.flush()
+
+    def close(self) -> None:
+        """Close the spill file (the ring and counters are kept)."""
+        with self._lock:
+            if self._spill_file is not None:
+                self._spill_file.close()
+                self._spill_file = None
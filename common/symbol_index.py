@@ -0,0 +1,394 @@
+"""
+symbol_index.py
+────────────────────────────────────────────────────────────────────
+Exact symbol lookup for the code index.
+
+Searching the code collection for an identifier such as `filter_chunks`
+embeds the name and runs an approximate nearest-neighbour search, which
+is slow for what it is and often ranks the definition below chunks that
+merely look similar. tools/index_code.py therefore also writes a symbol
+table next to the Chroma database, and tools/search.py answers
+identifier-shaped queries from it first:
+
+  - definitions of functions, methods, classes and constants, and the
+    references to them, each with file, line and enclosing scope.
+    Python is read from its syntax tree; other languages with line
+    patterns (def/function/fn/func, class/struct/interface/..., C-style
+    function heads, UPPER_CASE constants)
+  - references are only kept for names that are defined somewhere in
+    the project, which keeps the table small
+  - the table is one file, sorted by lower-cased name, with a table of
+    record offsets; SymbolIndex memory-maps it and binary-searches it, so
+    an exact or prefix lookup reads a few dozen records, not the table
+
+On-disk layout (little-endian):
+
+    header   magic, records, definitions, files, size of the file list
+    files    file paths, "\\n"-separated (records refer to them by number)
+    offsets  (records + 1) × uint32, start of each record in the records area
+    records  "key\\tname\\tkind\\tline\\tfile\\tscope" as UTF-8, sorted
+"""
+
+import ast
+import mmap
+import os
+import re
+import struct
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Tuple, Union
+
+# Written into the Chroma directory, so a fresh index build replaces it
+SYMBOL_INDEX_NAME = "symbols.idx"
+
+_MAGIC = b"SYMIDX1\n"
+_HEADER = struct.Struct("<8sIIII")
+_OFFSET = struct.Struct("<I")
+_SPAN = struct.Struct("<II")
+
+DEFINITION_KINDS = ("class", "function", "method", "constant")
+REFERENCE = "reference"
+
+# Stored kind codes, and the order of kinds within a name (definitions first)
+_KIND_CODES = {"class": "c", "function": "f", "method": "m", "constant": "k", REFERENCE: "r"}
+_CODE_KINDS = {code: kind for kind, code in _KIND_CODES.items()}
+_KIND_ORDER = {kind: rank for rank, kind in enumerate((*DEFINITION_KINDS, REFERENCE))}
+
+# (name, kind, line, scope) as found in one file
+RawSymbol = Tuple[str, str, int, str]
+
+
+class Symbol(NamedTuple):
+    """A definition of, or reference to, a name."""
+    name: str
+    kind: str          # class, function, method, constant or reference
+    file_path: str
+    line: int
+    scope: str         # Enclosing class/function, dotted ("" at module level)
+
+    @property
+    def qualname(self) -> str:
+        return f"{self.scope}.{self.name}" if self.scope else self.name
+
+    @property
+    def is_definition(self) -> bool:
+        return self.kind != REFERENCE
+
+
+def symbol_index_path(chroma_path: Union[str, Path]) -> Path:
+    """Where the symbol table of the code database at `chroma_path` lives."""
+    return Path(chroma_path) / SYMBOL_INDEX_NAME
+
+
+# ╔════════════════════════════════════════════════════════════════╗
+# 1.  Extraction                                                   ║
+# ╚════════════════════════════════════════════════════════════════╝
+
+_CONSTANT_NAME = re.compile(r"[A-Z][A-Z0-9_]*[A-Z0-9]\Z")
+_IDENTIFIER = re.compile(r"[A-Za-z_$][\w$]*")
+
+_MODIFIERS = (r"(?:(?:export|default|async|abstract|sealed|final|public|private|protected|"
+              r"internal|static|partial|data|unsafe|extern|inline|override|open|suspend|"
+              r"local|pub(?:\([^)]*\))?)\s+)*")
+
+# (kind, pattern); group 1 is the defined name. Tried in order, first match wins
+_DEFINITION_PATTERNS = [
+    ("function", re.compile(_MODIFIERS + r"(?:function\*?|def|fn|fun|func|sub|proc)\s+"
+                            r"(?:\([^)]*\)\s*)?(?:self\.)?([A-Za-z_$][\w$]*[?!]?)")),
+    ("class", re.compile(_MODIFIERS + r"(?:class|interface|struct|enum|trait|module|protocol|"
+                         r"object|record|type)\s+([A-Za-z_]\w*)")),
+    ("function", re.compile(r"\s*(?:export\s+)?(?:const|let|var)\s+([A-Za-z_$][\w$]*)\s*=\s*"
+                            r"(?:async\s+)?(?:function\b|\([^)]*\)\s*=>|[A-Za-z_$][\w$]*\s*=>)")),
+    ("constant", re.compile(r"\s*#\s*define\s+([A-Z][A-Z0-9_]*[A-Z0-9])\b")),
+    ("constant", re.compile(_MODIFIERS + r"(?:(?:const|let|var|val|readonly|static|final)\s+)*"
+                            r"(?:[\w<>\[\],.]+\s+)?([A-Z][A-Z0-9_]*[A-Z0-9])\s*(?::[^=]+)?=(?![=>])")),
+]
+
+# C-family function heads: `int main(int argc, ...`, `void Foo::bar() {`
+_C_FUNCTION = re.compile(r"\s*(?:[A-Za-z_][\w:<>,*&\[\]]*\s+)+[*&]*([A-Za-z_][\w:~]*)\s*\([^;]*$")
+_C_LANGUAGES = {"c", "cpp", "java", "csharp", "objective-c"}
+_NOT_DEFINITIONS = {"if", "for", "while", "switch", "return", "catch", "sizeof", "else", "new",
+                    "delete", "case", "do", "throw", "await", "yield", "goto", "using", "import"}
+
+
+def text_symbols(text: str, language: str, first_line: int = 1) -> List[RawSymbol]:
+    """
+    Definitions and references in source text, by line patterns.
+
+    Parameters
+    ----------
+    text : str
+        Source text (a whole file or one chunk of it).
+    language : str
+        Language name as in index_code.py's CODE_EXTENSIONS.
+    first_line : int
+        Line number of the first line of `text`.
+
+    Returns
+    -------
+    List[RawSymbol]
+        (name, kind, line, scope) tuples; scope is always "". Every
+        identifier on a line counts as a reference, once per line.
+    """
+    patterns = _DEFINITION_PATTERNS
+    if language in _C_LANGUAGES:
+        patterns = patterns + [("function", _C_FUNCTION)]
+
+    found: List[RawSymbol] = []
+    for line_no, line in enumerate(text.split("\n"), first_line):
+        defined = None
+        for kind, pattern in patterns:
+            match = pattern.match(line)
+            if match is None:
+                continue
+            name = match.group(1).rsplit("::", 1)[-1]
+            if name not in _NOT_DEFINITIONS and line.split(None, 1)[0] not in _NOT_DEFINITIONS:
+                defined = name
+                found.append((name, kind, line_no, ""))
+            break
+        for name in dict.fromkeys(_IDENTIFIER.findall(line)):
+            if name != defined and len(name) > 1:
+                found.append((name, REFERENCE, line_no, ""))
+    return found
+
+
+def python_symbols(code: str) -> List[RawSymbol]:
+    """
+    Definitions and references in Python source, from its syntax tree.
+
+    Functions, methods and classes at any depth are definitions, as are
+    UPPER_CASE names assigned at module or class level. Names read, and
+    attributes accessed, are references (scoped to the function or class
+    they appear in), as are names imported with `from ... import`.
+    Falls back to text_symbols() if the source does not parse.
+    """
+    try:
+        tree = ast.parse(code)
+    except (SyntaxError, ValueError, RecursionError):
+        return text_symbols(code, "python")
+
+    found: List[RawSymbol] = []
+    seen_references = set()
+
+    def reference(name: str, line: int, scope: str) -> None:
+        if len(name) > 1 and (name, line) not in seen_references:
+            seen_references.add((name, line))
+            found.append((name, REFERENCE, line, scope))
+
+    # (node, scope, "module" | "class" | "function"); iterative, as
+    # generated expressions can nest deeper than the recursion limit
+    stack = [(tree, "", "module")]
+    while stack:
+        node, scope, level = stack.pop()
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                is_class = isinstance(child, ast.ClassDef)
+                kind = "class" if is_class else "method" if level == "class" else "function"
+                found.append((child.name, kind, child.lineno, scope))
+                inner = f"{scope}.{child.name}" if scope else child.name
+                stack.append((child, inner, "class" if is_class else "function"))
+                continue
+            if level != "function" and isinstance(child, (ast.Assign, ast.AnnAssign)):
+                targets = child.targets if isinstance(child, ast.Assign) else [child.target]
+                for target in targets:
+                    names = target.elts if isinstance(target, (ast.Tuple, ast.List)) else [target]
+                    for name in names:
+                        if isinstance(name, ast.Name) and _CONSTANT_NAME.match(name.id):
+                            found.append((name.id, "constant", name.lineno, scope))
+            elif isinstance(child, ast.Name) and isinstance(child.ctx, ast.Load):
+                reference(child.id, child.lineno, scope)
+            elif isinstance(child, ast.Attribute) and isinstance(child.ctx, ast.Load):
+                reference(child.attr, child.end_lineno or child.lineno, scope)
+            elif isinstance(child, ast.ImportFrom):
+                for alias in child.names:
+                    reference(alias.name, child.lineno, scope)
+            stack.append((child, scope, level))
+    return found
+
+
+# ╔════════════════════════════════════════════════════════════════╗
+# 2.  Building the table                                           ║
+# ╚════════════════════════════════════════════════════════════════╝
+
+class SymbolTable:
+    """Symbols per file, written out as a sorted SymbolIndex file."""
+
+    def __init__(self):
+        self.files: Dict[str, List[RawSymbol]] = {}
+
+    def set_file(self, file_path: str, symbols: Iterable[RawSymbol]) -> None:
+        """Replace the symbols of one file."""
+        symbols = list(symbols)
+        if symbols:
+            self.files[file_path] = symbols
+        else:
+            self.files.pop(file_path, None)
+
+    def remove_file(self, file_path: str) -> None:
+        self.files.pop(file_path, None)
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "SymbolTable":
+        """The table an index file was written from (empty if there is none)."""
+        table = cls()
+        try:
+            index = SymbolIndex(path)
+        except (OSError, ValueError):
+            return table
+        with index:
+            for symbol in index:
+                table.files.setdefault(symbol.file_path, []).append(
+                    (symbol.name, symbol.kind, symbol.line, symbol.scope))
+        return table
+
+    def write(self, path: Union[str, Path]) -> Dict[str, int]:
+        """
+        Write the sorted index file (atomically: readers keep the old one open).
+
+        Returns
+        -------
+        Dict[str, int]
+            Number of definitions, references and files, and the file size in bytes.
+        """
+        path = Path(path)
+        file_names = sorted(self.files)
+        defined = {name for symbols in self.files.values()
+                   for name, kind, _, _ in symbols if kind != REFERENCE}
+
+        rows = []
+        for file_id, file_name in enumerate(file_names):
+            for name, kind, line, scope in self.files[file_name]:
+                if kind == REFERENCE and name not in defined:
+                    continue
+                rows.append((name.lower(), name, _KIND_ORDER[kind], file_id, line, kind, scope))
+        rows.sort()
+        definitions = sum(1 for row in rows if row[5] != REFERENCE)
+
+        records = [
+            "\t".join((key, name, _KIND_CODES[kind], str(line), str(file_id), scope)).encode("utf-8")
+            for key, name, _, file_id, line, kind, scope in rows
+        ]
+        files_blob = "\n".join(file_names).encode("utf-8")
+        offsets, position = [], 0
+        for record in records:
+            offsets.append(position)
+            position += len(record)
+        offsets.append(position)
+
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, len(records), definitions, len(file_names), len(files_blob)))
+            f.write(files_blob)
+            f.write(struct.pack(f"<{len(offsets)}I", *offsets))
+            f.writelines(records)
+        os.replace(tmp, path)
+        return {"definitions": definitions, "references": len(records) - definitions,
+                "files": len(file_names), "bytes": path.stat().st_size}
+
+
+# ╔════════════════════════════════════════════════════════════════╗
+# 3.  Lookup                                                       ║
+# ╚════════════════════════════════════════════════════════════════╝
+
+def _module_name(file_path: str) -> str:
+    """Dotted module name of a file path ("pkg/mod.py" -> "pkg.mod")."""
+    return file_path.rsplit(".", 1)[0].replace("/", ".")
+
+
+def _qualified_by(scope: str, qualifier: str) -> bool:
+    return scope == qualifier or scope.endswith("." + qualifier)
+
+
+class SymbolIndex:
+    """Read-only, memory-mapped view of a symbol index file."""
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, count, definitions, file_count, files_size = _HEADER.unpack_from(self._mm, 0)
+        except struct.error:
+            magic = None
+        if magic != _MAGIC:
+            self._mm.close()
+            raise ValueError(f"{self.path} is not a symbol index")
+        self.count = count
+        self.definitions = definitions
+        files_start = _HEADER.size
+        self._files = (self._mm[files_start:files_start + files_size].decode("utf-8").split("\n")
+                       if file_count else [])
+        self._offsets = files_start + files_size
+        self._records = self._offsets + (count + 1) * _OFFSET.size
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _span(self, i: int) -> Tuple[int, int]:
+        start, end = _SPAN.unpack_from(self._mm, self._offsets + i * _OFFSET.size)
+        return self._records + start, self._records + end
+
+    def _key(self, i: int) -> bytes:
+        start, end = self._span(i)
+        return self._mm[start:self._mm.find(b"\t", start, end)]
+
+    def _symbol(self, i: int) -> Symbol:
+        start, end = self._span(i)
+        _, name, code, line, file_id, scope = self._mm[start:end].decode("utf-8").split("\t")
+        return Symbol(name, _CODE_KINDS[code], self._files[int(file_id)], int(line), scope)
+
+    def _bound(self, probe: bytes, prefix: bool) -> int:
+        """First record whose key is >= probe (keys cut to len(probe) if prefix)."""
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            key = self._key(mid)
+            if prefix:
+                key = key[:len(probe)]
+            if key < probe:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def lookup(self, query: str, prefix: bool = False) -> List[Symbol]:
+        """
+        Symbols named `query` (or starting with it, if `prefix`).
+
+        Exact lookups are case-sensitive, falling back to a case-insensitive
+        match when nothing matches exactly; prefix lookups ignore case. A
+        dotted query ("Class.method", "module.function") matches the
+        definitions whose qualified name ends with it. Definitions come
+        before references.
+        """
+        qualifier, _, name = query.rpartition(".")
+        probe = name.lower().encode("utf-8")
+        symbols = []
+        # Matching records are adjacent: find the first, then read while they match
+        i = self._bound(probe, prefix)
+        while i < self.count:
+            key = self._key(i)
+            if not (key.startswith(probe) if prefix else key == probe):
+                break
+            symbols.append(self._symbol(i))
+            i += 1
+
+        if qualifier:
+            symbols = [s for s in symbols if s.is_definition
+                       and _qualified_by(s.scope or _module_name(s.file_path), qualifier)]
+        if not prefix:
+            exact = [s for s in symbols if s.name == name]
+            symbols = exact or symbols
+        return sorted(symbols, key=lambda s: not s.is_definition)
+
+    def __iter__(self) -> Iterator[Symbol]:
+        for i in range(self.count):
+            yield self._symbol(i)
+
+    def close(self) -> None:
+        self._mm.close()
+
+    def __enter__(self) -> "SymbolIndex":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
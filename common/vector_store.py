@@ -0,0 +1,388 @@
+"""
+vector_store.py
+────────────────────────────────────────────────────────────────────
+Memory-mapped NumPy vector store: a lightweight read-only alternative to
+ChromaDB for search.py and the RAG classes.
+
+Opening a Chroma PersistentClient loads SQLite plus the HNSW index into
+the process, and every process holds its own copy. For knowledge bases of
+a few thousand to a few hundred thousand chunks an exact scan is fast
+enough, so MmapCollection keeps only files the OS page cache can share:
+
+  <store>/<collection>/
+    manifest.json   count, dim, dtype, model, distance space
+    vectors.npy     (count, dim) float16, or int8 with per-row scales
+    scales.npy      (count,) float32 dequantization scales (int8 only)
+    norms.npy       (count,) float32 squared norms of the stored vectors
+    records.jsonl   one [id, document, metadata] line per row
+    offsets.npy     (count + 1,) int64 byte offsets into records.jsonl
+
+Everything is opened with np.load(mmap_mode="r"), so opening is a few
+stat/mmap calls, RSS only grows by the pages actually touched, and those
+pages are shared between processes. Queries are exact: the query matrix
+is multiplied against blocks of stored vectors (one BLAS matmul per
+block) and a running top-k is kept with argpartition. Only the records of
+the returned rows are parsed.
+
+MmapCollection mirrors the parts of Chroma's Collection API the tools use
+(query, get, count), returning the same nested-list result shape with
+squared-L2 distances, so callers only change how the collection is
+opened. tools/convert_chroma_store.py builds a store from a chroma_db.
+"""
+
+import json
+import mmap
+import os
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Union
+
+import numpy as np
+
+FORMAT_VERSION = 1
+DTYPES = ("float16", "int8")
+BACKENDS = ("chroma", "mmap")
+BACKEND_ENV = "VECTOR_BACKEND"
+
+BLOCK_ROWS = 8192       # Rows dequantized per matmul (~12 MB of float32 at 384 dims)
+
+
+def default_store_path(chroma_path: Union[str, Path]) -> Path:
+    """Where the converter puts the mmap copy of a Chroma directory (./chroma_db -> ./chroma_db_mmap)."""
+    chroma_path = Path(chroma_path)
+    return chroma_path.with_name(chroma_path.name + "_mmap")
+
+
+def vector_backend(backend: Optional[str] = None) -> str:
+    """`backend`, else $VECTOR_BACKEND, else 'chroma'."""
+    backend = backend or os.environ.get(BACKEND_ENV) or "chroma"
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown vector backend '{backend}' (expected one of {BACKENDS})")
+    return backend
+
+
+# ╔════════════════════════════════════════════════════════════════╗
+# 1.  Metadata filters (subset of Chroma's `where` syntax)         ║
+# ╚════════════════════════════════════════════════════════════════╝
+
+_OPERATORS: Dict[str, Callable[[Any, Any], bool]] = {
+    "$eq": lambda value, operand: value == operand,
+    "$ne": lambda value, operand: value != operand,
+    "$in": lambda value, operand: value in operand,
+    "$nin": lambda value, operand: value not in operand,
+    "$gt": lambda value, operand: value is not None and value > operand,
+    "$gte": lambda value, operand: value is not None and value >= operand,
+    "$lt": lambda value, operand: value is not None and value < operand,
+    "$lte": lambda value, operand: value is not None and value <= operand,
+}
+
+
+def _matches(metadata: Dict[str, Any], where: Dict[str, Any]) -> bool:
+    """Evaluate {"key": value}, {"key": {"$op": operand}}, $and and $or against one row."""
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(_matches(metadata, c) for c in condition):
+                return False
+        elif key == "$or":
+            if not any(_matches(metadata, c) for c in condition):
+                return False
+        else:
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            value = metadata.get(key)
+            for op, operand in condition.items():
+                if op not in _OPERATORS:
+                    raise ValueError(f"Unsupported where operator '{op}'")
+                if not _OPERATORS[op](value, operand):
+                    return False
+    return True
+
+
+# ╔════════════════════════════════════════════════════════════════╗
+# 2.  Reading: MmapCollection                                      ║
+# ╚════════════════════════════════════════════════════════════════╝
+
+class MmapCollection:
+    """Read-only, Chroma-compatible collection backed by memory-mapped files."""
+
+    def __init__(self, path: Union[str, Path],
+                 embedding_function: Optional[Callable[[List[str]], List[Any]]] = None):
+        self.path = Path(path)
+        manifest_path = self.path / "manifest.json"
+        if not manifest_path.exists():
+            raise FileNotFoundError(f"No vector store collection at {self.path}")
+        self.manifest = json.loads(manifest_path.read_text())
+        self.name = self.manifest["name"]
+        self.metadata = self.manifest.get("metadata") or {}
+        self.dtype = self.manifest["dtype"]
+        self.space = self.manifest.get("space", "l2")     # Distances are always squared L2
+        self._count = int(self.manifest["count"])
+        self._embedding_function = embedding_function
+
+        self._vectors = np.load(self.path / "vectors.npy", mmap_mode="r")
+        self._norms = np.load(self.path / "norms.npy", mmap_mode="r")
+        self._offsets = np.load(self.path / "offsets.npy", mmap_mode="r")
+        self._scales = (np.load(self.path / "scales.npy", mmap_mode="r")
+                        if self.dtype == "int8" else None)
+        self._records = self._map_records()
+        self._id_index: Optional[Dict[str, int]] = None
+        self._metadata_cache: Optional[List[Dict[str, Any]]] = None
+
+    def _map_records(self):
+        with open(self.path / "records.jsonl", "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return b""
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    # ── record access ──────────────────────────────────────────────
+
+    def _record(self, row: int) -> List[Any]:
+        start, end = int(self._offsets[row]), int(self._offsets[row + 1])
+        return json.loads(self._records[start:end])
+
+    def _all_metadatas(self) -> List[Dict[str, Any]]:
+        """Every row's metadata (parsed once, only when a `where` filter needs it)."""
+        if self._metadata_cache is None:
+            self._metadata_cache = [self._record(i)[2] or {} for i in range(self._count)]
+        return self._metadata_cache
+
+    def _rows_for_ids(self, ids: Sequence[str]) -> List[int]:
+        if self._id_index is None:
+            self._id_index = {self._record(i)[0]: i for i in range(self._count)}
+        return [self._id_index[i] for i in ids if i in self._id_index]
+
+    def _filter_mask(self, where: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        if not where:
+            return None
+        return np.fromiter((_matches(m, where) for m in self._all_metadatas()),
+                           dtype=bool, count=self._count)
+
+    def _dequantize(self, start: int, end: int) -> np.ndarray:
+        block = np.asarray(self._vectors[start:end], dtype=np.float32)
+        if self._scales is not None:
+            block *= self._scales[start:end, None]
+        return block
+
+    # ── Chroma Collection API ──────────────────────────────────────
+
+    def count(self) -> int:
+        return self._count
+
+    def query(self, query_embeddings: Optional[Sequence[Any]] = None,
+              query_texts: Optional[Sequence[str]] = None,
+              n_results: int = 10,
+              where: Optional[Dict[str, Any]] = None,
+              include: Iterable[str] = ("documents", "metadatas", "distances"),
+              **_: Any) -> Dict[str, Any]:
+        """Exact top-`n_results` by squared L2 distance for each query vector."""
+        if query_embeddings is None:
+            if query_texts is None:
+                raise ValueError("query() needs query_embeddings or query_texts")
+            query_embeddings = self._embed(list(query_texts))
+        queries = np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32))
+        rows, distances = self._top_k(queries, n_results, self._filter_mask(where))
+
+        include = set(include)
+        result: Dict[str, Any] = {"ids": [], "documents": None, "metadatas": None,
+                                  "distances": None, "embeddings": None}
+        for key in ("documents", "metadatas", "distances", "embeddings"):
+            if key in include:
+                result[key] = []
+        for q_rows, q_dist in zip(rows, distances):
+            records = [self._record(r) for r in q_rows]
+            result["ids"].append([rec[0] for rec in records])
+            if "documents" in include:
+                result["documents"].append([rec[1] for rec in records])
+            if "metadatas" in include:
+                result["metadatas"].append([rec[2] for rec in records])
+            if "distances" in include:
+                result["distances"].append([float(d) for d in q_dist])
+            if "embeddings" in include:
+                result["embeddings"].append([self._dequantize(r, r + 1)[0] for r in q_rows])
+        return result
+
+    def get(self, ids: Optional[Sequence[str]] = None,
+            where: Optional[Dict[str, Any]] = None,
+            limit: Optional[int] = None, offset: Optional[int] = None,
+            include: Iterable[str] = ("documents", "metadatas"),
+            **_: Any) -> Dict[str, Any]:
+        """Rows by id and/or metadata filter, in storage order."""
+        rows: Iterable[int] = self._rows_for_ids(ids) if ids is not None else range(self._count)
+        mask = self._filter_mask(where)
+        if mask is not None:
+            rows = [r for r in rows if mask[r]]
+        rows = list(rows)[offset or 0:]
+        if limit is not None:
+            rows = rows[:limit]
+
+        include = set(include)
+        records = [self._record(r) for r in rows]
+        return {
+            "ids": [rec[0] for rec in records],
+            "documents": [rec[1] for rec in records] if "documents" in include else None,
+            "metadatas": [rec[2] for rec in records] if "metadatas" in include else None,
+            "embeddings": ([self._dequantize(r, r + 1)[0] for r in rows]
+                           if "embeddings" in include else None),
+        }
+
+    # ── exact search ───────────────────────────────────────────────
+
+    def _top_k(self, queries: np.ndarray, k: int, mask: Optional[np.ndarray]):
+        """Blocked matmul scan keeping a running top-k per query; returns (rows, distances)."""
+        n_queries = len(queries)
+        k = min(k, self._count if mask is None else int(mask.sum()))
+        if k <= 0:
+            return [[] for _ in range(n_queries)], [[] for _ in range(n_queries)]
+
+        query_norms = np.einsum("ij,ij->i", queries, queries)[:, None]
+        best_dist = np.empty((n_queries, 0), dtype=np.float32)
+        best_rows = np.empty((n_queries, 0), dtype=np.int64)
+
+        for start in range(0, self._count, BLOCK_ROWS):
+            end = min(start + BLOCK_ROWS, self._count)
+            # ||x - q||^2 = ||x||^2 - 2 x.q + ||q||^2, with x.q from one sgemm per block
+            dist = self._norms[start:end][None, :] - 2.0 * (queries @ self._dequantize(start, end).T)
+            dist += query_norms
+            if mask is not None:
+                dist[:, ~mask[start:end]] = np.inf
+
+            dist = np.concatenate([best_dist, dist], axis=1)
+            rows = np.concatenate([best_rows, np.broadcast_to(
+                np.arange(start, end, dtype=np.int64), (n_queries, end - start))], axis=1)
+            if dist.shape[1] > k:
+                keep = np.argpartition(dist, k - 1, axis=1)[:, :k]
+                dist = np.take_along_axis(dist, keep, axis=1)
+                rows = np.take_along_axis(rows, keep, axis=1)
+            best_dist, best_rows = dist, rows
+
+        order = np.argsort(best_dist, axis=1, kind="stable")
+        best_dist = np.maximum(np.take_along_axis(best_dist, order, axis=1), 0.0)
+        best_rows = np.take_along_axis(best_rows, order, axis=1)
+        finite = np.isfinite(best_dist)
+        return ([r[f].tolist() for r, f in zip(best_rows, finite)],
+                [d[f].tolist() for d, f in zip(best_dist, finite)])
+
+    def _embed(self, texts: List[str]) -> List[Any]:
+        if self._embedding_function is None:
+            from common.embedding_cache import default_embedding_function
+            self._embedding_function = default_embedding_function()
+        return self._embedding_function(texts)
+
+    def __repr__(self) -> str:
+        return (f"MmapCollection(name={self.name!r}, count={self._count}, "
+                f"dim={self.manifest['dim']}, dtype={self.dtype})")
+
+
+class MmapVectorStore:
+    """A directory of MmapCollections, opened like a Chroma PersistentClient."""
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        if not self.path.is_dir():
+            raise FileNotFoundError(f"Vector store not found at {self.path}")
+
+    def list_collections(self) -> List[str]:
+        return sorted(p.parent.name for p in self.path.glob("*/manifest.json"))
+
+    def get_collection(self, name: str,
+                       embedding_function: Optional[Callable[[List[str]], List[Any]]] = None
+                       ) -> MmapCollection:
+        return MmapCollection(self.path / name, embedding_function)
+
+
+def open_mmap_collection(chroma_path: Union[str, Path], collection_name: str,
+                         store_path: Optional[Union[str, Path]] = None) -> MmapCollection:
+    """Open the mmap copy of `collection_name` converted from `chroma_path`."""
+    store = MmapVectorStore(store_path or default_store_path(chroma_path))
+    return store.get_collection(collection_name)
+
+
+# ╔════════════════════════════════════════════════════════════════╗
+# 3.  Writing: MmapCollectionWriter                                ║
+# ╚════════════════════════════════════════════════════════════════╝
+
+def quantize(vectors: np.ndarray, dtype: str):
+    """Return (stored array, per-row scales or None) for float16 or symmetric int8."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if dtype == "float16":
+        return vectors.astype(np.float16), None
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    stored = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return stored, scales.astype(np.float32)
+
+
+class MmapCollectionWriter:
+    """
+    Streams rows into a new collection directory with constant memory.
+
+    The vector files are preallocated for `count` rows and filled batch by
+    batch; the manifest is written last, so a half-written collection is
+    never opened.
+    """
+
+    def __init__(self, store_path: Union[str, Path], name: str, count: int, dim: int,
+                 dtype: str = "float16", model: Optional[str] = None,
+                 metadata: Optional[Dict[str, Any]] = None):
+        if dtype not in DTYPES:
+            raise ValueError(f"dtype must be one of {DTYPES}")
+        self.path = Path(store_path) / name
+        self.path.mkdir(parents=True, exist_ok=True)
+        (self.path / "manifest.json").unlink(missing_ok=True)
+        self.name, self.count, self.dim, self.dtype = name, count, dim, dtype
+        self.model = model
+        self.collection_metadata = metadata
+        self.written = 0
+
+        open_memmap = np.lib.format.open_memmap
+        self._vectors = open_memmap(self.path / "vectors.npy", mode="w+",
+                                    dtype=np.dtype(dtype), shape=(count, dim))
+        self._norms = open_memmap(self.path / "norms.npy", mode="w+", dtype=np.float32, shape=(count,))
+        self._offsets = open_memmap(self.path / "offsets.npy", mode="w+", dtype=np.int64, shape=(count + 1,))
+        self._scales = (open_memmap(self.path / "scales.npy", mode="w+", dtype=np.float32, shape=(count,))
+                        if dtype == "int8" else None)
+        self._records = open(self.path / "records.jsonl", "wb")
+        self._offsets[0] = 0
+
+    def add(self, ids: Sequence[str], embeddings: Any, documents: Sequence[Optional[str]],
+            metadatas: Sequence[Optional[Dict[str, Any]]]) -> None:
+        start, end = self.written, self.written + len(ids)
+        if end > self.count:
+            raise ValueError(f"More rows than the {self.count} declared")
+        stored, scales = quantize(np.asarray(embeddings, dtype=np.float32), self.dtype)
+        self._vectors[start:end] = stored
+        # Norms of the stored (dequantized) vectors keep distances exact for what is stored
+        dequantized = stored.astype(np.float32) * (scales[:, None] if scales is not None else 1.0)
+        self._norms[start:end] = np.einsum("ij,ij->i", dequantized, dequantized)
+        if scales is not None:
+            self._scales[start:end] = scales
+
+        position = int(self._offsets[start])
+        for i, (id_, doc, meta) in enumerate(zip(ids, documents, metadatas)):
+            line = json.dumps([id_, doc, meta], ensure_ascii=False).encode("utf-8") + b"\n"
+            self._records.write(line)
+            position += len(line)
+            self._offsets[start + i + 1] = position
+        self.written = end
+
+    def close(self) -> Path:
+        """Flush the files and write the manifest; returns the collection directory."""
+        if self.written != self.count:
+            raise ValueError(f"Declared {self.count} rows but wrote {self.written}")
+        self._records.close()
+        for array in (self._vectors, self._norms, self._offsets, self._scales):
+            if array is not None:
+                array.flush()
+        manifest = {
+            "format_version": FORMAT_VERSION,
+            "name": self.name,
+            "count": self.count,
+            "dim": self.dim,
+            "dtype": self.dtype,
+            "space": "l2",
+            "model": self.model,
+            "metadata": self.collection_metadata,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        (self.path / "manifest.json").write_text(json.dumps(manifest, indent=2))
+        return self.path
@@ -7,10 +7,18 @@ RAG System - HARDENED VERSION (Security Defenses Enabled)
 import logging
 import os
 import re
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Optional
 from pathlib import Path
 import requests
 import json
+import sys
+
+# ── Resolve shared helpers from the repo root ───────────────────────
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+from common.embedding_cache import QueryEmbeddingCache, get_query_cache, default_embedding_function
+from common.embeddings import EmbeddingRuntimeConfig
+from common.vector_store import open_mmap_collection, vector_backend as resolve_backend
 
 from chromadb import PersistentClient
 from chromadb.config import Settings, DEFAULT_TENANT, DEFAULT_DATABASE
@@ -276,17 +284,35 @@ class HardenedRAGSystem:
     """RAG system WITH security hardening via SecurityGuard"""
 
     def __init__(self, chroma_path: str = "./chroma_poisoned_db",
-                 collection_name: str = "pdf_documents"):
+                 collection_name: str = "pdf_documents",
+                 query_cache: Optional[QueryEmbeddingCache] = None,
+                 embedding_runtime: Optional[EmbeddingRuntimeConfig] = None,
+                 vector_backend: Optional[str] = None):
         self.chroma_path = Path(chroma_path)
         self.collection_name = collection_name
         self.chroma_client = None
         self.collection = None
+        # 'chroma' (default) or 'mmap' for the memory-mapped copy; $VECTOR_BACKEND also works
+        self.vector_backend = resolve_backend(vector_backend)
+        # Query vectors are cached (LRU) so repeated questions skip the embedding model;
+        # a custom ONNX runtime config (threads, batch size, ...) gets its own cache
+        if query_cache is None and embedding_runtime is not None:
+            query_cache = QueryEmbeddingCache(
+                embedding_function=default_embedding_function(embedding_runtime))
+        self.query_cache = query_cache or get_query_cache()
         # SECURITY: Initialize the SecurityGuard
         self.security_guard = SecurityGuard()
         self.connect_to_database()
 
     def connect_to_database(self):
 
+        if self.vector_backend == "mmap":
+            # float16/int8 copy written by tools/convert_chroma_store.py
+            self.collection = open_mmap_collection(self.chroma_path, self.collection_name)
+            logger.info(f"Opened mmap store for '{self.collection_name}' "
+                        f"({self.collection.count()} chunks)")
+            return
+
         if not self.chroma_path.exists():
             logger.error(f"Database not found at {self.chroma_path.resolve()}")
             raise FileNotFoundError(f"ChromaDB not found at {self.chroma_path}")
@@ -318,7 +344,7 @@ class HardenedRAGSystem:
             # multiple chunks from the same trusted source — giving the
             # model more context after untrusted chunks are filtered out.
             results = self.collection.query(
-                query_texts=[query],
+                query_embeddings=[self.query_cache.embed_query(query)],
                 n_results=max_results,
                 include=["documents", "metadatas", "distances"]
             )
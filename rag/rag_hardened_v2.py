@@ -27,9 +27,19 @@ import logging
 import os
 import re
 import json
-from typing import List, Dict, Tuple
+import sys
+from typing import List, Dict, Tuple, Optional
 from pathlib import Path
 
+# ── Resolve shared helpers from the repo root ───────────────────────
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+from common.security_log import SecurityEventLog
+from common.pipeline_metrics import PipelineMetrics, estimate_tokens
+from common.embedding_cache import QueryEmbeddingCache, get_query_cache, default_embedding_function
+from common.embeddings import EmbeddingRuntimeConfig
+from common.vector_store import open_mmap_collection, vector_backend as resolve_backend
+
 from chromadb import PersistentClient
 from chromadb.config import Settings, DEFAULT_TENANT, DEFAULT_DATABASE
 from huggingface_hub import InferenceClient
@@ -43,7 +53,12 @@ logger = logging.getLogger("rag-hardened-v2")
 
 HF_TOKEN = os.environ.get("HF_TOKEN", "")
 HF_MODEL = os.environ.get("HF_MODEL", "meta-llama/Llama-3.1-8B-Instruct")
-HF_CLIENT = InferenceClient(token=HF_TOKEN) if HF_TOKEN else None
+# Optional OpenAI-compatible endpoint (e.g. tools/llm_stub_server.py for offline load tests)
+HF_BASE_URL = os.environ.get("HF_BASE_URL", "")
+if HF_BASE_URL:
+    HF_CLIENT = InferenceClient(base_url=HF_BASE_URL, token=HF_TOKEN or "local")
+else:
+    HF_CLIENT = InferenceClient(token=HF_TOKEN) if HF_TOKEN else None
 
 
 # ═══════════════════════════════════════════════════════════════════
@@ -104,14 +119,22 @@ class AdvancedSecurityGuard:
     # ── v2: Content structure thresholds ───────────────────────────
     MAX_URL_DENSITY = 2
 
+    # ── Security log retention ─────────────────────────────────────
+    # The log is a fixed-size ring; older events are counted but dropped
+    # (or appended to LOG_SPILL_PATH as JSONL when a path is given)
+    LOG_CAPACITY = 500
+    LOG_SPILL_PATH = None
+
     # ── v2: Social engineering patterns ────────────────────────────
     # These catch content that passes injection detection but contains
     # social engineering — credential harvesting, authority claims,
     # decommissioning real services to redirect to fake ones
 
-    def __init__(self):
-        """Initialize with security log and integrity manifest"""
-        self.security_log = []
+    def __init__(self, log_capacity: int = LOG_CAPACITY,
+                 log_spill_path: Optional[str] = LOG_SPILL_PATH):
+        """Initialize with a bounded security log and integrity manifest"""
+        self.security_log = SecurityEventLog(capacity=log_capacity,
+                                             spill_path=log_spill_path)
         self.integrity_manifest = None
         self._load_manifest()
 
@@ -331,25 +354,29 @@ class AdvancedSecurityGuard:
 
         return safe_chunks
 
+    def get_security_stats(self) -> Dict:
+        """Running event counters per result and per check (constant time)."""
+        return self.security_log.stats()
+
     def get_security_report(self) -> str:
-        """Generate a summary report of all security events."""
-        if not self.security_log:
+        """Generate a summary report of recent security events."""
+        log = self.security_log
+        if not log:
             return "No security events recorded."
 
         report = "\nSECURITY REPORT (v2)\n"
         report += "=" * 60 + "\n"
 
-        blocked = sum(1 for e in self.security_log if e.get('result') == 'BLOCKED')
-        flagged = sum(1 for e in self.security_log if e.get('result') == 'FLAGGED')
-        warnings = sum(1 for e in self.security_log if e.get('result') == 'WARNING')
-
-        report += f"  Total events: {len(self.security_log)}\n"
-        report += f"  Blocked: {blocked}\n"
-        report += f"  Flagged: {flagged}\n"
-        report += f"  Warnings: {warnings}\n"
+        report += f"  Total events: {log.count()}\n"
+        report += f"  Blocked: {log.count('BLOCKED')}\n"
+        report += f"  Flagged: {log.count('FLAGGED')}\n"
+        report += f"  Warnings: {log.count('WARNING')}\n"
+        if log.spilled:
+            where = f" (spilled to {log.spill_path})" if log.spill_path else ""
+            report += f"  Showing last {len(log)} events; {log.spilled} older{where}\n"
         report += "-" * 60 + "\n"
 
-        for i, event in enumerate(self.security_log, 1):
+        for i, event in enumerate(log, log.first_retained_seq):
             report += f"\n  Event {i}: [{event.get('result')}] {event.get('check')}\n"
             if 'warnings' in event:
                 for w in event['warnings']:
@@ -373,18 +400,39 @@ class HardenedRAGSystemV2:
     """RAG system with ADVANCED security hardening (v1 + v2 defenses)"""
 
     def __init__(self, chroma_path: str = "./chroma_poisoned_db",
-                 collection_name: str = "pdf_documents"):
+                 collection_name: str = "pdf_documents",
+                 metrics_window: int = 1000,
+                 query_cache: Optional[QueryEmbeddingCache] = None,
+                 embedding_runtime: Optional[EmbeddingRuntimeConfig] = None,
+                 vector_backend: Optional[str] = None):
         self.chroma_path = Path(chroma_path)
         self.collection_name = collection_name
         self.chroma_client = None
         self.collection = None
+        # 'chroma' (default) or 'mmap' for the memory-mapped copy; $VECTOR_BACKEND also works
+        self.vector_backend = resolve_backend(vector_backend)
+        # Query vectors are cached (LRU) so repeated questions skip the embedding model;
+        # a custom ONNX runtime config (threads, batch size, ...) gets its own cache
+        if query_cache is None and embedding_runtime is not None:
+            query_cache = QueryEmbeddingCache(
+                embedding_function=default_embedding_function(embedding_runtime))
+        self.query_cache = query_cache or get_query_cache()
         self.security_guard = AdvancedSecurityGuard()
+        # Per-stage latency histograms (rolling window of recent queries)
+        self.metrics = PipelineMetrics(window=metrics_window)
         self.connect_to_database()
 
     def connect_to_database(self):
         """Connect to ChromaDB"""
         logger.info(f"Connecting to ChromaDB at {self.chroma_path}...")
 
+        if self.vector_backend == "mmap":
+            # float16/int8 copy written by tools/convert_chroma_store.py
+            self.collection = open_mmap_collection(self.chroma_path, self.collection_name)
+            logger.info(f"Opened mmap store for '{self.collection_name}' "
+                        f"({self.collection.count()} chunks)")
+            return
+
         if not self.chroma_path.exists():
             logger.error(f"Database not found at {self.chroma_path.resolve()}")
             raise FileNotFoundError(f"ChromaDB not found at {self.chroma_path}")
@@ -411,7 +459,7 @@ class HardenedRAGSystemV2:
             logger.info(f"[RETRIEVE] Searching for relevant context...")
 
             results = self.collection.query(
-                query_texts=[query],
+                query_embeddings=[self.query_cache.embed_query(query)],
                 n_results=max_results,
                 include=["documents", "metadatas", "distances"]
             )
@@ -506,11 +554,17 @@ ANSWER:"""
               show_sources: bool = True) -> Dict:
         """
         Advanced hardened pipeline with THREE security checkpoints.
+
+        The result includes a "metrics" entry with the duration of each
+        stage, chunk counts and the prompt size for this query; the same
+        numbers are folded into self.metrics for p50/p95/p99 reporting.
         """
         logger.info("=" * 60)
         logger.info(f"HARDENED v2 RAG Query: {question}")
         logger.info("=" * 60)
 
+        trace = self.metrics.start_query()
+
         # ════════════════════════════════════════════════════════════
         # SECURITY CHECKPOINT 0 (v2 NEW): Query-side injection scan
         # ════════════════════════════════════════════════════════════
@@ -518,20 +572,25 @@ ANSWER:"""
         # If unsafe, return immediately with security warning
 
         # STEP 1: RETRIEVE (fetch extra — some may be filtered out)
-        context_chunks = self.retrieve(question, max_results=max_context_chunks)
+        with trace.stage("retrieve"):
+            context_chunks = self.retrieve(question, max_results=max_context_chunks)
+        trace.count("chunks_retrieved", len(context_chunks))
 
         if not context_chunks:
             return {
                 "answer": "I couldn't find any relevant information.",
                 "sources": [],
                 "context_used": [],
-                "security_events": []
+                "security_events": [],
+                "metrics": self.metrics.record(trace, "no_context")
             }
 
         # ════════════════════════════════════════════════════════════
         # SECURITY CHECKPOINT 1: Filter chunks (v1 + v2 checks)
         # ════════════════════════════════════════════════════════════
-        safe_chunks = self.security_guard.filter_chunks(context_chunks)
+        with trace.stage("filter_chunks"):
+            safe_chunks = self.security_guard.filter_chunks(context_chunks)
+        trace.count("chunks_passed", len(safe_chunks))
 
         if not safe_chunks:
             return {
@@ -540,19 +599,26 @@ ANSWER:"""
                           "Please verify the knowledge base integrity.",
                 "sources": [],
                 "context_used": [],
-                "security_events": self.security_guard.security_log
+                "security_events": self.security_guard.security_log.recent(),
+                "metrics": self.metrics.record(trace, "all_chunks_blocked")
             }
 
         # STEP 2: AUGMENT (using only verified safe chunks)
-        prompt = self.build_prompt(question, safe_chunks)
+        with trace.stage("build_prompt"):
+            prompt = self.build_prompt(question, safe_chunks)
+        trace.count("prompt_chars", len(prompt))
+        trace.count("prompt_tokens", estimate_tokens(prompt))
 
         # STEP 3: GENERATE
-        answer = self.generate(prompt)
+        with trace.stage("generate"):
+            answer = self.generate(prompt)
+        trace.count("answer_tokens", estimate_tokens(answer))
 
         # ════════════════════════════════════════════════════════════
         # SECURITY CHECKPOINT 2: Scan LLM output
         # ════════════════════════════════════════════════════════════
-        output_safe, output_warnings = self.security_guard.scan_output(answer)
+        with trace.stage("scan_output"):
+            output_safe, output_warnings = self.security_guard.scan_output(answer)
 
         if not output_safe:
             print("\n" + "!" * 60)
@@ -583,7 +649,8 @@ ANSWER:"""
                 for chunk in safe_chunks
             ] if show_sources else [],
             "context_used": safe_chunks if show_sources else [],
-            "security_events": self.security_guard.security_log
+            "security_events": self.security_guard.security_log.recent(),
+            "metrics": self.metrics.record(trace, "ok" if output_safe else "output_flagged")
         }
 
         return response
@@ -668,7 +735,7 @@ if __name__ == "__main__":
         print("  - How do I get a refund?")
         print("=" * 60)
 
-        print("\nAsk your question (or 'quit'/'report'):")
+        print("\nAsk your question (or 'quit'/'report'/'metrics'):")
 
         while True:
             question = input("\n> ").strip()
@@ -684,6 +751,11 @@ if __name__ == "__main__":
                 print(report)
                 continue
 
+            if question.lower() == 'metrics':
+                print(rag.metrics.format_report())
+                print(rag.query_cache.format_stats())
+                continue
+
             if not question:
                 continue
 
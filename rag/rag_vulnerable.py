@@ -10,10 +10,18 @@ any prompt coaxing.
 
 import logging
 import os
-from typing import List, Dict
+from typing import List, Dict, Optional
 from pathlib import Path
 import requests
 import json
+import sys
+
+# ── Resolve shared helpers from the repo root ───────────────────────
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+from common.embedding_cache import QueryEmbeddingCache, get_query_cache, default_embedding_function
+from common.embeddings import EmbeddingRuntimeConfig
+from common.vector_store import open_mmap_collection, vector_backend as resolve_backend
 
 from chromadb import PersistentClient
 from chromadb.config import Settings, DEFAULT_TENANT, DEFAULT_DATABASE
@@ -35,17 +43,35 @@ class RAGSystem:
     """Standard RAG system - NO security hardening"""
 
     def __init__(self, chroma_path: str = "./chroma_poisoned_db",
-                 collection_name: str = "pdf_documents"):
+                 collection_name: str = "pdf_documents",
+                 query_cache: Optional[QueryEmbeddingCache] = None,
+                 embedding_runtime: Optional[EmbeddingRuntimeConfig] = None,
+                 vector_backend: Optional[str] = None):
         self.chroma_path = Path(chroma_path)
         self.collection_name = collection_name
         self.chroma_client = None
         self.collection = None
+        # 'chroma' (default) or 'mmap' for the memory-mapped copy; $VECTOR_BACKEND also works
+        self.vector_backend = resolve_backend(vector_backend)
+        # Query vectors are cached (LRU) so repeated questions skip the embedding model;
+        # a custom ONNX runtime config (threads, batch size, ...) gets its own cache
+        if query_cache is None and embedding_runtime is not None:
+            query_cache = QueryEmbeddingCache(
+                embedding_function=default_embedding_function(embedding_runtime))
+        self.query_cache = query_cache or get_query_cache()
         self.connect_to_database()
 
     def connect_to_database(self):
         """Connect to the ChromaDB database (which contains poisoned chunks)"""
         logger.info(f"Connecting to ChromaDB at {self.chroma_path}...")
 
+        if self.vector_backend == "mmap":
+            # float16/int8 copy written by tools/convert_chroma_store.py
+            self.collection = open_mmap_collection(self.chroma_path, self.collection_name)
+            logger.info(f"Opened mmap store for '{self.collection_name}' "
+                        f"({self.collection.count()} chunks)")
+            return
+
         if not self.chroma_path.exists():
             logger.error(f"Database not found at {self.chroma_path.resolve()}")
             logger.error("Run 'python create_poisoned_db.py' first.")
@@ -81,7 +107,7 @@ class RAGSystem:
             # equal representation — including poisoned documents that would
             # otherwise be outnumbered by legitimate ones.
             results = self.collection.query(
-                query_texts=[query],
+                query_embeddings=[self.query_cache.embed_query(query)],
                 n_results=max_results * 2,
                 include=["documents", "metadatas", "distances"]
             )
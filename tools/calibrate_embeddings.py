@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+calibrate_embeddings.py
+────────────────────────────────────────────────────────────────────
+Find the fastest ONNX runtime settings for the MiniLM embedding model on
+this machine and save them for every tool to use.
+
+The right thread count and batch size depend on core count, cache sizes
+and chunk lengths, so instead of guessing, this script embeds a sample
+corpus under different EmbeddingRuntimeConfig settings and keeps the
+one with the highest throughput. Every candidate's vectors are checked
+against Chroma's stock embedding function, so a faster setting can never
+change search results.
+
+Search strategy
+---------------
+Coordinate descent (default): tune the graph optimization level, then
+intra-op threads, then batch size, each with the best values found so
+far. `--full` measures the whole grid instead.
+
+The winner is written to ~/.cache/ai-security/embedding_runtime.json
+(or --output), which common.embeddings.load_runtime_config() reads, so
+index_pdfs.py, index_code.py, embed_server.py, search.py and the RAG
+classes pick it up automatically.
+
+Usage
+-----
+python calibrate_embeddings.py [--texts FILE | --chroma-path PATH] [--samples 256]
+                               [--full] [--output PATH] [--dry-run]
+"""
+
+# ───────────────────── standard-library imports ────────────────────
+import argparse
+import itertools
+import os
+import platform
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+import logging
+
+# ───────────────────── 3rd-party imports ───────────────────────────
+try:
+    import numpy as np
+except ImportError:
+    print("ERROR: numpy not installed. Install with: pip install numpy")
+    sys.exit(1)
+
+try:
+    import onnxruntime
+    from chromadb.utils.embedding_functions.onnx_mini_lm_l6_v2 import ONNXMiniLM_L6_V2
+except ImportError:
+    print("ERROR: chromadb/onnxruntime not installed. Install with: pip install chromadb")
+    sys.exit(1)
+
+# ───────────────────── shared helpers (repo root) ──────────────────
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+from common.embeddings import DEFAULT_CONFIG_PATH, EmbeddingRuntimeConfig, TunedMiniLM
+
+# ───────────────────── logging setup ───────────────────────────────
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# ╔════════════════════════════════════════════════════════════════╗
+# 1.  Configuration / constants                                    ║
+# ╚════════════════════════════════════════════════════════════════╝
+
+DEFAULT_SAMPLES = 256
+BATCH_SIZES = [8, 16, 32, 64, 128]
+GRAPH_LEVELS = ["basic", "extended", "all"]
+MIN_COSINE = 0.9999             # Candidate vectors must match the stock function
+
+WORDS = ("account password reset billing invoice support portal settings security "
+         "policy refund shipping order device warranty firmware update network "
+         "configure enable disable customer service contact hours troubleshooting").split()
+
+
+def thread_candidates() -> List[int]:
+    """1, 2, 4, ... up to the CPU count (plus the CPU count itself)."""
+    cpus = os.cpu_count() or 1
+    counts = {cpus}
+    n = 1
+    while n < cpus:
+        counts.add(n)
+        n *= 2
+    return sorted(counts)
+
+
+# ╔════════════════════════════════════════════════════════════════╗
+# 2.  Sample corpus                                                ║
+# ╚════════════════════════════════════════════════════════════════╝
+
+def synthetic_texts(n: int, seed: int = 0) -> List[str]:
+    """Chunk-like texts from one sentence up to ~800 characters, like the PDF indexer produces."""
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(n):
+        words = rng.randint(8, 140)
+        texts.append(" ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + ".")
+    return texts
+
+
+def load_texts(args) -> List[str]:
+    """Sample texts from --texts, an existing Chroma collection, or synthetic chunks."""
+    if args.texts:
+        lines = [l.strip() for l in args.texts.read_text(encoding="utf-8").splitlines() if l.strip()]
+        return lines[:args.samples]
+    if args.chroma_path:
+        from chromadb import PersistentClient
+        client = PersistentClient(path=str(args.chroma_path))
+        coll = client.get_collection(args.collection)
+        docs = coll.get(limit=args.samples, include=["documents"])["documents"]
+        if docs:
+            return docs
+        logger.warning(f"Collection '{args.collection}' is empty; using synthetic texts")
+    return synthetic_texts(args.samples)
+
+
+# ╔════════════════════════════════════════════════════════════════╗
+# 3.  Measurement                                                  ║
+# ╚════════════════════════════════════════════════════════════════╝
+
+def measure(config: EmbeddingRuntimeConfig, texts: List[str], reference: np.ndarray,
+            repeat: int) -> Tuple[float, float]:
+    """Return (texts/sec, min cosine vs reference) for one configuration."""
+    function = TunedMiniLM(config)
+    vectors = np.asarray(function(texts[:config.batch_size]))   # Session load + warmup
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        vectors = np.asarray(function(texts))
+        best = min(best, time.perf_counter() - t0)
+    cosine = float(np.min(np.sum(vectors * reference, axis=1)))
+    return len(texts) / best, cosine
+
+
+def calibrate(texts: List[str], full: bool, repeat: int) -> Tuple[EmbeddingRuntimeConfig, float, List[Dict]]:
+    """Search the settings space; returns (best config, its texts/sec, all measurements)."""
+    stock = ONNXMiniLM_L6_V2()
+    reference = np.asarray(stock(texts))
+    t0 = time.perf_counter()
+    stock(texts)
+    stock_rate = len(texts) / (time.perf_counter() - t0)
+    logger.info(f"Stock Chroma embedding function: {stock_rate:.1f} texts/sec")
+
+    results: List[Dict] = []
+    cache: Dict[Tuple, float] = {}
+
+    def run(config: EmbeddingRuntimeConfig) -> float:
+        key = tuple(config.as_dict().values())
+        if key in cache:
+            return cache[key]
+        rate, cosine = measure(config, texts, reference, repeat)
+        valid = cosine >= MIN_COSINE
+        cache[key] = rate if valid else 0.0
+        results.append({**config.as_dict(), "texts_per_sec": round(rate, 1),
+                        "min_cosine": round(cosine, 6), "valid": valid})
+        logger.info(f"  threads={config.intra_op_threads:<3} batch={config.batch_size:<4} "
+                    f"graph={config.graph_optimization:<9} {rate:8.1f} texts/sec"
+                    + ("" if valid else f"  REJECTED (cosine {cosine:.5f})"))
+        return cache[key]
+
+    base = EmbeddingRuntimeConfig()
+    if full:
+        for level, threads, batch in itertools.product(GRAPH_LEVELS, thread_candidates(), BATCH_SIZES):
+            run(base.updated(graph_optimization=level, intra_op_threads=threads, batch_size=batch))
+    else:
+        best = base
+        for field, values in (("graph_optimization", GRAPH_LEVELS),
+                              ("intra_op_threads", thread_candidates()),
+                              ("batch_size", BATCH_SIZES)):
+            # The current value stays a candidate (e.g. threads=0, the onnxruntime default)
+            candidates = [best] + [best.updated(**{field: v}) for v in values]
+            best = max(candidates, key=run)
+
+    winner = max(results, key=lambda r: r["texts_per_sec"] if r["valid"] else -1)
+    config = EmbeddingRuntimeConfig.from_dict(winner)
+    return config, winner["texts_per_sec"], results + [{"stock_texts_per_sec": round(stock_rate, 1)}]
+
+
+# ╔════════════════════════════════════════════════════════════════╗
+# 4.  CLI entry point                                              ║
+# ╚════════════════════════════════════════════════════════════════╝
+
+def main():
+    """Parse command-line arguments, calibrate and save the fastest settings."""
+    parser = argparse.ArgumentParser(
+        description="Pick the fastest ONNX embedding runtime settings for this machine.",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Calibrate on synthetic chunk-sized texts and save the result
+  python calibrate_embeddings.py
+
+  # Calibrate on real chunks from an existing index
+  python calibrate_embeddings.py --chroma-path ./chroma_db --collection pdf_documents
+
+  # Try every combination, print only
+  python calibrate_embeddings.py --full --dry-run
+        """
+    )
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--texts", type=Path, help="File with one sample text per line")
+    source.add_argument("--chroma-path", type=Path, help="Sample chunks from this ChromaDB")
+    parser.add_argument("--collection", default="pdf_documents",
+                        help="Collection to sample with --chroma-path (default: pdf_documents)")
+    parser.add_argument("--samples", type=int, default=DEFAULT_SAMPLES,
+                        help=f"Number of texts to embed per measurement (default: {DEFAULT_SAMPLES})")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="Timed runs per setting; the fastest counts (default: 3)")
+    parser.add_argument("--full", action="store_true",
+                        help="Measure the full grid instead of one parameter at a time")
+    parser.add_argument("--output", type=Path, default=DEFAULT_CONFIG_PATH,
+                        help=f"Where to save the winning settings (default: {DEFAULT_CONFIG_PATH})")
+    parser.add_argument("--dry-run", action="store_true", help="Print the result without saving")
+    args = parser.parse_args()
+
+    texts = load_texts(args)
+    if not texts:
+        logger.error("No sample texts to embed")
+        return
+
+    logger.info(f"Calibrating on {len(texts)} texts, {os.cpu_count()} CPUs, "
+                f"onnxruntime {onnxruntime.__version__}")
+    config, rate, results = calibrate(texts, args.full, args.repeat)
+    stock_rate = results[-1]["stock_texts_per_sec"]
+
+    print(f"\nFastest settings: {config}")
+    print(f"  {rate:.1f} texts/sec vs {stock_rate:.1f} with Chroma's defaults "
+          f"({rate / stock_rate:.2f}x)" if stock_rate else "")
+
+    if args.dry_run:
+        return
+    path = config.save(args.output, extra={
+        "texts_per_sec": rate,
+        "stock_texts_per_sec": stock_rate,
+        "cpu_count": os.cpu_count(),
+        "machine": platform.machine(),
+        "onnxruntime": onnxruntime.__version__,
+        "calibrated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    })
+    print(f"Saved to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+convert_chroma_store.py
+────────────────────────────────────────────────────────────────────
+Convert ChromaDB collections into the memory-mapped vector store used by
+`search.py --backend mmap` and the RAG classes' `vector_backend="mmap"`.
+
+The stored Chroma embeddings are copied as-is (nothing is re-embedded),
+quantized to float16 (default, half the size of float32) or int8 with a
+per-row scale (a quarter), and written page by page, so memory use stays
+flat regardless of collection size. See common/vector_store.py for the
+file layout.
+
+After converting, `--verify` compares exact top-k results on the stored
+vectors against the full-precision originals for a sample of rows, so the
+effect of quantization on ranking is measured rather than assumed.
+
+Usage
+-----
+python convert_chroma_store.py [--chroma-path PATH] [--collection NAME ...]
+                               [--output PATH] [--dtype float16|int8] [--verify N]
+
+Arguments:
+  --chroma-path   Source ChromaDB directory (default: ./chroma_db)
+  --collection    Collection(s) to convert (default: all collections)
+  --output        Store directory (default: <chroma-path>_mmap, e.g. ./chroma_db_mmap)
+  --dtype         Stored vector type: float16 or int8 (default: float16)
+  --batch-size    Rows read from Chroma per page (default: 1000)
+  --verify        Check recall@10 on N sample queries after converting (default: 100, 0 = off)
+"""
+
+# ───────────────────── standard-library imports ────────────────────
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import List, Optional
+import logging
+
+# ───────────────────── 3rd-party imports ───────────────────────────
+try:
+    import numpy as np
+except ImportError:
+    print("ERROR: numpy not installed. Install with: pip install numpy")
+    sys.exit(1)
+
+try:
+    from chromadb import PersistentClient
+    from chromadb.config import Settings, DEFAULT_TENANT, DEFAULT_DATABASE
+except ImportError:
+    print("ERROR: chromadb not installed. Install with: pip install chromadb")
+    sys.exit(1)
+
+# ───────────────────── shared helpers (repo root) ──────────────────
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+from common.vector_store import DTYPES, MmapCollection, MmapCollectionWriter, default_store_path
+
+# ───────────────────── logging setup ───────────────────────────────
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# ╔════════════════════════════════════════════════════════════════╗
+# 1.  Configuration / constants                                    ║
+# ╚════════════════════════════════════════════════════════════════╝
+
+DEFAULT_CHROMA_PATH = Path("./chroma_db")
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_VERIFY_QUERIES = 100
+VERIFY_K = 10
+
+# Chroma's default embedding model; recorded in the manifest
+DEFAULT_MODEL = "all-MiniLM-L6-v2"
+
+# ╔════════════════════════════════════════════════════════════════╗
+# 2.  Conversion                                                   ║
+# ╚════════════════════════════════════════════════════════════════╝
+
+def directory_size(path: Path) -> int:
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+
+
+def convert_collection(coll, output: Path, dtype: str, batch_size: int) -> Path:
+    """Copy one Chroma collection into `output/<name>` page by page."""
+    total = coll.count()
+    first = coll.get(limit=1, include=["embeddings"])
+    if total == 0 or first["embeddings"] is None or len(first["embeddings"]) == 0:
+        dim = 0
+    else:
+        dim = len(first["embeddings"][0])
+
+    writer = MmapCollectionWriter(output, coll.name, total, dim, dtype=dtype,
+                                  model=DEFAULT_MODEL, metadata=coll.metadata)
+    for offset in range(0, total, batch_size):
+        page = coll.get(limit=batch_size, offset=offset,
+                        include=["embeddings", "documents", "metadatas"])
+        writer.add(page["ids"], np.asarray(page["embeddings"], dtype=np.float32),
+                   page["documents"], page["metadatas"])
+        logger.info(f"  {coll.name}: {writer.written}/{total} rows")
+    return writer.close()
+
+
+def verify_collection(coll, converted: MmapCollection, n_queries: int) -> float:
+    """
+    Mean recall@10 of exact search on the converted store versus exact search
+    on Chroma's full-precision vectors, using stored rows as queries.
+    """
+    data = coll.get(include=["embeddings"])
+    originals = np.asarray(data["embeddings"], dtype=np.float32)
+    if len(originals) == 0:
+        return 1.0
+    rng = np.random.default_rng(0)
+    sample = rng.choice(len(originals), size=min(n_queries, len(originals)), replace=False)
+    queries = originals[sample]
+
+    k = min(VERIFY_K, len(originals))
+    exact = (np.einsum("ij,ij->i", originals, originals)[None, :] - 2.0 * queries @ originals.T)
+    expected = np.argsort(exact, axis=1)[:, :k]
+    got = converted.query(query_embeddings=queries, n_results=k, include=[])["ids"]
+
+    ids = np.asarray(data["ids"])
+    recalls = [len(set(ids[e]) & set(g)) / k for e, g in zip(expected, got)]
+    return float(np.mean(recalls))
+
+
+def convert(chroma_path: Path, output: Path, collections: Optional[List[str]] = None,
+            dtype: str = "float16", batch_size: int = DEFAULT_BATCH_SIZE,
+            verify: int = DEFAULT_VERIFY_QUERIES) -> None:
+    """
+    Convert the given (or all) collections of a ChromaDB directory.
+
+    Parameters
+    ----------
+    chroma_path : Path
+        Source ChromaDB directory.
+    output : Path
+        Store directory; each collection becomes a subdirectory.
+    collections : Optional[List[str]]
+        Collection names to convert (default: every collection).
+    dtype : str
+        'float16' or 'int8'.
+    batch_size : int
+        Rows read from Chroma per page.
+    verify : int
+        Number of sample queries for the recall check (0 disables it).
+    """
+    client = PersistentClient(
+        path=str(chroma_path),
+        settings=Settings(),
+        tenant=DEFAULT_TENANT,
+        database=DEFAULT_DATABASE,
+    )
+    names = collections or [c.name for c in client.list_collections()]
+    if not names:
+        logger.warning(f"No collections found in {chroma_path}")
+        return
+
+    for name in names:
+        coll = client.get_collection(name=name)
+        t0 = time.perf_counter()
+        path = convert_collection(coll, output, dtype, batch_size)
+        logger.info(f"Converted '{name}' ({coll.count()} rows, {dtype}) to {path} "
+                    f"in {time.perf_counter() - t0:.1f}s, "
+                    f"{directory_size(path) / 1e6:.1f} MB")
+
+        if verify:
+            recall = verify_collection(coll, MmapCollection(path), verify)
+            logger.info(f"  recall@{VERIFY_K} vs full-precision vectors: {recall:.4f}")
+
+    logger.info(f"Source ChromaDB size: {directory_size(chroma_path) / 1e6:.1f} MB")
+
+
+# ╔════════════════════════════════════════════════════════════════╗
+# 3.  CLI entry point                                              ║
+# ╚════════════════════════════════════════════════════════════════╝
+
+def main():
+    """Parse command-line arguments and convert the collections."""
+    parser = argparse.ArgumentParser(
+        description="Convert ChromaDB collections into a memory-mapped vector store.",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Convert the PDF index (writes ./chroma_db_mmap)
+  python convert_chroma_store.py
+
+  # Code index, int8 vectors
+  python convert_chroma_store.py --chroma-path ./chroma_code_db --dtype int8
+
+  # Then search it
+  python search.py --target pdfs --backend mmap
+        """
+    )
+    parser.add_argument("--chroma-path", type=Path, default=DEFAULT_CHROMA_PATH,
+                        help=f"Source ChromaDB directory (default: {DEFAULT_CHROMA_PATH})")
+    parser.add_argument("--collection", action="append", dest="collections",
+                        help="Collection to convert; repeatable (default: all)")
+    parser.add_argument("--output", type=Path,
+                        help="Store directory (default: <chroma-path>_mmap)")
+    parser.add_argument("--dtype", choices=DTYPES, default="float16",
+                        help="Stored vector type (default: float16)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f"Rows read from Chroma per page (default: {DEFAULT_BATCH_SIZE})")
+    parser.add_argument("--verify", type=int, default=DEFAULT_VERIFY_QUERIES,
+                        help=f"Sample queries for the recall check, 0 to skip "
+                             f"(default: {DEFAULT_VERIFY_QUERIES})")
+    args = parser.parse_args()
+
+    if not args.chroma_path.exists():
+        logger.error(f"ChromaDB not found at {args.chroma_path.resolve()}")
+        sys.exit(1)
+    if args.batch_size < 1:
+        logger.error("--batch-size must be at least 1")
+        sys.exit(1)
+
+    convert(args.chroma_path, args.output or default_store_path(args.chroma_path),
+            args.collections, args.dtype, args.batch_size, args.verify)
+
+
+if __name__ == "__main__":
+    main()
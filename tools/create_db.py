@@ -20,7 +20,6 @@ Usage:
 
 import subprocess
 import sys
-import re
 import logging
 from pathlib import Path
 
@@ -32,6 +31,11 @@ except ImportError:
     print("ERROR: chromadb not installed. Install with: pip install chromadb")
     exit(1)
 
+# ───────────────────── shared helpers (repo root) ──────────────────
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+from common.chunking import chunk_spans
+
 # ───────────────────── logging ─────────────────────────────────────
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -46,29 +50,6 @@ CHROMA_PATH = Path("./chroma_poisoned_db")
 COLLECTION_NAME = "pdf_documents"
 
 
-def chunk_text(text: str, chunk_size: int = 800, overlap: int = 200):
-    """Split text into overlapping chunks at sentence boundaries."""
-    if not text or len(text) <= chunk_size:
-        return [text] if text else []
-
-    chunks = []
-    sentences = re.split(r'(?<=[.!?])\s+', text)
-    current_chunk = ""
-
-    for sentence in sentences:
-        if len(current_chunk) + len(sentence) > chunk_size and current_chunk:
-            chunks.append(current_chunk.strip())
-            overlap_text = current_chunk[-overlap:] if len(current_chunk) > overlap else current_chunk
-            current_chunk = overlap_text + " " + sentence
-        else:
-            current_chunk += (" " if current_chunk else "") + sentence
-
-    if current_chunk.strip():
-        chunks.append(current_chunk.strip())
-
-    return chunks
-
-
 def inject_poisoned_chunks():
     """Read the poisoned document, chunk it, and inject into the vector DB."""
 
@@ -81,7 +62,8 @@ def inject_poisoned_chunks():
     logger.info(f"Read poisoned document: {POISONED_DOC.name} ({len(poisoned_text)} chars)")
 
     # ── 2. Chunk the poisoned text ─────────────────────────────────
-    chunks = chunk_text(poisoned_text)
+    spans = list(chunk_spans(poisoned_text))
+    chunks = [poisoned_text[start:end] for start, end in spans]
     logger.info(f"Created {len(chunks)} poisoned chunks")
 
     # ── 3. Connect to the existing ChromaDB ────────────────────────
@@ -102,8 +84,10 @@ def inject_poisoned_chunks():
             "page": i + 1,
             "type": "text",
             "chunk_index": i,
+            "char_start": start,
+            "char_end": end,
         }
-        for i in range(len(chunks))
+        for i, (start, end) in enumerate(spans)
     ]
 
     collection.add(
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+embed_server.py
+────────────────────────────────────────────────────────────────────
+Local embedding daemon: one warm MiniLM model shared by every tool.
+
+The indexers, search.py and the three RAG classes each used to load
+their own copy of the ONNX all-MiniLM-L6-v2 model in-process, paying the
+load time and memory every time and embedding with whatever batch size
+they happened to have. This server keeps a single model loaded and
+micro-batches concurrent requests: requests that arrive within
+`--max-wait-ms` of each other (up to `--max-batch` texts) are embedded
+in one model call, which keeps the CPU busy with full batches instead of
+many batch-of-one calls.
+
+Clients use common.remote_embeddings.RemoteEmbeddingFunction, a
+Chroma-compatible embedding function. Setting EMBED_SERVER_URL makes
+every tool in this repo use it automatically.
+
+Endpoints
+---------
+- POST /embed   {"texts": [...], "encoding": "float" | "base64"}
+                -> {"model": ..., "dim": 384, "embeddings": [[...]] | "<base64 float32>"}
+- GET  /health  model id, dimension and batching statistics
+
+Usage
+-----
+python embed_server.py [--port 8765] [--max-batch 64] [--max-wait-ms 5]
+
+export EMBED_SERVER_URL=http://127.0.0.1:8765
+python tools/search.py --target pdfs        # now embeds via the daemon
+"""
+
+# ───────────────────── standard-library imports ────────────────────
+import argparse
+import base64
+import json
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import logging
+
+# ───────────────────── 3rd-party imports ───────────────────────────
+try:
+    import numpy as np
+except ImportError:
+    print("ERROR: numpy not installed. Install with: pip install numpy")
+    sys.exit(1)
+
+# ───────────────────── shared helpers (repo root) ──────────────────
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+from common.embedding_cache import embedding_model_id
+from common.embeddings import TunedMiniLM, add_runtime_arguments, runtime_from_args
+
+# ───────────────────── logging setup ───────────────────────────────
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# ╔════════════════════════════════════════════════════════════════╗
+# 1.  Configuration / constants                                    ║
+# ╚════════════════════════════════════════════════════════════════╝
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_MAX_BATCH = 64          # Texts per model call
+DEFAULT_MAX_WAIT_MS = 5.0       # How long the first request waits for company
+MAX_TEXTS_PER_REQUEST = 4096    # Reject absurd payloads instead of queueing them
+
+# ╔════════════════════════════════════════════════════════════════╗
+# 2.  Micro-batcher                                                ║
+# ╚════════════════════════════════════════════════════════════════╝
+
+class MicroBatcher:
+    """
+    Collects texts from concurrent callers and embeds them in shared batches.
+
+    A single worker thread owns the model. Each submit() enqueues a request
+    and returns a Future; the worker takes the first waiting request, keeps
+    pulling more until `max_batch` texts are gathered or `max_wait_ms` has
+    passed, runs one model call and resolves every Future with its slice.
+    """
+
+    def __init__(self, embedding_function: Callable[[List[str]], List[Any]],
+                 max_batch: int = DEFAULT_MAX_BATCH,
+                 max_wait_ms: float = DEFAULT_MAX_WAIT_MS):
+        self.embedding_function = embedding_function
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._queue: "queue.Queue[Tuple[List[str], Future]]" = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self.requests = 0
+        self.texts = 0
+        self.batches = 0
+        self.embed_seconds = 0.0
+        self._worker = threading.Thread(target=self._run, name="embed-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, texts: List[str]) -> Future:
+        future: Future = Future()
+        if not texts:
+            future.set_result(np.zeros((0, 0), dtype=np.float32))
+        else:
+            self._queue.put((texts, future))
+        return future
+
+    def _run(self) -> None:
+        while True:
+            pending = [self._queue.get()]
+            size = len(pending[0][0])
+            deadline = time.perf_counter() + self.max_wait
+            while size < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                pending.append(item)
+                size += len(item[0])
+            self._embed(pending)
+
+    def _embed(self, pending: List[Tuple[List[str], Future]]) -> None:
+        texts = [t for batch, _ in pending for t in batch]
+        t0 = time.perf_counter()
+        try:
+            vectors = np.asarray(self.embedding_function(texts), dtype=np.float32)
+        except Exception as e:
+            for _, future in pending:
+                future.set_exception(e)
+            return
+        elapsed = time.perf_counter() - t0
+
+        offset = 0
+        for batch, future in pending:
+            future.set_result(vectors[offset:offset + len(batch)])
+            offset += len(batch)
+
+        with self._stats_lock:
+            self.requests += len(pending)
+            self.texts += len(texts)
+            self.batches += 1
+            self.embed_seconds += elapsed
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {
+                "requests": self.requests,
+                "texts": self.texts,
+                "batches": self.batches,
+                "mean_batch_size": round(self.texts / self.batches, 2) if self.batches else 0.0,
+                "embed_seconds": round(self.embed_seconds, 3),
+                "queued": self._queue.qsize(),
+            }
+
+
+# ╔════════════════════════════════════════════════════════════════╗
+# 3.  HTTP handler                                                 ║
+# ╚════════════════════════════════════════════════════════════════╝
+
+class EmbedHandler(BaseHTTPRequestHandler):
+    """Serves /embed and /health from `server.batcher`."""
+
+    server_version = "embed-server/1.0"
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, fmt: str, *args: Any) -> None:
+        logger.debug("%s - %s", self.address_string(), fmt % args)
+
+    def _send_json(self, status: int, body: Dict[str, Any]) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self) -> None:
+        if self.path.split("?")[0].rstrip("/") == "/health":
+            self._send_json(200, {"status": "ok", "model": self.server.model_id,
+                                  "dim": self.server.dim, **self.server.batcher.stats()})
+        else:
+            self._send_json(404, {"error": f"unknown endpoint {self.path}"})
+
+    def do_POST(self) -> None:
+        if self.path.split("?")[0].rstrip("/") != "/embed":
+            self._send_json(404, {"error": f"unknown endpoint {self.path}"})
+            return
+
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length)) if length else {}
+        except json.JSONDecodeError:
+            self._send_json(400, {"error": "body must be JSON"})
+            return
+
+        texts = body.get("texts")
+        if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+            self._send_json(400, {"error": "'texts' must be a list of strings"})
+            return
+        if len(texts) > MAX_TEXTS_PER_REQUEST:
+            self._send_json(413, {"error": f"at most {MAX_TEXTS_PER_REQUEST} texts per request"})
+            return
+
+        try:
+            vectors = self.server.batcher.submit(texts).result()
+        except Exception as e:
+            logger.error(f"Embedding failed: {e}")
+            self._send_json(500, {"error": str(e)})
+            return
+
+        response: Dict[str, Any] = {"model": self.server.model_id, "dim": self.server.dim}
+        if body.get("encoding") == "base64":
+            response["embeddings"] = base64.b64encode(
+                np.ascontiguousarray(vectors, dtype="<f4").tobytes()).decode("ascii")
+        else:
+            response["embeddings"] = vectors.tolist()
+        self._send_json(200, response)
+
+
+# ╔════════════════════════════════════════════════════════════════╗
+# 4.  Server lifecycle                                             ║
+# ╚════════════════════════════════════════════════════════════════╝
+
+def make_server(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                embedding_function: Optional[Callable[[List[str]], List[Any]]] = None,
+                max_batch: int = DEFAULT_MAX_BATCH,
+                max_wait_ms: float = DEFAULT_MAX_WAIT_MS) -> ThreadingHTTPServer:
+    """Load the model, warm it up and create (but do not start) the server."""
+    if embedding_function is None:
+        embedding_function = TunedMiniLM()      # Calibrated runtime settings, if any
+
+    t0 = time.perf_counter()
+    dim = len(embedding_function(["warmup"])[0])     # Forces the model load now, not on first request
+    logger.info(f"Model {embedding_model_id(embedding_function)} ready "
+                f"({dim} dims) in {time.perf_counter() - t0:.1f}s")
+
+    server = ThreadingHTTPServer((host, port), EmbedHandler)
+    server.daemon_threads = True
+    server.model_id = embedding_model_id(embedding_function)
+    server.dim = dim
+    server.batcher = MicroBatcher(embedding_function, max_batch, max_wait_ms)
+    return server
+
+
+def serve_in_thread(host: str = DEFAULT_HOST, port: int = 0,
+                    **kwargs: Any) -> Tuple[ThreadingHTTPServer, str]:
+    """Start an embedding server on a background thread; returns (server, base_url)."""
+    server = make_server(host, port, **kwargs)
+    thread = threading.Thread(target=server.serve_forever, name="embed-server", daemon=True)
+    thread.start()
+    bound_host, bound_port = server.server_address[:2]
+    return server, f"http://{bound_host}:{bound_port}"
+
+
+def main():
+    """Parse command-line arguments and run the embedding server until Ctrl+C."""
+    parser = argparse.ArgumentParser(
+        description="Shared local embedding server with dynamic micro-batching.",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Start the daemon
+  python embed_server.py
+
+  # Point every tool at it
+  export EMBED_SERVER_URL=http://127.0.0.1:8765
+
+  # Larger batches for bulk indexing, a little more queueing latency
+  python embed_server.py --max-batch 128 --max-wait-ms 20
+        """
+    )
+    parser.add_argument("--host", default=DEFAULT_HOST,
+                        help=f"Interface to bind (default: {DEFAULT_HOST})")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT,
+                        help=f"Port to listen on (default: {DEFAULT_PORT})")
+    parser.add_argument("--max-batch", type=int, default=DEFAULT_MAX_BATCH,
+                        help=f"Maximum texts per model call (default: {DEFAULT_MAX_BATCH})")
+    parser.add_argument("--max-wait-ms", type=float, default=DEFAULT_MAX_WAIT_MS,
+                        help=f"Time to wait for more requests before embedding "
+                             f"(default: {DEFAULT_MAX_WAIT_MS:g})")
+    add_runtime_arguments(parser)
+    args = parser.parse_args()
+
+    if args.max_batch < 1:
+        logger.error("--max-batch must be at least 1")
+        return
+
+    runtime = runtime_from_args(args)
+    logger.info(f"Embedding runtime: {runtime}")
+    server = make_server(args.host, args.port, embedding_function=TunedMiniLM(runtime),
+                         max_batch=args.max_batch, max_wait_ms=args.max_wait_ms)
+    logger.info(f"Embedding server listening on http://{args.host}:{args.port} "
+                f"(max batch {args.max_batch}, max wait {args.max_wait_ms:g} ms)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Stopping embedding server")
+    finally:
+        logger.info(f"Stats: {server.batcher.stats()}")
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -9,7 +9,8 @@ code search and RAG performance.
 High-level flow
 ---------------
 1. **Reset DB** – delete any existing code database for a clean start.
-2. **Scan codebase** – recursively find code files (Python, JS/TS, Java, Go, etc.)
+2. **Scan codebase** – find code files (Python, JS/TS, Java, Go, etc.) from
+   the git index, or by a .gitignore-aware directory walk
 3. **Language-aware chunking** – split code respecting language structure and
    token limits while preserving complete logical units.
 4. **Metadata extraction** – capture file path, language, line numbers, and context.
@@ -21,10 +22,22 @@ Best Practices
 --------------
 - **Multi-language support**: Python, JavaScript/TypeScript, Java, Go, Rust,
   C/C++, Ruby, PHP, C#, and more
-- **Semantic chunking**: Respects blank lines and logical boundaries
+- **Semantic chunking**: Python files follow the syntax tree (whole
+  functions, methods and classes, with qualified names in metadata); other
+  languages split at blank lines. Adjacent small blocks are then packed
+  together up to the token budget
 - **Token-aware**: Uses tiktoken to prevent chunks from exceeding context limits
 - **Rich metadata**: Language, file path, line numbers, file size for filtering
+- **File screening**: oversized, binary, minified, high-entropy and generated
+  files are skipped (and reported with the reason); large files are streamed
+- **Near-duplicate suppression**: repeated licence headers and copied code
+  are stored once, with the other locations listed in its metadata
 - **Separate database**: Uses ./chroma_code_db to avoid mixing with PDF vectors
+- **Symbol table**: definitions and references of functions, classes and
+  constants are written to <chroma-path>/symbols.idx, which search.py uses
+  for exact identifier lookups (see common/symbol_index.py)
+- **Watch mode**: --watch keeps the index in step with the working tree,
+  re-indexing only changed files and dropping vectors of deleted ones
 
 Usage
 -----
@@ -34,15 +47,39 @@ Arguments:
   --code-dir      Root directory to scan recursively (default: ../ - project root)
   --chroma-path   Output ChromaDB directory (default: ./chroma_code_db)
   --max-tokens    Maximum tokens per chunk (default: 500)
+  --no-pack       Keep every blank-line block as its own chunk
+  --max-file-bytes  Skip files larger than this (default: 1000000)
+  --allow-generated  Also index files marked as generated
+  --no-git        Walk the directory instead of reading the git file list
+  --watch         Keep running and re-index changed files (inotify, or polling)
+  --watch-debounce, --watch-poll-interval, --watch-polling
+                  Quiet time before re-indexing (1s), poll interval (2s), force polling
   --collection    ChromaDB collection name (default: code_index)
+  --embed-cache   SQLite embedding cache reused across runs (default: ./.embedding_cache.sqlite3)
+  --no-embed-cache  Disable the embedding cache
+  --embed-threads, --embed-inter-op-threads, --embed-batch-size, --graph-opt-level
+                  ONNX runtime overrides (defaults: tools/calibrate_embeddings.py output)
+                  (ignored with EMBED_SERVER_URL: pass them to tools/embed_server.py)
+  --hnsw-space, --hnsw-m, --hnsw-ef-construction, --hnsw-ef-search
+                  Distance space (l2/cosine/ip) and HNSW parameters (default: Chroma's)
+  --dedup-threshold, --dedup-shingle, --no-dedup
+                  Near-duplicate suppression (default: on, threshold 0.9, 5-word shingles)
 """
 
 # ───────────────────── standard-library imports ────────────────────
 import argparse
-import os
+import ast
+import bisect
+import itertools
+import math
+import mmap
+import re
 import shutil
+import sys
+import time
+from collections import Counter
 from pathlib import Path
-from typing import List, Dict, Any, Iterable
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Callable, Set, Tuple, Union
 import logging
 
 # ───────────────────── 3rd-party imports ───────────────────────────
@@ -63,6 +100,23 @@ except ImportError:
     print("ERROR: chromadb not installed. Install with: pip install chromadb")
     exit(1)
 
+# ───────────────────── shared helpers (repo root) ──────────────────
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+from common.embedding_store import (
+    EmbeddingDiskCache, DEFAULT_CACHE_PATH, DEFAULT_MAX_AGE_DAYS, DEFAULT_MAX_ENTRIES,
+)
+from common.embedding_cache import default_embedding_function
+from common.embeddings import add_runtime_arguments, runtime_arguments_given, runtime_from_args
+from common.remote_embeddings import embedding_server_url
+from common.hnsw import add_hnsw_arguments, hnsw_from_args
+from common.dedup import (
+    NearDuplicateFilter, add_dedup_arguments, dedup_from_args, record_occurrences, release_sources,
+)
+from common.file_discovery import discover_files
+from common.file_watch import FileWatcher, DEFAULT_DEBOUNCE_S, DEFAULT_POLL_INTERVAL_S
+from common.symbol_index import SymbolTable, python_symbols, symbol_index_path, text_symbols
+
 # ───────────────────── logging setup ───────────────────────────────
 logging.basicConfig(
     level=logging.INFO,
@@ -104,6 +158,34 @@ SKIP_DIRS = {
     "coverage", ".nyc_output",                # Test coverage reports
 }
 
+# Files larger than this are skipped: real source is rarely over 1 MB, and
+# anything that size is usually a bundle, a dump or generated code
+DEFAULT_MAX_FILE_BYTES = 1_000_000
+
+# Non-Python files above this are streamed line by line from an mmap
+# instead of being decoded into one string (Python needs the whole text
+# for its syntax tree)
+MMAP_THRESHOLD = 256 * 1024
+
+# File screening looks at the first SNIFF_BYTES only, so its cost does not
+# grow with the file
+SNIFF_BYTES = 64 * 1024
+MAX_AVG_LINE_LENGTH = 300       # Longer average lines: minified
+MAX_ENTROPY_BITS = 5.8          # Bits per byte; source is ~4.5-5.2, base64 ~6, compressed ~8
+
+# Markers of generated files, searched in the first GENERATED_HEAD_LINES
+# lines (further down they are usually about some other file)
+GENERATED_HEAD_LINES = 10
+GENERATED_MARKERS = re.compile(
+    rb"@generated|do not edit|auto-?generated|code generated by|"
+    rb"generated by the protocol buffer compiler|this file (?:is|was) (?:automatically )?generated",
+    re.IGNORECASE,
+)
+GENERATED_SUFFIXES = (
+    ".min.js", ".min.css", ".bundle.js", "_pb2.py", "_pb2_grpc.py", ".pb.go",
+    ".pb.h", ".pb.cc", ".g.dart", ".designer.cs", ".generated.ts", ".generated.cs",
+)
+
 # Supported code file extensions mapped to language names
 # This enables language-specific metadata and potential future language-aware processing
 # Extensions are mapped to normalized language names for consistent metadata
@@ -186,7 +268,7 @@ CODE_EXTENSIONS = {
 # 2.  Code chunking with language awareness                        ║
 # ╚════════════════════════════════════════════════════════════════╝
 
-def chunk_code(code: str, max_tokens: int = DEFAULT_MAX_TOKENS,
+def chunk_code(code: Union[str, Iterable[str]], max_tokens: int = DEFAULT_MAX_TOKENS,
                language: str = "generic") -> Iterable[Dict[str, Any]]:
     """
     Yield code chunks that respect language structure and token limits.
@@ -206,8 +288,9 @@ def chunk_code(code: str, max_tokens: int = DEFAULT_MAX_TOKENS,
 
     Parameters
     ----------
-    code : str
-        The source code to chunk.
+    code : Union[str, Iterable[str]]
+        The source code to chunk, or its lines (e.g. iter_file_lines(),
+        so a large file is never held as one string).
     max_tokens : int
         Maximum tokens per chunk.
     language : str
@@ -230,7 +313,7 @@ def chunk_code(code: str, max_tokens: int = DEFAULT_MAX_TOKENS,
 
     # Process the code line by line
     # We never split a line mid-line to preserve syntax validity
-    for line in code.splitlines():
+    for line in (code.splitlines() if isinstance(code, str) else code):
         # Count tokens for this line (including the newline character)
         # The +"\n" ensures we account for the newline in the token count
         line_tokens = len(enc.encode(line + "\n"))
@@ -288,6 +371,176 @@ def chunk_code(code: str, max_tokens: int = DEFAULT_MAX_TOKENS,
         }
 
 
+def pack_chunks(chunks: Iterable[Dict[str, Any]],
+                max_tokens: int = DEFAULT_MAX_TOKENS) -> Iterable[Dict[str, Any]]:
+    """
+    Merge adjacent chunks from chunk_code() or chunk_python() greedily up to max_tokens.
+
+    chunk_code() breaks at every blank line, so ordinary code becomes many
+    chunks of a few lines each, far below the token budget – and each one
+    costs an embedding and a vector. Packing joins neighbours back
+    together while they fit, so a chunk holds a few related blocks instead.
+
+    The blank lines between two merged chunks are put back (each counted
+    as one token), so line N of the packed text is line start_line + N of
+    the file. A chunk that is already at the budget is passed through.
+
+    Parameters
+    ----------
+    chunks : Iterable[Dict[str, Any]]
+        Chunks in file order with 'text', 'start_line', 'end_line' and
+        'token_count' fields; 'symbols' lists are concatenated.
+    max_tokens : int
+        Maximum tokens per packed chunk.
+
+    Yields
+    ------
+    Dict[str, Any]
+        Packed chunks with the same fields.
+    """
+    current: Optional[Dict[str, Any]] = None
+    for chunk in chunks:
+        if current is None:
+            current = dict(chunk)
+            continue
+
+        # Blank lines chunk_code() dropped between the two chunks
+        gap = chunk["start_line"] - current["end_line"] - 1
+        if current["token_count"] + gap + chunk["token_count"] <= max_tokens:
+            current["text"] += "\n" * (gap + 1) + chunk["text"]
+            current["end_line"] = chunk["end_line"]
+            current["token_count"] += gap + chunk["token_count"]
+            if "symbols" in chunk:
+                current["symbols"] = current.get("symbols", []) + chunk["symbols"]
+        else:
+            yield current
+            current = dict(chunk)
+
+    if current is not None:
+        yield current
+
+
+# Statements that chunk_python() keeps whole
+_PY_DEFINITIONS = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+
+
+def chunk_python(code: str, max_tokens: int = DEFAULT_MAX_TOKENS) -> Iterable[Dict[str, Any]]:
+    """
+    Yield chunks of Python source that follow its syntax tree.
+
+    chunk_code() only sees blank lines and token counts, so a function
+    with a blank line in it – or one that ends just past the budget – is
+    split across chunks. Here the module is parsed with `ast` instead:
+
+    1. Every top-level function and class is one unit, from its first
+       decorator (and any comment lines directly above it) to its last
+       line; the statements between definitions form units of their own.
+    2. A class over max_tokens is split into its methods (and the runs of
+       statements between them, the first one starting with the class
+       line), recursively for nested classes.
+    3. A function over max_tokens – the only thing split mid-body – is cut
+       at the last blank line that fits, or at the budget.
+
+    Each unit records the qualified names it defines in 'symbols' (for
+    a whole class, the class and its methods, e.g. 'Cache',
+    'Cache.get'). Leading and trailing blank lines are trimmed; pack the
+    result with pack_chunks() to merge small units up to max_tokens.
+    Source that does not parse falls back to chunk_code().
+
+    Parameters
+    ----------
+    code : str
+        Python source.
+    max_tokens : int
+        Maximum tokens per chunk.
+
+    Yields
+    ------
+    Dict[str, Any]
+        Each chunk with 'text', 'start_line', 'end_line', 'token_count'
+        and 'symbols' fields.
+    """
+    try:
+        tree = ast.parse(code)
+    except (SyntaxError, ValueError) as err:
+        logger.debug(f"Python source does not parse ({err}); chunking by lines")
+        yield from chunk_code(code, max_tokens, "python")
+        return
+
+    # Line numbering as the parser sees it (splitlines() also breaks on
+    # form feeds and other separators, which would shift every line after)
+    lines = re.split(r"\r\n|\r|\n", code)
+    enc = encoding_for_model("gpt-3.5-turbo")
+    prefix = list(itertools.accumulate((len(enc.encode(line + "\n")) for line in lines),
+                                       initial=0))
+
+    def tokens(start: int, end: int) -> int:
+        return prefix[end] - prefix[start - 1]
+
+    def unit(start: int, end: int, symbols: List[str]) -> Iterable[Dict[str, Any]]:
+        """The unit lines start..end (blank edges trimmed), cut at the budget if needed."""
+        while start <= end and not lines[start - 1].strip():
+            start += 1
+        while end >= start and not lines[end - 1].strip():
+            end -= 1
+        while start <= end:
+            stop = end
+            if tokens(start, end) > max_tokens:
+                # Last line that still fits; then the last blank line before it
+                stop = max(start, bisect.bisect_right(prefix, prefix[start - 1] + max_tokens) - 1)
+                blank = next((n for n in range(stop, start, -1) if not lines[n - 1].strip()), None)
+                if blank is not None:
+                    stop = blank - 1
+            piece_end = stop
+            while not lines[piece_end - 1].strip():
+                piece_end -= 1
+            yield {
+                "text": "\n".join(lines[start - 1:piece_end]),
+                "start_line": start,
+                "end_line": piece_end,
+                "token_count": tokens(start, piece_end),
+                "symbols": list(symbols),
+            }
+            start = stop + 1
+            while start <= end and not lines[start - 1].strip():
+                start += 1
+
+    def definition_start(node: ast.AST, floor: int) -> int:
+        """First line of a definition: its decorators and the comments right above."""
+        start = min([node.lineno] + [d.lineno for d in node.decorator_list])
+        while start - 1 >= floor and lines[start - 2].lstrip().startswith("#"):
+            start -= 1
+        return start
+
+    def body_units(body: List[ast.stmt], qual_prefix: str, start: int, end: int,
+                   run_symbols: List[str]) -> Iterable[Dict[str, Any]]:
+        """Units for the statements in `body`, covering lines start..end."""
+        cursor = start                      # First line not yet in a unit
+        for node in body:
+            if not isinstance(node, _PY_DEFINITIONS):
+                continue
+            node_start = definition_start(node, cursor)
+            if node_start > cursor:
+                yield from unit(cursor, node_start - 1, run_symbols)
+
+            name = qual_prefix + node.name
+            if isinstance(node, ast.ClassDef):
+                members = [f"{name}.{child.name}" for child in node.body
+                           if isinstance(child, _PY_DEFINITIONS)]
+                if tokens(node_start, node.end_lineno) > max_tokens and members:
+                    yield from body_units(node.body, name + ".", node_start,
+                                          node.end_lineno, [name])
+                else:
+                    yield from unit(node_start, node.end_lineno, [name] + members)
+            else:
+                yield from unit(node_start, node.end_lineno, [name])
+            cursor = node.end_lineno + 1
+        if cursor <= end:
+            yield from unit(cursor, end, run_symbols)
+
+    yield from body_units(tree.body, "", 1, len(lines), [])
+
+
 def should_index_file(file_path: Path) -> bool:
     """
     Determine if a file should be indexed based on extension and name.
@@ -349,6 +602,80 @@ def get_language(file_path: Path) -> str:
     return CODE_EXTENSIONS.get(file_path.suffix.lower(), "unknown")
 
 
+def screen_file(file_path: Path, file_size: int,
+                max_file_bytes: int = DEFAULT_MAX_FILE_BYTES,
+                allow_generated: bool = False) -> Optional[str]:
+    """
+    Reason not to index a file that passed should_index_file(), or None.
+
+    Only the first SNIFF_BYTES are read (through an mmap, so nothing is
+    copied for large files), so a multi-megabyte bundle costs as little
+    to reject as a small file:
+
+      - empty or whitespace only
+      - larger than `max_file_bytes`
+      - binary: a NUL byte in the sample
+      - minified: average line length over MAX_AVG_LINE_LENGTH
+      - high entropy: over MAX_ENTROPY_BITS per byte (embedded base64,
+        compressed or encrypted data)
+      - generated: a GENERATED_SUFFIXES name or a GENERATED_MARKERS
+        comment near the top (unless `allow_generated`)
+
+    Parameters
+    ----------
+    file_path : Path
+        File to check.
+    file_size : int
+        Its size in bytes.
+    max_file_bytes : int
+        Size cap.
+    allow_generated : bool
+        Index generated files (names and markers) anyway.
+
+    Returns
+    -------
+    Optional[str]
+        e.g. "minified (average line 812 chars)"; None to index the file.
+    """
+    if file_size > max_file_bytes:
+        return f"too large ({file_size / 1e6:.1f} MB > {max_file_bytes / 1e6:.1f} MB)"
+    if not allow_generated and file_path.name.lower().endswith(GENERATED_SUFFIXES):
+        return "generated (file name)"
+    if file_size == 0:
+        return "empty"
+
+    with open(file_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        sample = mm[:SNIFF_BYTES]
+
+    if not sample.strip():
+        return "empty" if file_size <= SNIFF_BYTES else None
+    if b"\0" in sample:
+        return "binary"
+
+    average_line = len(sample) / (sample.count(b"\n") + 1)
+    if average_line > MAX_AVG_LINE_LENGTH:
+        return f"minified (average line {average_line:.0f} chars)"
+
+    entropy = -sum(n / len(sample) * math.log2(n / len(sample))
+                   for n in Counter(sample).values())
+    if entropy > MAX_ENTROPY_BITS:
+        return f"high entropy ({entropy:.1f} bits/byte)"
+
+    if not allow_generated:
+        head = b"\n".join(sample.split(b"\n", GENERATED_HEAD_LINES)[:GENERATED_HEAD_LINES])
+        marker = GENERATED_MARKERS.search(head)
+        if marker:
+            return f"generated ({marker.group(0).decode('ascii', 'ignore')!r} marker)"
+    return None
+
+
+def iter_file_lines(file_path: Path) -> Iterator[str]:
+    """Decoded lines of a file, read from an mmap one line at a time."""
+    with open(file_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for raw in iter(mm.readline, b""):
+            yield raw.rstrip(b"\r\n").decode("utf-8", errors="ignore")
+
+
 def reset_chroma(db_path: Path) -> None:
     """
     Delete any existing ChromaDB directory to ensure a clean start.
@@ -374,8 +701,208 @@ def reset_chroma(db_path: Path) -> None:
 # 3.  Main indexing routine                                        ║
 # ╚════════════════════════════════════════════════════════════════╝
 
+def index_file(file_path: Path, code_dir: Path, collection: Any,
+               embed: Callable[[List[str]], List[Any]], max_tokens: int,
+               batch_size: int = 50,
+               dedup: Optional[NearDuplicateFilter] = None,
+               pack: bool = True,
+               max_file_bytes: int = DEFAULT_MAX_FILE_BYTES,
+               allow_generated: bool = False,
+               symbols: Optional[SymbolTable] = None) -> Optional[Dict[str, Any]]:
+    """
+    Chunk, embed and store one file; see index_codebase() for the options.
+    The file's definitions and references are recorded in `symbols` if given.
+
+    Returns
+    -------
+    Optional[Dict[str, Any]]
+        {"language", "chunks", "stored", "failed", "blocks"} for an indexed file,
+        {"skipped": reason} for a file screen_file() rejected, or None for
+        a file that is not code, unreadable or empty.
+    """
+    # ═══════════════════════════════════════════════════════════
+    # STEP A: Filter non-code files
+    # ═══════════════════════════════════════════════════════════
+    # Skip files that aren't source code (lock files, hidden files, etc.)
+    if not should_index_file(file_path):
+        return None
+
+    # ═══════════════════════════════════════════════════════════
+    # STEP B: Detect language and read file
+    # ═══════════════════════════════════════════════════════════
+    # Determine programming language from file extension
+    language = get_language(file_path)
+    rel_path = file_path.relative_to(code_dir)
+
+    # Skip huge, binary, minified and generated files before reading
+    # them; only the first few KB are looked at
+    try:
+        # File size in bytes, also stored for filtering in queries
+        file_size = file_path.stat().st_size
+        reason = screen_file(file_path, file_size, max_file_bytes, allow_generated)
+    except (OSError, ValueError) as err:
+        logger.warning(f"Could not read {file_path}: {err}")
+        return None
+    if reason:
+        logger.info(f"Skipped {rel_path}: {reason}")
+        return {"skipped": reason}
+
+    # Read the file contents
+    try:
+        # Use UTF-8 encoding with error tolerance
+        # errors="ignore" prevents crashes on files with encoding issues
+        if file_size > MMAP_THRESHOLD and language != "python":
+            # Large files are streamed line by line, never one big string
+            code_text = iter_file_lines(file_path)
+        else:
+            code_text = file_path.read_text(encoding="utf-8", errors="ignore")
+    except Exception as err:
+        logger.warning(f"Could not read {file_path}: {err}")
+        return None
+
+    # ═══════════════════════════════════════════════════════════
+    # STEP C: Chunk the code into logical units
+    # ═══════════════════════════════════════════════════════════
+    # Split the file into token-limited chunks with line tracking
+    # Python follows its syntax tree (whole functions and classes);
+    # everything else is split at blank lines
+    try:
+        if language == "python":
+            chunks = list(chunk_python(code_text, max_tokens))
+        else:
+            # A streamed file is only opened and read here, as chunk_code()
+            # pulls its lines (mmap raises ValueError if it is now empty)
+            chunks = list(chunk_code(code_text, max_tokens, language))
+    except (OSError, ValueError) as err:
+        logger.warning(f"Could not read {file_path}: {err}")
+        return None
+    chunks = [chunk for chunk in chunks if chunk["text"].strip()]
+    blocks = len(chunks)
+
+    # Merge the small blocks back up to the token budget
+    if pack:
+        chunks = list(pack_chunks(chunks, max_tokens))
+
+    # Skip files that produced no chunks (shouldn't happen but be safe)
+    if not chunks:
+        return None
+
+    # Definitions and references for search.py's exact symbol lookup;
+    # streamed files are read back from their chunks, line for line
+    if symbols is not None:
+        if language == "python":
+            file_symbols = python_symbols(code_text)
+        else:
+            file_symbols = [symbol for chunk in chunks
+                            for symbol in text_symbols(chunk["text"], language, chunk["start_line"])]
+        symbols.set_file(str(rel_path), file_symbols)
+
+    # ═══════════════════════════════════════════════════════════
+    # STEP D: Embed and store each chunk
+    # ═══════════════════════════════════════════════════════════
+    # Process chunks in batches to balance memory usage and performance
+    # Batching reduces API/model overhead while keeping memory reasonable
+    file_stored = 0  # Chunks of this file that are not near-duplicates
+    file_failed = 0  # Chunks lost to failed embed/add calls
+    for i in range(0, len(chunks), batch_size):
+        batch = chunks[i:i + batch_size]  # Get next batch of chunks
+
+        # Extract just the text content for embedding
+        # The chunks dict also contains line numbers, token counts, etc.
+        texts = [chunk["text"] for chunk in batch]
+
+        # ─────────────────────────────────────────────────────
+        # Create unique IDs for each chunk
+        # ─────────────────────────────────────────────────────
+        # Format: "relative/path/file.py:10-25" (path with line range)
+        # This makes it easy to link back to the exact source location
+        ids = [
+            f"{rel_path}:{chunk['start_line']}-{chunk['end_line']}"
+            for chunk in batch
+        ]
+
+        # ─────────────────────────────────────────────────────
+        # Build metadata for each chunk
+        # ─────────────────────────────────────────────────────
+        # Rich metadata enables powerful filtering and citation in RAG queries
+        metadatas = [
+            {
+                "file_path": str(rel_path),        # Relative path from project root
+                "language": language,               # Programming language
+                "start_line": chunk["start_line"],  # First line of chunk (for linking)
+                "end_line": chunk["end_line"],      # Last line of chunk (for linking)
+                "chunk_index": i + j,               # Order within this file
+                "total_chunks": len(chunks),        # Total chunks in this file
+                "file_size": file_size,             # File size in bytes (for filtering)
+                "extension": file_path.suffix,      # File extension (e.g., ".py")
+                # Qualified names defined in the chunk (Python only)
+                **({"symbols": ", ".join(chunk["symbols"])} if chunk.get("symbols") else {}),
+            }
+            for j, chunk in enumerate(batch)
+        ]
+
+        # ─────────────────────────────────────────────────────
+        # Drop near-duplicates (licence headers, copied code)
+        # ─────────────────────────────────────────────────────
+        # Each is recorded as an occurrence of the chunk already stored
+        if dedup is not None:
+            keep = [
+                j for j, (chunk_id, text, metadata) in enumerate(zip(ids, texts, metadatas))
+                if dedup.check(chunk_id, text, {"id": chunk_id,
+                                                "file_path": metadata["file_path"],
+                                                "start_line": metadata["start_line"],
+                                                "end_line": metadata["end_line"]}) is None
+            ]
+            texts = [texts[j] for j in keep]
+            ids = [ids[j] for j in keep]
+            metadatas = [metadatas[j] for j in keep]
+            if not texts:
+                continue
+
+        # ─────────────────────────────────────────────────────
+        # Store everything in ChromaDB
+        # ─────────────────────────────────────────────────────
+        # Each entry has: unique ID, vector embedding, original code, and metadata
+        try:
+            # Cached vectors are reused for chunk texts embedded on a previous run
+            embeddings = embed(texts)
+            collection.add(
+                ids=ids,                    # Unique identifier with line numbers
+                embeddings=embeddings,      # 384-dim MiniLM vectors
+                documents=texts,            # Original code for retrieval
+                metadatas=metadatas        # Language, path, lines, etc.
+            )
+            file_stored += len(texts)
+        except Exception as e:
+            logger.error(f"Failed to add chunks to ChromaDB: {e}")
+            # Later duplicates must not be skipped in favour of chunks that
+            # were never stored; those already skipped are lost too
+            file_failed += len(texts) + (dedup.forget(ids) if dedup is not None else 0)
+            continue  # Try next batch
+
+    # Log progress (helps user know it's working on large codebases)
+    packed = f" (packed from {blocks})" if blocks != len(chunks) else ""
+    skipped = len(chunks) - file_stored - file_failed
+    notes = [f"{skipped} near-duplicates skipped"] if skipped else []
+    if file_failed:
+        notes.append(f"{file_failed} failed to store")
+    logger.info(f"Indexed {rel_path} ({language}): {file_stored} chunks{packed}"
+                + (f", {', '.join(notes)}" if notes else ""))
+
+    return {"language": language, "chunks": len(chunks), "stored": file_stored,
+            "failed": file_failed, "blocks": blocks}
+
+
 def index_codebase(code_dir: Path, chroma_path: Path, collection_name: str,
-                   max_tokens: int) -> None:
+                   max_tokens: int,
+                   embed_cache: Optional[EmbeddingDiskCache] = None,
+                   embedding_function: Optional[Callable] = None,
+                   hnsw: Optional[Dict[str, Any]] = None,
+                   dedup: Optional[NearDuplicateFilter] = None,
+                   pack: bool = True,
+                   max_file_bytes: int = DEFAULT_MAX_FILE_BYTES,
+                   allow_generated: bool = False,
+                   use_git: bool = True) -> None:
     """
     Index all code files in the specified directory into ChromaDB.
 
@@ -389,6 +916,26 @@ def index_codebase(code_dir: Path, chroma_path: Path, collection_name: str,
         Name of the ChromaDB collection.
     max_tokens : int
         Maximum tokens per chunk.
+    embed_cache : Optional[EmbeddingDiskCache]
+        Content-hash cache of chunk vectors; unchanged chunks skip the model.
+    embedding_function : Optional[Callable]
+        Embeds chunks when there is no cache (default: MiniLM with the
+        calibrated runtime settings, see common/embeddings.py).
+    hnsw : Optional[Dict[str, Any]]
+        Collection `configuration` with the distance space and HNSW
+        parameters (see common/hnsw.py); Chroma's defaults if omitted.
+    dedup : Optional[NearDuplicateFilter]
+        Skips chunks that are near-duplicates of one already stored and
+        records them on it (see common/dedup.py); every chunk is stored if omitted.
+    pack : bool
+        Merge adjacent small chunks up to max_tokens (see pack_chunks()).
+    max_file_bytes : int
+        Files larger than this are skipped (see screen_file()).
+    allow_generated : bool
+        Index files with generated-code names or markers too.
+    use_git : bool
+        List files from the git index when code_dir is in a git work tree
+        (see common/file_discovery.py); always walk the directory if False.
     """
     # ══════════════════════════════════════════════════════════════
     # SETUP PHASE: Initialize all components before processing
@@ -420,12 +967,24 @@ def index_codebase(code_dir: Path, chroma_path: Path, collection_name: str,
             database=DEFAULT_DATABASE,   # Use default database
         )
         # Get or create the collection (like a table in SQL)
-        collection = client.get_or_create_collection(collection_name)
-        logger.info(f"Created collection: {collection_name}")
+        # Distance space and HNSW parameters are fixed when the collection is created
+        collection = client.get_or_create_collection(collection_name,
+                                                     configuration=hnsw)
+        logger.info(f"Created collection: {collection_name} "
+                    f"(hnsw: {collection.configuration.get('hnsw')})")
     except Exception as e:
         logger.error(f"Failed to create ChromaDB client: {e}")
         return
 
+    # ── 4. Embedding model ────────────────────────────────────────
+    # Embed here rather than inside ChromaDB so the runtime settings (and cache) apply
+    embedding_function = embedding_function or default_embedding_function()
+    embed = embed_cache.embed if embed_cache else embedding_function
+
+    # Never store in batches smaller than the model's own batch size
+    runtime = getattr(embedding_function, "runtime", None)
+    batch_size = max(50, runtime.batch_size if runtime else 0)
+
     # ══════════════════════════════════════════════════════════════
     # INDEXING PHASE: Scan and process all code files
     # ══════════════════════════════════════════════════════════════
@@ -433,131 +992,52 @@ def index_codebase(code_dir: Path, chroma_path: Path, collection_name: str,
     # Initialize statistics counters for final summary report
     file_counter = 0                        # Total files successfully indexed
     chunk_counter = 0                       # Total code chunks created
+    failed_counter = 0                      # Chunks lost to failed embed/add calls
+    block_counter = 0                       # Blank-line blocks before packing
+    packed_counter = 0                      # Chunks after packing (before dedup)
+    skip_stats: Counter = Counter()         # Files skipped by screen_file(), per reason
     language_stats: Dict[str, int] = {}     # Count files per language
-
-    # ── 5. Recursively scan for code files ────────────────────────
-    # os.walk() traverses the directory tree depth-first
-    for root, dirs, files in os.walk(code_dir):
-        # In-place filter to prevent os.walk() from descending into skip folders
-        # The [:] slice assignment modifies the list in-place, which tells
-        # os.walk() to skip those directories entirely (not just ignore files in them)
-        # This dramatically speeds up scanning and avoids indexing dependencies
-        dirs[:] = [
-            d for d in dirs
-            if d not in SKIP_DIRS and not d.startswith(".")
-        ]
-
-        # Process each file in the current directory
-        for name in files:
-            file_path = Path(root) / name
-
-            # ═══════════════════════════════════════════════════════════
-            # STEP A: Filter non-code files
-            # ═══════════════════════════════════════════════════════════
-            # Skip files that aren't source code (lock files, hidden files, etc.)
-            if not should_index_file(file_path):
-                continue
-
-            # ═══════════════════════════════════════════════════════════
-            # STEP B: Detect language and read file
-            # ═══════════════════════════════════════════════════════════
-            # Determine programming language from file extension
-            language = get_language(file_path)
-
-            # Read the file contents
-            try:
-                # Use UTF-8 encoding with error tolerance
-                # errors="ignore" prevents crashes on files with encoding issues
-                code_text = file_path.read_text(encoding="utf-8", errors="ignore")
-            except Exception as err:
-                logger.warning(f"Could not read {file_path}: {err}")
-                continue
-
-            # Skip empty files (no point indexing nothing)
-            if not code_text.strip():
-                continue
-
-            # Get file size in bytes for metadata
-            # This enables filtering by file size in queries
-            try:
-                file_size = file_path.stat().st_size
-            except:
-                file_size = 0  # If we can't get size, default to 0
-
-            # ═══════════════════════════════════════════════════════════
-            # STEP C: Chunk the code into logical units
-            # ═══════════════════════════════════════════════════════════
-            # Split the file into token-limited chunks with line tracking
-            chunks = list(chunk_code(code_text, max_tokens, language))
-
-            # Skip files that produced no chunks (shouldn't happen but be safe)
-            if not chunks:
-                continue
-
-            # ═══════════════════════════════════════════════════════════
-            # STEP D: Embed and store each chunk
-            # ═══════════════════════════════════════════════════════════
-            # Process chunks in batches to balance memory usage and performance
-            # Batching reduces API/model overhead while keeping memory reasonable
-            batch_size = 50  # 50 chunks at a time works well for most files
-
-            for i in range(0, len(chunks), batch_size):
-                batch = chunks[i:i + batch_size]  # Get next batch of chunks
-
-                # Extract just the text content for embedding
-                # The chunks dict also contains line numbers, token counts, etc.
-                texts = [chunk["text"] for chunk in batch]
-
-                # ─────────────────────────────────────────────────────
-                # Create unique IDs for each chunk
-                # ─────────────────────────────────────────────────────
-                # Format: "relative/path/file.py:10-25" (path with line range)
-                # This makes it easy to link back to the exact source location
-                rel_path = file_path.relative_to(code_dir)
-                ids = [
-                    f"{rel_path}:{chunk['start_line']}-{chunk['end_line']}"
-                    for chunk in batch
-                ]
-
-                # ─────────────────────────────────────────────────────
-                # Build metadata for each chunk
-                # ─────────────────────────────────────────────────────
-                # Rich metadata enables powerful filtering and citation in RAG queries
-                metadatas = [
-                    {
-                        "file_path": str(rel_path),        # Relative path from project root
-                        "language": language,               # Programming language
-                        "start_line": chunk["start_line"],  # First line of chunk (for linking)
-                        "end_line": chunk["end_line"],      # Last line of chunk (for linking)
-                        "chunk_index": i + j,               # Order within this file
-                        "total_chunks": len(chunks),        # Total chunks in this file
-                        "file_size": file_size,             # File size in bytes (for filtering)
-                        "extension": file_path.suffix,      # File extension (e.g., ".py")
-                    }
-                    for j, chunk in enumerate(batch)
-                ]
-
-                # ─────────────────────────────────────────────────────
-                # Store everything in ChromaDB
-                # ─────────────────────────────────────────────────────
-                # Each entry has: unique ID, vector embedding, original code, and metadata
-                try:
-                    collection.add(
-                        ids=ids,                    # Unique identifier with line numbers
-                        documents=texts,            # Original code for retrieval
-                        metadatas=metadatas        # Language, path, lines, etc.
-                    )
-                except Exception as e:
-                    logger.error(f"Failed to add chunks to ChromaDB: {e}")
-                    continue  # Try next batch
-
-            # Update running statistics for final summary report
-            file_counter += 1
-            chunk_counter += len(chunks)
-            language_stats[language] = language_stats.get(language, 0) + 1
-
-            # Log progress (helps user know it's working on large codebases)
-            logger.info(f"Indexed {rel_path} ({language}): {len(chunks)} chunks")
+    symbols = SymbolTable()                 # Definitions/references per file
+
+    # ── 5. Find the code files ────────────────────────────────────
+    # From the git index in a work tree (tracked files plus untracked ones
+    # that are not ignored); otherwise a parallel directory walk that
+    # honours .gitignore files. SKIP_DIRS and hidden directories are never
+    # entered either way, and ignored trees are never stat'ed
+    t0 = time.perf_counter()
+    candidates, method = discover_files(code_dir, SKIP_DIRS, use_git=use_git)
+    logger.info(f"Found {len(candidates)} files ({method}) in {time.perf_counter() - t0:.2f}s")
+
+    # Process each file
+    for file_path in candidates:
+        result = index_file(file_path, code_dir, collection, embed, max_tokens,
+                            batch_size=batch_size, dedup=dedup, pack=pack,
+                            max_file_bytes=max_file_bytes, allow_generated=allow_generated,
+                            symbols=symbols)
+        if result is None:
+            continue
+        if "skipped" in result:
+            skip_stats[result["skipped"].split(" (")[0]] += 1
+            continue
+
+        # Update running statistics for final summary report
+        file_counter += 1
+        chunk_counter += result["stored"]
+        failed_counter += result["failed"]
+        block_counter += result["blocks"]
+        packed_counter += result["chunks"]
+        language_stats[result["language"]] = language_stats.get(result["language"], 0) + 1
+
+    # Point each stored chunk at the near-duplicates it stands for
+    if dedup is not None:
+        record_occurrences(collection, dedup)
+
+    # Sorted symbol table for exact identifier lookups in search.py
+    try:
+        symbol_stats = symbols.write(symbol_index_path(chroma_path))
+    except OSError as e:
+        logger.error(f"Failed to write the symbol index: {e}")
+        symbol_stats = None
 
     # ══════════════════════════════════════════════════════════════
     # SUMMARY: Report indexing results
@@ -567,8 +1047,25 @@ def index_codebase(code_dir: Path, chroma_path: Path, collection_name: str,
     logger.info(f"Indexing complete!")
     logger.info(f"  Total files indexed: {file_counter}")
     logger.info(f"  Total code chunks: {chunk_counter}")
+    if failed_counter:
+        logger.warning(f"  Chunks not stored (failed adds): {failed_counter}")
+    if skip_stats:
+        logger.info("  Files skipped: " + ", ".join(
+            f"{count} {reason}" for reason, count in skip_stats.most_common()))
+    if pack and block_counter:
+        logger.info(f"  Packing: {block_counter} blocks -> "
+                    f"{packed_counter} chunks ({block_counter / max(packed_counter, 1):.1f}x fewer vectors)")
     logger.info(f"  Database location: {chroma_path.resolve()}")
     logger.info(f"  Collection name: {collection_name}")
+    if symbol_stats is not None:
+        logger.info(f"  Symbol index: {symbol_stats['definitions']} definitions, "
+                    f"{symbol_stats['references']} references ({symbol_stats['bytes'] / 1024:.0f} KB)")
+    if embed_cache is not None:
+        s = embed_cache.stats()
+        logger.info(f"  Embedding cache: {s['hits']} reused / {s['misses']} embedded "
+                    f"({s['hit_rate']:.1%} hit rate, {s['path']})")
+    if dedup is not None:
+        logger.info(f"  Near-duplicates: {dedup.format_stats()}")
 
     # Show breakdown by programming language (helps verify expected files were indexed)
     if language_stats:
@@ -580,6 +1077,176 @@ def index_codebase(code_dir: Path, chroma_path: Path, collection_name: str,
     logger.info(f"{'='*60}\n")
 
 
+def release_duplicates(collection: Any, rel_paths: Set[str]) -> Optional[Set[str]]:
+    """
+    Take `rel_paths` out of the near-duplicate records before their chunks
+    are deleted, following the chain: a file indexed again has its own
+    chunks deleted too, which may stand for duplicates in further files.
+
+    Returns
+    -------
+    Optional[Set[str]]
+        Other files (relative paths) to index again, or None if some of
+        them are unknown because an occurrence list was truncated.
+    """
+    released, pending, dependents = set(rel_paths), set(rel_paths), set()
+    while pending:
+        found, complete = release_sources(collection, "file_path", pending)
+        if not complete:
+            return None
+        pending = found - released
+        released |= pending
+        dependents |= pending
+    return dependents
+
+
+def watch_codebase(code_dir: Path, chroma_path: Path, collection_name: str,
+                   max_tokens: int,
+                   embed_cache: Optional[EmbeddingDiskCache] = None,
+                   embedding_function: Optional[Callable] = None,
+                   pack: bool = True,
+                   max_file_bytes: int = DEFAULT_MAX_FILE_BYTES,
+                   allow_generated: bool = False,
+                   use_git: bool = True,
+                   debounce: float = DEFAULT_DEBOUNCE_S,
+                   poll_interval: float = DEFAULT_POLL_INTERVAL_S,
+                   use_inotify: bool = True) -> None:
+    """
+    Keep an index built by index_codebase() in step with the working tree
+    until interrupted (Ctrl+C).
+
+    Each settled burst of changes (see common/file_watch.py) is compared
+    with a snapshot of (mtime, size) per file: files that are new or whose
+    snapshot changed have their vectors deleted and are chunked and stored
+    again; files that were deleted, or are now ignored, lose their vectors.
+    Unchanged chunks reuse the embedding cache. A file whose chunk stood
+    for near-duplicates elsewhere (see common/dedup.py) is taken out of
+    those records first, and the files holding the duplicates are indexed
+    again, so their content does not disappear with it; updates themselves
+    store every chunk.
+
+    The symbol table is updated for the same files and rewritten after
+    each burst (references to names first defined since the full build are
+    only picked up in files that change). An error on one file is logged
+    and the watch goes on.
+
+    Parameters
+    ----------
+    code_dir, chroma_path, collection_name, max_tokens, embed_cache,
+    embedding_function, pack, max_file_bytes, allow_generated, use_git
+        As for index_codebase().
+    debounce : float
+        Seconds without changes before a burst is processed.
+    poll_interval : float
+        Seconds between scans when inotify is unavailable.
+    use_inotify : bool
+        Use inotify where available; always poll if False.
+    """
+    try:
+        client = PersistentClient(path=str(chroma_path), settings=Settings(),
+                                  tenant=DEFAULT_TENANT, database=DEFAULT_DATABASE)
+        collection = client.get_collection(collection_name)
+    except Exception as e:
+        logger.error(f"Failed to open collection {collection_name}: {e}")
+        return
+
+    embedding_function = embedding_function or default_embedding_function()
+    embed = embed_cache.embed if embed_cache else embedding_function
+    runtime = getattr(embedding_function, "runtime", None)
+    batch_size = max(50, runtime.batch_size if runtime else 0)
+
+    def listing() -> Set[Path]:
+        """Code files the indexer would consider right now."""
+        return {p for p in discover_files(code_dir, SKIP_DIRS, use_git=use_git)[0]
+                if should_index_file(p)}
+
+    def signature(path: Path) -> Optional[Tuple[int, int]]:
+        try:
+            st = path.stat()
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    state = {path: signature(path) for path in listing()}
+    symbols_path = symbol_index_path(chroma_path)
+    symbols = SymbolTable.load(symbols_path)
+
+    with FileWatcher(code_dir, SKIP_DIRS, debounce=debounce, poll_interval=poll_interval,
+                     use_inotify=use_inotify) as watcher:
+        detail = (f"{watcher.watched_directories} directories" if watcher.mode == "inotify"
+                  else f"every {poll_interval:g}s")
+        logger.info(f"Watching {code_dir} for changes ({watcher.mode}, {detail}); Ctrl+C to stop")
+        try:
+            for changed in watcher.batches():
+                t0 = time.perf_counter()
+                current = listing()
+                if changed is None:
+                    candidates = current            # Rescan: compare every snapshot
+                else:
+                    candidates = {p for p in current
+                                  if p not in state or p in changed or not changed.isdisjoint(p.parents)}
+
+                removed = sorted(set(state) - current)
+                modified = []
+                for path in sorted(candidates):
+                    new_signature = signature(path)
+                    if new_signature is None or state.get(path) == new_signature:
+                        continue
+                    state[path] = new_signature
+                    modified.append(path)
+                if not (removed or modified):
+                    continue
+
+                # Files whose near-duplicates were stored only as a chunk of
+                # a changed file must be indexed again once it is deleted
+                try:
+                    dependents = release_duplicates(
+                        collection, {str(p.relative_to(code_dir)) for p in removed + modified})
+                except Exception as e:
+                    logger.error(f"Could not read near-duplicate records: {e}")
+                    dependents = None
+                if dependents is None:
+                    logger.warning("Near-duplicate records incomplete; re-indexing every file")
+                    dependents = {str(p.relative_to(code_dir)) for p in current}
+                reindex = sorted(set(modified) | {code_dir / rel for rel in dependents
+                                                  if code_dir / rel in current})
+
+                for path in removed:
+                    rel_path = str(path.relative_to(code_dir))
+                    del state[path]
+                    try:
+                        collection.delete(where={"file_path": rel_path})
+                        symbols.remove_file(rel_path)
+                        logger.info(f"Removed {rel_path}")
+                    except Exception as e:
+                        logger.error(f"Failed to remove {rel_path}: {e}")
+
+                for path in reindex:
+                    rel_path = str(path.relative_to(code_dir))
+                    try:
+                        collection.delete(where={"file_path": rel_path})
+                        symbols.remove_file(rel_path)
+                        index_file(path, code_dir, collection, embed, max_tokens,
+                                   batch_size=batch_size, pack=pack,
+                                   max_file_bytes=max_file_bytes, allow_generated=allow_generated,
+                                   symbols=symbols)
+                    except Exception as e:
+                        # Picked up again by the next change or rescan
+                        state.pop(path, None)
+                        logger.error(f"Failed to re-index {rel_path}: {e}")
+                updated = len(reindex)
+
+                if updated or removed:
+                    try:
+                        symbols.write(symbols_path)
+                    except OSError as e:
+                        logger.error(f"Failed to write the symbol index: {e}")
+                    logger.info(f"Synced {updated} changed and {len(removed)} removed files "
+                                f"in {time.perf_counter() - t0:.2f}s")
+        except KeyboardInterrupt:
+            logger.info("Stopped watching")
+
+
 # ╔════════════════════════════════════════════════════════════════╗
 # 4.  CLI entry point                                              ║
 # ╚════════════════════════════════════════════════════════════════╝
@@ -605,6 +1272,9 @@ Examples:
 
   # Full customization
   python index_code.py --code-dir ./src --chroma-path ./my_code_db --max-tokens 750
+
+  # Index, then keep the index up to date as files change
+  python index_code.py --code-dir ./src --watch
         """
     )
 
@@ -642,6 +1312,103 @@ Examples:
         help=f"Maximum tokens per chunk (default: {DEFAULT_MAX_TOKENS})"
     )
 
+
+    # ── File screening ────────────────────────────────────────────
+    # Huge, binary, minified and generated files are skipped with a reason
+    parser.add_argument(
+        "--max-file-bytes",
+        type=int,
+        default=DEFAULT_MAX_FILE_BYTES,
+        help=f"Skip files larger than this (default: {DEFAULT_MAX_FILE_BYTES})"
+    )
+
+    parser.add_argument(
+        "--allow-generated",
+        action="store_true",
+        help="Index files marked as generated (@generated, DO NOT EDIT, *_pb2.py, ...)"
+    )
+
+    parser.add_argument(
+        "--no-git",
+        action="store_true",
+        help="Walk the directory (honouring .gitignore files) instead of "
+             "listing files from the git index"
+    )
+
+    parser.add_argument(
+        "--no-pack",
+        action="store_true",
+        help="Store every blank-line block as its own chunk instead of merging "
+             "adjacent blocks up to --max-tokens"
+    )
+
+    # ── Watch mode ────────────────────────────────────────────────
+    # After the full build, keep re-indexing changed files until Ctrl+C
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="After indexing, watch the code directory and re-index changed files"
+    )
+
+    parser.add_argument(
+        "--watch-debounce",
+        type=float,
+        default=DEFAULT_DEBOUNCE_S,
+        help=f"Seconds without changes before re-indexing (default: {DEFAULT_DEBOUNCE_S:g})"
+    )
+
+    parser.add_argument(
+        "--watch-poll-interval",
+        type=float,
+        default=DEFAULT_POLL_INTERVAL_S,
+        help=f"Seconds between scans without inotify (default: {DEFAULT_POLL_INTERVAL_S:g})"
+    )
+
+    parser.add_argument(
+        "--watch-polling",
+        action="store_true",
+        help="Poll for changes even where inotify is available"
+    )
+
+    # ── Embedding cache ───────────────────────────────────────────
+    # Vectors are cached by SHA-256 of the chunk text, so unchanged chunks
+    # are not re-embedded when the index is rebuilt
+    parser.add_argument(
+        "--embed-cache",
+        type=Path,
+        default=DEFAULT_CACHE_PATH,
+        help=f"SQLite embedding cache file (default: {DEFAULT_CACHE_PATH})"
+    )
+
+    parser.add_argument(
+        "--no-embed-cache",
+        action="store_true",
+        help="Embed every chunk from scratch and leave the cache untouched"
+    )
+
+    parser.add_argument(
+        "--embed-cache-max-age-days",
+        type=float,
+        default=DEFAULT_MAX_AGE_DAYS,
+        help=f"Drop cached vectors unused for this many days (default: {DEFAULT_MAX_AGE_DAYS:g})"
+    )
+
+    parser.add_argument(
+        "--embed-cache-max-entries",
+        type=int,
+        default=DEFAULT_MAX_ENTRIES,
+        help=f"Keep at most this many cached vectors (default: {DEFAULT_MAX_ENTRIES})"
+    )
+
+    # ── Embedding runtime (--embed-threads, --embed-batch-size, ...) ─
+    add_runtime_arguments(parser)
+
+    # ── Vector index (--hnsw-space, --hnsw-m, ...) ────────────────
+    add_hnsw_arguments(parser)
+
+    # ── Near-duplicate suppression (--no-dedup, --dedup-threshold, ...) ─
+    add_dedup_arguments(parser)
+
     # Parse the command-line arguments
     args = parser.parse_args()
 
@@ -669,17 +1436,82 @@ Examples:
         logger.error("Max tokens must be at least 50")
         return
 
+    if args.max_file_bytes < 1:
+        logger.error("--max-file-bytes must be at least 1")
+        return
+
+    if args.watch_debounce < 0 or args.watch_poll_interval <= 0:
+        logger.error("--watch-debounce must be at least 0 and --watch-poll-interval positive")
+        return
+
+    # HNSW parameters must be positive, dedup threshold in (0, 1]
+    try:
+        hnsw = hnsw_from_args(args)
+        dedup = dedup_from_args(args)
+    except ValueError as e:
+        logger.error(str(e))
+        return
+
     # ══════════════════════════════════════════════════════════════
     # All validation passed - run the indexing process
     # ══════════════════════════════════════════════════════════════
+    # Threads, batch size and graph optimization for the MiniLM model
+    # (the embedding daemon, if EMBED_SERVER_URL is set, uses its own)
+    runtime = None
+    if embedding_server_url():
+        logger.info(f"Embedding server: {embedding_server_url()}")
+        if runtime_arguments_given(args):
+            runtime = runtime_from_args(args)       # Warned about and ignored
+    else:
+        runtime = runtime_from_args(args)
+        logger.info(f"Embedding runtime: {runtime}")
+    embedding_function = default_embedding_function(runtime)
+
+    embed_cache = None
+    if not args.no_embed_cache:
+        embed_cache = EmbeddingDiskCache(
+            args.embed_cache,
+            embedding_function=embedding_function,
+            max_age_days=args.embed_cache_max_age_days,
+            max_entries=args.embed_cache_max_entries,
+        )
     # This will scan the codebase, chunk files, generate embeddings,
     # and store everything in ChromaDB with rich metadata
-    index_codebase(
-        code_dir=code_dir,              # Where to scan for code
-        chroma_path=args.chroma_path,   # Where to store the database
-        collection_name=args.collection, # Collection name in ChromaDB
-        max_tokens=args.max_tokens      # Max tokens per chunk
-    )
+    try:
+        index_codebase(
+            code_dir=code_dir,              # Where to scan for code
+            chroma_path=args.chroma_path,   # Where to store the database
+            collection_name=args.collection, # Collection name in ChromaDB
+            max_tokens=args.max_tokens,     # Max tokens per chunk
+            embed_cache=embed_cache,        # Reuse vectors of unchanged chunks
+            embedding_function=embedding_function,  # Tuned MiniLM runtime
+            hnsw=hnsw,                      # Distance space / HNSW parameters
+            dedup=dedup,                    # Near-duplicate suppression
+            pack=not args.no_pack,          # Merge small blocks up to max_tokens
+            max_file_bytes=args.max_file_bytes,     # Size cap per file
+            allow_generated=args.allow_generated,   # Keep generated files
+            use_git=not args.no_git,        # File list from the git index
+        )
+        # Then follow the working tree, re-indexing only what changes
+        if args.watch:
+            watch_codebase(
+                code_dir=code_dir,
+                chroma_path=args.chroma_path,
+                collection_name=args.collection,
+                max_tokens=args.max_tokens,
+                embed_cache=embed_cache,
+                embedding_function=embedding_function,
+                pack=not args.no_pack,
+                max_file_bytes=args.max_file_bytes,
+                allow_generated=args.allow_generated,
+                use_git=not args.no_git,
+                debounce=args.watch_debounce,
+                poll_interval=args.watch_poll_interval,
+                use_inotify=not args.watch_polling,
+            )
+    finally:
+        if embed_cache is not None:
+            embed_cache.close()     # Applies age/size eviction
 
 
 if __name__ == "__main__":
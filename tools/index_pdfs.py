@@ -14,11 +14,19 @@ High-level flow
    active maintenance.
 4. **Semantic chunking** – split text into meaningful chunks (~500-1000 chars)
    with overlap (~200 chars) to preserve context across chunk boundaries.
-5. **Table handling** – extract and preserve table structure separately.
+5. **Table handling** – extract and preserve table structure separately;
+   table regions are left out of the page text so cells aren't embedded twice.
+   Near-duplicate chunks (headers, footers, notices) are stored once, with
+   their other occurrences listed in its metadata.
 6. **Embed** – convert each chunk to a 384-dimensional vector (MiniLM-L6-v2).
 7. **Store** – write `(vector, text, metadata)` into a persistent Chroma
    collection called `"pdf_documents"`.
 
+Steps 3-7 are a streaming pipeline (page → chunks → batch → embed + store):
+pages are extracted in a background thread that runs at most a couple of
+batches ahead of the embedder, so memory use stays flat however many
+pages a PDF has.
+
 Security Notes
 --------------
 PyMuPDF (fitz) is used instead of pdfplumber because:
@@ -37,14 +45,31 @@ Arguments:
   --chunk-size    Target chunk size in characters (default: 800)
   --chunk-overlap Overlap between chunks in characters (default: 200)
   --collection    ChromaDB collection name (default: pdf_documents)
+  --table-prefilter on|audit|off
+                  Skip find_tables() on pages without ruling lines (default: on);
+                  audit runs it anyway and warns about tables that would be missed
+  --embed-cache   SQLite embedding cache reused across runs (default: ./.embedding_cache.sqlite3)
+  --no-embed-cache  Disable the embedding cache
+  --page-cache    SQLite cache of extracted PDF pages (default: ./.pdf_page_cache.sqlite3)
+  --no-page-cache Parse every PDF from scratch
+  --embed-threads, --embed-inter-op-threads, --embed-batch-size, --graph-opt-level
+                  ONNX runtime overrides (defaults: tools/calibrate_embeddings.py output)
+                  (ignored with EMBED_SERVER_URL: pass them to tools/embed_server.py)
+  --hnsw-space, --hnsw-m, --hnsw-ef-construction, --hnsw-ef-search
+                  Distance space (l2/cosine/ip) and HNSW parameters (default: Chroma's)
+  --dedup-threshold, --dedup-shingle, --no-dedup
+                  Near-duplicate suppression (default: on, threshold 0.9, 5-word shingles)
 """
 
 # ───────────────────── standard-library imports ────────────────────
 import argparse
+import queue
 import shutil
-import re
+import sys
+import threading
+import time
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Callable, Iterable, Iterator, Tuple
 import logging
 
 # ───────────────────── 3rd-party imports ───────────────────────────
@@ -64,6 +89,23 @@ except ImportError:
     print("ERROR: chromadb not installed. Install with: pip install chromadb")
     exit(1)
 
+# ───────────────────── shared helpers (repo root) ──────────────────
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+from common.embedding_store import (
+    EmbeddingDiskCache, DEFAULT_CACHE_PATH, DEFAULT_MAX_AGE_DAYS, DEFAULT_MAX_ENTRIES,
+)
+from common.embedding_cache import default_embedding_function
+from common.embeddings import add_runtime_arguments, runtime_arguments_given, runtime_from_args
+from common.remote_embeddings import embedding_server_url
+from common.hnsw import add_hnsw_arguments, hnsw_from_args
+from common.chunking import chunk_spans
+from common.dedup import NearDuplicateFilter, add_dedup_arguments, dedup_from_args, record_occurrences
+from common.page_cache import (
+    PageTextCache, DEFAULT_PAGE_CACHE_PATH, file_digest,
+    DEFAULT_MAX_AGE_DAYS as DEFAULT_PAGE_CACHE_MAX_AGE_DAYS,
+)
+
 # ───────────────────── logging setup ───────────────────────────────
 logging.basicConfig(
     level=logging.INFO,
@@ -92,62 +134,87 @@ DEFAULT_CHUNK_SIZE = 800
 # 200 chars overlap ensures context continuity across chunk boundaries
 DEFAULT_CHUNK_OVERLAP = 200
 
+# Table-detection prefilter: "on" skips find_tables() on pages without
+# ruling lines, "audit" runs it anyway and warns about tables the
+# prefilter would have missed, "off" runs it on every page
+TABLE_PREFILTER_MODES = ("on", "audit", "off")
+DEFAULT_TABLE_PREFILTER = "on"
+
+# A page needs at least this many horizontal/vertical edges (lines, or
+# 4 per rectangle) before find_tables() is worth running
+MIN_RULING_EDGES = 4
+
+# Points a line may deviate from horizontal/vertical and still count
+AXIS_TOLERANCE = 1.0
+
+# Batches of chunks that extraction may run ahead of embedding; with the
+# batch size this bounds memory use regardless of document size
+PREFETCH_BATCHES = 2
+
+# Seconds between per-page progress lines at INFO level
+PROGRESS_INTERVAL = 5.0
+
+# Version of the page extraction below (text, tables, bounding boxes);
+# bump it whenever that output changes so cached pages are parsed again
+EXTRACTOR_VERSION = 1
+
+# Parsed pages written to the page cache per transaction
+PAGE_CACHE_BATCH = 100
+
 # ╔════════════════════════════════════════════════════════════════╗
 # 2.  Text chunking with semantic awareness                        ║
 # ╚════════════════════════════════════════════════════════════════╝
 
-def chunk_text(text: str, chunk_size: int = DEFAULT_CHUNK_SIZE,
-               overlap: int = DEFAULT_CHUNK_OVERLAP) -> List[str]:
+# Sentence-aware chunking lives in common/chunking.py (shared with
+# create_db.py); it yields character offsets into the page text, which are
+# stored in each chunk's metadata.
+
+
+def page_may_have_tables(page: fitz.Page) -> bool:
     """
-    Split text into overlapping chunks while trying to preserve sentence boundaries.
+    Cheap check whether find_tables() could find a table on this page.
 
-    Overlap ensures that context isn't lost at chunk boundaries, which is critical
-    for RAG performance.
+    find_tables() (default "lines" strategy) builds tables from the page's
+    vector ruling lines and rectangles, so a page with fewer than
+    MIN_RULING_EDGES horizontal/vertical edges cannot produce one. Reading
+    the drawings costs ~1 ms per page; find_tables() costs tens of ms.
 
     Parameters
     ----------
-    text : str
-        The text to chunk.
-    chunk_size : int
-        Target size of each chunk in characters.
-    overlap : int
-        Number of characters to overlap between chunks.
+    page : fitz.Page
+        The PDF page to check.
 
     Returns
     -------
-    List[str]
-        List of text chunks with overlap.
+    bool
+        False if table detection can safely be skipped.
     """
-    # Handle edge case: if text is already small enough, return as-is
-    if not text or len(text) <= chunk_size:
-        return [text] if text else []
-
-    chunks = []
-
-    # Split on sentence boundaries (., !, ?) followed by whitespace
-    # This preserves semantic meaning better than arbitrary character splits
-    sentences = re.split(r'(?<=[.!?])\s+', text)
-
-    current_chunk = ""
-    for sentence in sentences:
-        # Check if adding this sentence would exceed our target chunk size
-        if len(current_chunk) + len(sentence) > chunk_size and current_chunk:
-            # Save the current chunk
-            chunks.append(current_chunk.strip())
-
-            # Start new chunk with overlap from end of previous chunk
-            # This ensures context continuity across chunk boundaries
-            overlap_text = current_chunk[-overlap:] if len(current_chunk) > overlap else current_chunk
-            current_chunk = overlap_text + " " + sentence
+    # get_cdrawings() skips building Python objects per path (older PyMuPDF: get_drawings)
+    get_drawings = getattr(page, "get_cdrawings", page.get_drawings)
+    edges = 0
+    for path in get_drawings():
+        for item in path["items"]:
+            kind = item[0]
+            if kind in ("re", "qu"):
+                edges += 4
+            elif kind == "l":
+                (x0, y0), (x1, y1) = item[1], item[2]
+                if abs(x0 - x1) <= AXIS_TOLERANCE or abs(y0 - y1) <= AXIS_TOLERANCE:
+                    edges += 1
+            if edges >= MIN_RULING_EDGES:
+                return True
+    return False
+
+
+def page_ranges(pages: List[int]) -> str:
+    """Compact page list for logging, e.g. [1, 2, 3, 7] -> '1-3,7'."""
+    ranges = []
+    for page in pages:
+        if ranges and ranges[-1][1] == page - 1:
+            ranges[-1][1] = page
         else:
-            # Keep building the current chunk
-            current_chunk += (" " if current_chunk else "") + sentence
-
-    # Don't forget to add the final chunk
-    if current_chunk.strip():
-        chunks.append(current_chunk.strip())
-
-    return chunks
+            ranges.append([page, page])
+    return ",".join(str(a) if a == b else f"{a}-{b}" for a, b in ranges)
 
 
 def extract_tables_from_page(page: fitz.Page) -> List[Dict[str, Any]]:
@@ -162,7 +229,7 @@ def extract_tables_from_page(page: fitz.Page) -> List[Dict[str, Any]]:
     Returns
     -------
     List[Dict[str, Any]]
-        List of tables, each with 'rows' and 'text' representation.
+        List of tables, each with 'index', 'bbox', 'rows' and 'text'.
     """
     tables = []
     try:
@@ -187,6 +254,7 @@ def extract_tables_from_page(page: fitz.Page) -> List[Dict[str, Any]]:
                     # Wrap table text with markers so LLM knows it's a table
                     tables.append({
                         "index": table_idx,
+                        "bbox": tuple(table.bbox),  # Region on the page (points)
                         "rows": table_data,  # Original structured data
                         "text": f"[TABLE]\n{table_text}\n[/TABLE]"  # Text for embedding
                     })
@@ -197,90 +265,315 @@ def extract_tables_from_page(page: fitz.Page) -> List[Dict[str, Any]]:
     return tables
 
 
-def extract_content_from_pdf(pdf_path: Path, chunk_size: int,
-                             chunk_overlap: int) -> List[Dict[str, Any]]:
+def page_text_outside(page: fitz.Page, regions: List[Tuple[float, float, float, float]]) -> str:
     """
-    Extract text and tables from a PDF with rich metadata.
+    Plain text of a page, leaving out text inside `regions` (table bounding boxes).
+
+    Works span by span on get_text("dict"): a span whose centre lies inside
+    a region is dropped, the rest is joined into lines like get_text("text").
 
     Parameters
     ----------
-    pdf_path : Path
-        Path to the PDF file.
-    chunk_size : int
-        Target chunk size in characters.
-    chunk_overlap : int
-        Overlap between chunks in characters.
+    page : fitz.Page
+        The PDF page.
+    regions : List[Tuple[float, float, float, float]]
+        (x0, y0, x1, y1) rectangles to exclude.
 
     Returns
     -------
-    List[Dict[str, Any]]
-        List of chunks, each with 'text', 'metadata', and 'type' fields.
+    str
+        Page text without the excluded regions.
     """
-    chunks = []
+    def inside(bbox) -> bool:
+        cx, cy = (bbox[0] + bbox[2]) / 2, (bbox[1] + bbox[3]) / 2
+        return any(x0 <= cx <= x1 and y0 <= cy <= y1 for x0, y0, x1, y1 in regions)
 
+    lines = []
+    for block in page.get_text("dict", flags=fitz.TEXTFLAGS_TEXT)["blocks"]:
+        for line in block.get("lines", []):
+            text = "".join(span["text"] for span in line["spans"] if not inside(span["bbox"]))
+            if text.strip():
+                lines.append(text)
+    return "\n".join(lines) + "\n" if lines else ""
+
+
+def extractor_key(table_prefilter: str = DEFAULT_TABLE_PREFILTER) -> str:
+    """Page-cache key for the current extraction code ('audit' extracts like 'off')."""
+    mode = "off" if table_prefilter == "audit" else table_prefilter
+    return f"v{EXTRACTOR_VERSION}/pymupdf-{fitz.VersionBind}/tables-{mode}"
+
+
+def parse_pdf_pages(pdf_path: Path,
+                    table_prefilter: str = DEFAULT_TABLE_PREFILTER) -> Iterator[Dict[str, Any]]:
+    """
+    Parse a PDF with PyMuPDF, yielding one dict per page.
+
+    Parameters
+    ----------
+    pdf_path : Path
+        Path to the PDF file.
+    table_prefilter : str
+        'on', 'audit' or 'off' (see TABLE_PREFILTER_MODES).
+
+    Yields
+    ------
+    Dict[str, Any]
+        'page' (1-based), 'page_count', 'text' (without table regions),
+        'tables' (see extract_tables_from_page) and 'skipped' (True if the
+        prefilter skipped table detection).
+    """
+    # Open the PDF file using PyMuPDF
+    doc = fitz.open(pdf_path)
     try:
-        # Open the PDF file using PyMuPDF
-        doc = fitz.open(pdf_path)
+        page_count = len(doc)
 
         # Process each page in the PDF
         for page_num, page in enumerate(doc, start=1):
             # ═══════════════════════════════════════════════════════════
             # STEP 1: Extract tables from this page
             # ═══════════════════════════════════════════════════════════
-            # Tables are processed separately to preserve their structure
-            tables = extract_tables_from_page(page)
+            # Tables are processed separately to preserve their structure.
+            # find_tables() is the slowest step, so pages without ruling
+            # lines skip it unless the prefilter is off
+            skipped = False
+            if table_prefilter == "off" or page_may_have_tables(page):
+                tables = extract_tables_from_page(page)
+            else:
+                skipped = True
+                tables = []
+                if table_prefilter == "audit":
+                    tables = extract_tables_from_page(page)
+                    if tables:
+                        logger.warning(f"Table prefilter would have missed {len(tables)} "
+                                       f"table(s) on {pdf_path.name} page {page_num}")
+
+            # ═══════════════════════════════════════════════════════════
+            # STEP 2: Extract regular text content from this page
+            # ═══════════════════════════════════════════════════════════
+            # Table cells are already in the [TABLE] chunks, so their
+            # regions are left out of the page text rather than being
+            # chunked and embedded a second time as prose
+            if tables:
+                page_text = page_text_outside(page, [t["bbox"] for t in tables])
+            else:
+                page_text = page.get_text("text")
+
+            yield {"page": page_num, "page_count": page_count, "text": page_text,
+                   "tables": tables, "skipped": skipped}
+    finally:
+        # Clean up: close the PDF document
+        doc.close()
+
+
+def iter_pdf_pages(pdf_path: Path, table_prefilter: str = DEFAULT_TABLE_PREFILTER,
+                   page_cache: Optional[PageTextCache] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Pages of a PDF as parse_pdf_pages() yields them, read from `page_cache`
+    when this file was extracted before with the same extractor key.
+
+    Parsed pages are written to the cache as they go; the document becomes
+    readable from the cache only once every page is written. Audit mode
+    always parses, so the prefilter check really runs.
+    """
+    if page_cache is None:
+        yield from parse_pdf_pages(pdf_path, table_prefilter)
+        return
+
+    digest, extractor = file_digest(pdf_path), extractor_key(table_prefilter)
+    if table_prefilter != "audit":
+        page_count = page_cache.page_count(digest, extractor)
+        if page_count is not None:
+            logger.info(f"  {pdf_path.name}: extracted pages read from the page cache")
+            for page in page_cache.iter_pages(digest, extractor):
+                page["page_count"] = page_count
+                yield page
+            return
+    else:
+        page_cache.record_miss()
+
+    page_cache.begin(digest, extractor)
+    pending, parsed = [], 0
+    for page in parse_pdf_pages(pdf_path, table_prefilter):
+        yield page
+        # Audit pages are cached as 'off' output: detection did run on
+        # them, so a later 'off' run must not report them as skipped
+        pending.append(dict(page, skipped=False) if table_prefilter == "audit" else page)
+        parsed += 1
+        if len(pending) >= PAGE_CACHE_BATCH:
+            page_cache.add_pages(digest, extractor, pending)
+            pending = []
+    page_cache.add_pages(digest, extractor, pending)
+    page_cache.complete(digest, extractor, parsed)
+
+
+def iter_pdf_chunks(pdf_path: Path, chunk_size: int, chunk_overlap: int,
+                    table_prefilter: str = DEFAULT_TABLE_PREFILTER,
+                    page_cache: Optional[PageTextCache] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Yield the text and table chunks of a PDF page by page, with rich metadata.
+
+    Only the current page is held in memory, so memory use does not grow
+    with the size of the document. Progress is logged per page (at INFO
+    at most every PROGRESS_INTERVAL seconds).
+
+    Parameters
+    ----------
+    pdf_path : Path
+        Path to the PDF file.
+    chunk_size : int
+        Target chunk size in characters.
+    chunk_overlap : int
+        Overlap between chunks in characters.
+    table_prefilter : str
+        'on', 'audit' or 'off' (see TABLE_PREFILTER_MODES).
+    page_cache : Optional[PageTextCache]
+        Cache of extracted pages; a cached PDF is not parsed again.
+
+    Yields
+    ------
+    Dict[str, Any]
+        Chunks with 'text', 'metadata', and 'type' fields.
+    """
+    skipped_pages = []  # Pages where the prefilter skipped table detection
+    n_chunks = 0
+    page_count = 0
+    last_report = time.monotonic()
+
+    try:
+        for page in iter_pdf_pages(pdf_path, table_prefilter, page_cache):
+            page_num, page_count, tables = page["page"], page["page_count"], page["tables"]
+            if page["skipped"]:
+                skipped_pages.append(page_num)
 
             # Create a separate chunk for each table found
             for table in tables:
-                chunks.append({
+                n_chunks += 1
+                yield {
                     "text": table["text"],  # Formatted table text with [TABLE] markers
                     "metadata": {
                         "source": str(pdf_path.name),  # Filename for citation
                         "page": page_num,              # Page number for reference
                         "type": "table",               # Mark as table for filtering
-                        "table_index": table["index"]  # Which table on this page
+                        "table_index": table["index"], # Which table on this page
+                        # Region left out of this page's text chunks
+                        "bbox": ",".join(f"{v:.1f}" for v in table["bbox"]),
                     },
                     "type": "table"
-                })
+                }
 
-            # ═══════════════════════════════════════════════════════════
-            # STEP 2: Extract regular text content from this page
-            # ═══════════════════════════════════════════════════════════
-            page_text = page.get_text("text")
-
-            # Note: This extracts ALL text, including table text
-            # For better quality, you could subtract table regions
-            # but that requires more complex geometric calculations
+            page_text = page["text"]
             if page_text and page_text.strip():
-                # Split page text into semantic chunks with overlap
-                page_chunks = chunk_text(page_text, chunk_size, chunk_overlap)
+                # Split page text into semantic chunks with overlap;
+                # spans are (start, end) offsets into page_text
+                spans = list(chunk_spans(page_text, chunk_size, chunk_overlap))
 
                 # Create a separate chunk entry for each text chunk
-                for chunk_idx, chunk in enumerate(page_chunks):
-                    if chunk.strip():  # Skip empty chunks
-                        chunks.append({
-                            "text": chunk,  # The actual text content
-                            "metadata": {
-                                "source": str(pdf_path.name),           # Filename
-                                "page": page_num,                       # Page number
-                                "type": "text",                         # Mark as text
-                                "chunk_index": chunk_idx,               # Order on page
-                                "total_chunks_on_page": len(page_chunks) # Context
-                            },
-                            "type": "text"
-                        })
-
-        # Get page count before closing (needed for logging)
-        page_count = len(doc)
-
-        # Clean up: close the PDF document
-        doc.close()
-        logger.info(f"Extracted {len(chunks)} chunks from {pdf_path.name} ({page_count} pages)")
+                for chunk_idx, (start, end) in enumerate(spans):
+                    n_chunks += 1
+                    yield {
+                        "text": page_text[start:end],  # The actual text content
+                        "metadata": {
+                            "source": str(pdf_path.name),           # Filename
+                            "page": page_num,                       # Page number
+                            "type": "text",                         # Mark as text
+                            "chunk_index": chunk_idx,               # Order on page
+                            "total_chunks_on_page": len(spans),     # Context
+                            "char_start": start,                    # Offsets in page text
+                            "char_end": end,
+                            "tables_excluded": len(tables),         # Table regions left out
+                        },
+                        "type": "text"
+                    }
+
+            # ── Progress ──────────────────────────────────────────
+            now = time.monotonic()
+            if now - last_report >= PROGRESS_INTERVAL:
+                last_report = now
+                logger.info(f"  {pdf_path.name}: page {page_num}/{page_count}, {n_chunks} chunks")
+            else:
+                logger.debug(f"  {pdf_path.name}: page {page_num}/{page_count}, {n_chunks} chunks")
+
+        logger.info(f"Extracted {n_chunks} chunks from {pdf_path.name} ({page_count} pages)")
+        if skipped_pages:
+            logger.info(f"  Table detection skipped on {len(skipped_pages)}/{page_count} pages "
+                        f"(no ruling lines): {page_ranges(skipped_pages)}")
 
     except Exception as e:
         logger.error(f"Failed to extract content from {pdf_path}: {e}")
 
-    return chunks
+
+def extract_content_from_pdf(pdf_path: Path, chunk_size: int,
+                             chunk_overlap: int,
+                             table_prefilter: str = DEFAULT_TABLE_PREFILTER) -> List[Dict[str, Any]]:
+    """All chunks of a PDF as a list; see iter_pdf_chunks() for streaming."""
+    return list(iter_pdf_chunks(pdf_path, chunk_size, chunk_overlap, table_prefilter))
+
+
+def iter_chunk_batches(pdf_files: List[Path], chunk_size: int, chunk_overlap: int,
+                       table_prefilter: str, batch_size: int,
+                       page_cache: Optional[PageTextCache] = None
+                       ) -> Iterator[Tuple[Path, List[Dict[str, Any]], bool]]:
+    """
+    Yield (pdf_path, batch, last) for every PDF, at most `batch_size` chunks per batch.
+
+    Batches never span two PDFs; `last` marks the final (possibly empty)
+    batch of a PDF.
+    """
+    for pdf_path in pdf_files:
+        logger.info(f"Processing: {pdf_path.name}")
+        batch = []
+        for chunk in iter_pdf_chunks(pdf_path, chunk_size, chunk_overlap, table_prefilter,
+                                     page_cache):
+            batch.append(chunk)
+            if len(batch) >= batch_size:
+                yield pdf_path, batch, False
+                batch = []
+        yield pdf_path, batch, True
+
+
+def prefetch(items: Iterable[Any], depth: int) -> Iterator[Any]:
+    """
+    Iterate `items` in a background thread, at most `depth` items ahead.
+
+    The bounded queue between the two threads caps how much extracted
+    content waits for the embedder, and lets PDF extraction of the next
+    batch overlap with embedding and storing the current one. Exceptions
+    from the producer are re-raised in the consumer.
+    """
+    buffer: "queue.Queue" = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+    done = object()
+
+    def put(entry) -> bool:
+        while not stop.is_set():
+            try:
+                buffer.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce() -> None:
+        try:
+            for item in items:
+                if not put((item, None)):
+                    return                  # Consumer went away
+            put((done, None))
+        except BaseException as e:
+            put((done, e))
+
+    thread = threading.Thread(target=produce, name="pdf-extract", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item, error = buffer.get()
+            if item is done:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
 
 
 def reset_chroma(db_path: Path) -> None:
@@ -309,7 +602,13 @@ def reset_chroma(db_path: Path) -> None:
 # ╚════════════════════════════════════════════════════════════════╝
 
 def index_pdfs(pdf_dir: Path, chroma_path: Path, collection_name: str,
-               chunk_size: int, chunk_overlap: int) -> None:
+               chunk_size: int, chunk_overlap: int,
+               embed_cache: Optional[EmbeddingDiskCache] = None,
+               embedding_function: Optional[Callable] = None,
+               hnsw: Optional[Dict[str, Any]] = None,
+               table_prefilter: str = DEFAULT_TABLE_PREFILTER,
+               dedup: Optional[NearDuplicateFilter] = None,
+               page_cache: Optional[PageTextCache] = None) -> None:
     """
     Index all PDFs in the specified directory into ChromaDB.
 
@@ -325,6 +624,23 @@ def index_pdfs(pdf_dir: Path, chroma_path: Path, collection_name: str,
         Target chunk size in characters.
     chunk_overlap : int
         Overlap between chunks in characters.
+    embed_cache : Optional[EmbeddingDiskCache]
+        Content-hash cache of chunk vectors; unchanged chunks skip the model.
+    embedding_function : Optional[Callable]
+        Embeds chunks when there is no cache (default: MiniLM with the
+        calibrated runtime settings, see common/embeddings.py).
+    hnsw : Optional[Dict[str, Any]]
+        Collection `configuration` with the distance space and HNSW
+        parameters (see common/hnsw.py); Chroma's defaults if omitted.
+    table_prefilter : str
+        Skip table detection on pages without ruling lines ('on'), check
+        what skipping would miss ('audit'), or detect everywhere ('off').
+    dedup : Optional[NearDuplicateFilter]
+        Skips chunks that are near-duplicates of one already stored and
+        records them on it (see common/dedup.py); every chunk is stored if omitted.
+    page_cache : Optional[PageTextCache]
+        Extracted pages of previously parsed PDFs; with it, a run that only
+        changes chunking re-chunks and re-embeds without parsing.
     """
     # ══════════════════════════════════════════════════════════════
     # SETUP PHASE: Initialize all components before processing
@@ -354,37 +670,41 @@ def index_pdfs(pdf_dir: Path, chroma_path: Path, collection_name: str,
             database=DEFAULT_DATABASE,   # Use default database
         )
         # Get or create the collection (like a table in SQL)
-        coll = client.get_or_create_collection(collection_name)
-        logger.info(f"Created collection: {collection_name}")
+        # Distance space and HNSW parameters are fixed when the collection is created
+        coll = client.get_or_create_collection(collection_name,
+                                               configuration=hnsw)
+        logger.info(f"Created collection: {collection_name} "
+                    f"(hnsw: {coll.configuration.get('hnsw')})")
     except Exception as e:
         logger.error(f"Failed to create ChromaDB client: {e}")
         return
 
-    # ── 4. Process each PDF ───────────────────────────────────────
-    total_chunks = 0  # Track total across all PDFs for reporting
-
-    for pdf_path in pdf_files:
-        logger.info(f"Processing: {pdf_path.name}")
-
-        # ═══════════════════════════════════════════════════════════
-        # STEP A: Extract and chunk the PDF content
-        # ═══════════════════════════════════════════════════════════
-        # This gets us a list of chunks with text and metadata
-        chunks = extract_content_from_pdf(pdf_path, chunk_size, chunk_overlap)
-
-        if not chunks:
-            logger.warning(f"No content extracted from {pdf_path.name}")
-            continue
-
-        # ═══════════════════════════════════════════════════════════
-        # STEP B: Embed and store chunks in batches
-        # ═══════════════════════════════════════════════════════════
-        # Processing in batches of 100 prevents memory issues with large PDFs
-        batch_size = 100
+    # Embed here rather than inside ChromaDB so the runtime settings (and cache) apply
+    embedding_function = embedding_function or default_embedding_function()
+    embed = embed_cache.embed if embed_cache else embedding_function
 
-        for i in range(0, len(chunks), batch_size):
-            batch = chunks[i:i + batch_size]  # Get next batch of chunks
+    # Never store in batches smaller than the model's own batch size
+    runtime = getattr(embedding_function, "runtime", None)
+    batch_size = max(100, runtime.batch_size if runtime else 0)
 
+    # ── 4. Process each PDF ───────────────────────────────────────
+    # Streaming pipeline: pages → chunks → batches → embed + store.
+    # Extraction runs in a background thread at most PREFETCH_BATCHES
+    # batches ahead, so memory stays bounded however large a PDF is
+    total_chunks = 0  # Chunks extracted across all PDFs (numbers the IDs)
+    stored_chunks = 0 # Chunks stored, i.e. not near-duplicates
+    failed_chunks = 0 # Chunks lost to failed embed/add calls
+    pdf_chunks = 0    # Chunks of the PDF currently being indexed
+    pdf_stored = 0    # ... of which stored
+    pdf_failed = 0    # ... of which lost to failed adds
+
+    batches = prefetch(
+        iter_chunk_batches(pdf_files, chunk_size, chunk_overlap, table_prefilter, batch_size,
+                           page_cache),
+        depth=PREFETCH_BATCHES,
+    )
+    for pdf_path, batch, last in batches:
+        if batch:
             # Pull out just the text content for embedding
             texts = [chunk["text"] for chunk in batch]
 
@@ -392,7 +712,7 @@ def index_pdfs(pdf_dir: Path, chroma_path: Path, collection_name: str,
             # Create unique IDs for each chunk
             # ─────────────────────────────────────────────────────
             # Format: "filename_chunk_123" for easy identification
-            ids = [f"{pdf_path.stem}_chunk_{total_chunks + i + j}"
+            ids = [f"{pdf_path.stem}_chunk_{total_chunks + j}"
                    for j in range(len(batch))]
 
             # ─────────────────────────────────────────────────────
@@ -401,30 +721,87 @@ def index_pdfs(pdf_dir: Path, chroma_path: Path, collection_name: str,
             # This enables filtering and citation in RAG queries
             metadatas = [chunk["metadata"] for chunk in batch]
 
+            # ─────────────────────────────────────────────────────
+            # Drop near-duplicates (headers, footers, legal notices)
+            # ─────────────────────────────────────────────────────
+            # Each is recorded as an occurrence of the chunk already stored
+            if dedup is not None:
+                keep = [
+                    j for j, (chunk_id, text, metadata) in enumerate(zip(ids, texts, metadatas))
+                    if dedup.check(chunk_id, text, {"id": chunk_id,
+                                                    "source": metadata["source"],
+                                                    "page": metadata["page"]}) is None
+                ]
+                texts = [texts[j] for j in keep]
+                ids = [ids[j] for j in keep]
+                metadatas = [metadatas[j] for j in keep]
+
             # ─────────────────────────────────────────────────────
             # Store everything in ChromaDB
             # ─────────────────────────────────────────────────────
             # Each entry has: unique ID, vector embedding, text, and metadata
+            stored = failed = 0
             try:
-                coll.add(
-                    ids=ids,                    # Unique identifier for each chunk
-                    documents=texts,            # Original text for retrieval
-                    metadatas=metadatas        # Source, page, type, etc.
-                )
+                # Cached vectors are reused for chunk texts embedded on a previous run
+                if texts:
+                    embeddings = embed(texts)
+                    coll.add(
+                        ids=ids,                    # Unique identifier for each chunk
+                        embeddings=embeddings,      # 384-dim MiniLM vectors
+                        documents=texts,            # Original text for retrieval
+                        metadatas=metadatas        # Source, page, type, etc.
+                    )
+                stored = len(texts)
             except Exception as e:
                 logger.error(f"Failed to add chunks to ChromaDB: {e}")
-                continue
-
-        # Update running total and log progress
-        total_chunks += len(chunks)
-        logger.info(f"  → Indexed {len(chunks)} chunks from {pdf_path.name}")
+                # Later duplicates must not be skipped in favour of chunks
+                # that were never stored; those already skipped are lost too
+                failed = len(texts) + (dedup.forget(ids) if dedup is not None else 0)
+
+            # Update running totals
+            total_chunks += len(batch)
+            stored_chunks += stored
+            failed_chunks += failed
+            pdf_chunks += len(batch)
+            pdf_stored += stored
+            pdf_failed += failed
+
+        if last:
+            if not pdf_chunks:
+                logger.warning(f"No content extracted from {pdf_path.name}")
+            elif pdf_stored < pdf_chunks:
+                skipped = pdf_chunks - pdf_stored - pdf_failed
+                notes = [f"{skipped} near-duplicates skipped"] if skipped else []
+                if pdf_failed:
+                    notes.append(f"{pdf_failed} failed to store")
+                logger.info(f"  → Indexed {pdf_stored} chunks from {pdf_path.name} "
+                            f"({', '.join(notes)})")
+            else:
+                logger.info(f"  → Indexed {pdf_chunks} chunks from {pdf_path.name}")
+            pdf_chunks = pdf_stored = pdf_failed = 0
+
+    # Point each stored chunk at the near-duplicates it stands for
+    if dedup is not None:
+        record_occurrences(coll, dedup)
 
     logger.info(f"\n{'='*60}")
     logger.info(f"Indexing complete!")
     logger.info(f"  Total PDFs processed: {len(pdf_files)}")
-    logger.info(f"  Total chunks indexed: {total_chunks}")
+    logger.info(f"  Total chunks indexed: {stored_chunks}")
+    if failed_chunks:
+        logger.warning(f"  Chunks not stored (failed adds): {failed_chunks}")
     logger.info(f"  Database location: {chroma_path.resolve()}")
     logger.info(f"  Collection name: {collection_name}")
+    if embed_cache is not None:
+        s = embed_cache.stats()
+        logger.info(f"  Embedding cache: {s['hits']} reused / {s['misses']} embedded "
+                    f"({s['hit_rate']:.1%} hit rate, {s['path']})")
+    if page_cache is not None:
+        s = page_cache.stats()
+        logger.info(f"  Page cache: {s['hits']} PDFs reused / {s['misses']} parsed "
+                    f"({s['path']})")
+    if dedup is not None:
+        logger.info(f"  Near-duplicates: {dedup.format_stats()}")
     logger.info(f"{'='*60}\n")
 
 
@@ -453,6 +830,12 @@ Examples:
 
   # Full customization
   python index_pdfs.py --pdf-dir ./data --chroma-path ./my_db --chunk-size 600
+
+  # Try another chunk size: PDFs are not parsed again (page cache)
+  python index_pdfs.py --chunk-size 500 --chunk-overlap 100
+
+  # Check that the table prefilter misses no tables on this corpus
+  python index_pdfs.py --table-prefilter audit
         """
     )
 
@@ -494,6 +877,72 @@ Examples:
         help=f"Overlap between chunks in characters (default: {DEFAULT_CHUNK_OVERLAP})"
     )
 
+    # ── Table detection ───────────────────────────────────────────
+    # find_tables() is skipped on pages without ruling lines; "audit"
+    # runs it anyway and warns about tables the prefilter would miss
+    parser.add_argument(
+        "--table-prefilter",
+        choices=TABLE_PREFILTER_MODES,
+        default=DEFAULT_TABLE_PREFILTER,
+        help=f"Skip table detection on pages without ruling lines (default: {DEFAULT_TABLE_PREFILTER})"
+    )
+
+
+    # ── Embedding cache ───────────────────────────────────────────
+    # Vectors are cached by SHA-256 of the chunk text, so unchanged chunks
+    # are not re-embedded when the index is rebuilt
+    parser.add_argument(
+        "--embed-cache",
+        type=Path,
+        default=DEFAULT_CACHE_PATH,
+        help=f"SQLite embedding cache file (default: {DEFAULT_CACHE_PATH})"
+    )
+
+    parser.add_argument(
+        "--no-embed-cache",
+        action="store_true",
+        help="Embed every chunk from scratch and leave the cache untouched"
+    )
+
+    parser.add_argument(
+        "--embed-cache-max-age-days",
+        type=float,
+        default=DEFAULT_MAX_AGE_DAYS,
+        help=f"Drop cached vectors unused for this many days (default: {DEFAULT_MAX_AGE_DAYS:g})"
+    )
+
+    parser.add_argument(
+        "--embed-cache-max-entries",
+        type=int,
+        default=DEFAULT_MAX_ENTRIES,
+        help=f"Keep at most this many cached vectors (default: {DEFAULT_MAX_ENTRIES})"
+    )
+
+    # ── Page cache ────────────────────────────────────────────────
+    # Extracted page text and tables are cached by SHA-256 of the PDF, so
+    # re-chunking with other --chunk-size/--chunk-overlap skips parsing
+    parser.add_argument(
+        "--page-cache",
+        type=Path,
+        default=DEFAULT_PAGE_CACHE_PATH,
+        help=f"SQLite cache of extracted PDF pages (default: {DEFAULT_PAGE_CACHE_PATH})"
+    )
+
+    parser.add_argument(
+        "--no-page-cache",
+        action="store_true",
+        help="Parse every PDF and leave the page cache untouched"
+    )
+
+    # ── Embedding runtime (--embed-threads, --embed-batch-size, ...) ─
+    add_runtime_arguments(parser)
+
+    # ── Vector index (--hnsw-space, --hnsw-m, ...) ────────────────
+    add_hnsw_arguments(parser)
+
+    # ── Near-duplicate suppression (--no-dedup, --dedup-threshold, ...) ─
+    add_dedup_arguments(parser)
+
     # Parse the command-line arguments
     args = parser.parse_args()
 
@@ -521,16 +970,60 @@ Examples:
         logger.error("Chunk overlap must be less than chunk size")
         return
 
+    # HNSW parameters must be positive, dedup threshold in (0, 1]
+    try:
+        hnsw = hnsw_from_args(args)
+        dedup = dedup_from_args(args)
+    except ValueError as e:
+        logger.error(str(e))
+        return
+
     # ══════════════════════════════════════════════════════════════
     # All validation passed - run the indexing process
     # ══════════════════════════════════════════════════════════════
-    index_pdfs(
-        pdf_dir=args.pdf_dir,
-        chroma_path=args.chroma_path,
-        collection_name=args.collection,
-        chunk_size=args.chunk_size,
-        chunk_overlap=args.chunk_overlap
-    )
+    # Threads, batch size and graph optimization for the MiniLM model
+    # (the embedding daemon, if EMBED_SERVER_URL is set, uses its own)
+    runtime = None
+    if embedding_server_url():
+        logger.info(f"Embedding server: {embedding_server_url()}")
+        if runtime_arguments_given(args):
+            runtime = runtime_from_args(args)       # Warned about and ignored
+    else:
+        runtime = runtime_from_args(args)
+        logger.info(f"Embedding runtime: {runtime}")
+    embedding_function = default_embedding_function(runtime)
+
+    embed_cache = None
+    if not args.no_embed_cache:
+        embed_cache = EmbeddingDiskCache(
+            args.embed_cache,
+            embedding_function=embedding_function,
+            max_age_days=args.embed_cache_max_age_days,
+            max_entries=args.embed_cache_max_entries,
+        )
+    page_cache = None
+    if not args.no_page_cache:
+        page_cache = PageTextCache(args.page_cache,
+                                   max_age_days=DEFAULT_PAGE_CACHE_MAX_AGE_DAYS)
+    try:
+        index_pdfs(
+            pdf_dir=args.pdf_dir,
+            chroma_path=args.chroma_path,
+            collection_name=args.collection,
+            chunk_size=args.chunk_size,
+            chunk_overlap=args.chunk_overlap,
+            embed_cache=embed_cache,
+            embedding_function=embedding_function,
+            hnsw=hnsw,
+            table_prefilter=args.table_prefilter,
+            dedup=dedup,
+            page_cache=page_cache
+        )
+    finally:
+        if embed_cache is not None:
+            embed_cache.close()     # Applies age/size eviction
+        if page_cache is not None:
+            page_cache.close()
 
 
 if __name__ == "__main__":
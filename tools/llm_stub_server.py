@@ -0,0 +1,497 @@
+#!/usr/bin/env python3
+"""
+llm_stub_server.py
+────────────────────────────────────────────────────────────────────
+A local stand-in for every LLM endpoint this repo talks to, so each
+pipeline can be load-tested offline at realistic latencies.
+
+Endpoints
+---------
+Ollama (rag_vulnerable / rag_hardened generate(), scripts/warmup.py,
+ChatOllama in supervisor_budget_agent, LiteLLM "ollama/..." models):
+- POST /api/generate          prompt completion, NDJSON streaming by default
+- POST /api/chat              chat completion, NDJSON streaming by default
+- GET  /api/tags              model list (startup checks)
+- POST /api/show, GET /api/version
+
+OpenAI-compatible (HF InferenceClient(base_url=...).chat_completion in
+rag_hardened_v2, LiteLLM "openai/..." models):
+- POST /v1/chat/completions   (also any path ending in it), SSE when stream=true
+- GET  /v1/models
+
+Stub control:
+- GET  /stub/stats            request / error / token counters
+
+Behaviour
+---------
+- **Deterministic answers** – a fixed answer of `--answer-tokens` words, or
+  the first matching rule from a `--script` file (JSON list or JSONL of
+  {"match": "<regex>", "response": "...", "status": 200}; matched against
+  the prompt / last user message).
+- **Latency** – `--ttft-ms` before the first token, then `--tokens-per-sec`
+  decode rate (streamed token by token, or slept in one go when not
+  streaming), with optional `--jitter` (fraction, seeded).
+- **Error injection** – `--error-rate` fraction of requests fail with
+  `--error-status` (default 503, which the HF path treats as "model
+  loading"); `--hang-rate` fraction never answer until the client times out.
+
+Usage
+-----
+python llm_stub_server.py [--port 11435] [--ttft-ms 200] [--tokens-per-sec 40]
+                          [--script responses.jsonl] [--error-rate 0.05]
+
+Pointing the pipelines at it:
+  - Ollama clients: stop Ollama and run the stub with --port 11434, or set
+    OLLAMA_HOST=http://127.0.0.1:11435 for scripts/warmup.py
+  - rag_hardened_v2: export HF_BASE_URL=http://127.0.0.1:11435
+"""
+
+# ───────────────────── standard-library imports ────────────────────
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import logging
+
+# ───────────────────── logging setup ───────────────────────────────
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# ╔════════════════════════════════════════════════════════════════╗
+# 1.  Configuration / constants                                    ║
+# ╚════════════════════════════════════════════════════════════════╝
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 11435            # Next to Ollama's 11434 so both can run side by side
+DEFAULT_TTFT_MS = 200           # Time to first token
+DEFAULT_TOKENS_PER_SEC = 40.0   # Roughly a 1-3B model on a laptop CPU
+DEFAULT_ANSWER_TOKENS = 60
+DEFAULT_ERROR_STATUS = 503
+
+STUB_MODELS = ["llama3.2:1b", "qwen2.5:3b"]
+
+ANSWER_WORDS = (
+    "According to the OmniTech documentation you can complete this request "
+    "from the account Settings page at https://www.omnitech.com and the "
+    "change takes effect immediately. If you need further help contact "
+    "support through the official support portal."
+).split()
+
+
+class StubSettings:
+    """Latency, response and failure behaviour for the stub server."""
+
+    def __init__(self, ttft_ms: float = DEFAULT_TTFT_MS,
+                 tokens_per_sec: float = DEFAULT_TOKENS_PER_SEC,
+                 answer_tokens: int = DEFAULT_ANSWER_TOKENS,
+                 jitter: float = 0.0,
+                 error_rate: float = 0.0,
+                 error_status: int = DEFAULT_ERROR_STATUS,
+                 hang_rate: float = 0.0,
+                 script: Optional[List[Dict[str, Any]]] = None,
+                 seed: int = 0):
+        self.ttft_ms = ttft_ms
+        self.tokens_per_sec = tokens_per_sec
+        self.answer_tokens = answer_tokens
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.hang_rate = hang_rate
+        self.rules = [(re.compile(r.get("match", ".*"), re.IGNORECASE | re.DOTALL), r)
+                      for r in (script or [])]
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+
+    def _roll(self) -> float:
+        with self._rng_lock:
+            return self._rng.random()
+
+    def default_answer(self) -> str:
+        words = [ANSWER_WORDS[i % len(ANSWER_WORDS)] for i in range(self.answer_tokens)]
+        return " ".join(words)
+
+    def respond(self, prompt: str) -> Tuple[int, str]:
+        """Pick (status, answer) for a prompt: scripted rule, injected error or default."""
+        for pattern, rule in self.rules:
+            if pattern.search(prompt):
+                return int(rule.get("status", 200)), str(rule.get("response", ""))
+        if self.error_rate and self._roll() < self.error_rate:
+            return self.error_status, ""
+        return 200, self.default_answer()
+
+    def should_hang(self) -> bool:
+        return bool(self.hang_rate) and self._roll() < self.hang_rate
+
+    def _scaled(self, seconds: float) -> float:
+        if not self.jitter:
+            return seconds
+        return max(0.0, seconds * (1 + self.jitter * (2 * self._roll() - 1)))
+
+    def ttft_seconds(self) -> float:
+        return self._scaled(self.ttft_ms / 1000)
+
+    def token_seconds(self) -> float:
+        return self._scaled(1 / self.tokens_per_sec) if self.tokens_per_sec > 0 else 0.0
+
+
+def load_script(path: Path) -> List[Dict[str, Any]]:
+    """Read response rules from a JSON list or a JSONL file."""
+    text = path.read_text()
+    if text.lstrip().startswith("["):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def tokenize(answer: str) -> List[str]:
+    """Split an answer into stream pieces (words keep their trailing space)."""
+    return re.findall(r"\S+\s*", answer) or [""]
+
+
+class StubStats:
+    """Thread-safe counters exposed at /stub/stats."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters: Dict[str, int] = {}
+
+    def incr(self, key: str, n: int = 1) -> None:
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + n
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.counters)
+
+
+# ╔════════════════════════════════════════════════════════════════╗
+# 2.  Request handler                                              ║
+# ╚════════════════════════════════════════════════════════════════╝
+
+def _now_iso() -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+
+
+def _message_text(messages: List[Dict[str, Any]]) -> str:
+    """Flatten chat messages (string or OpenAI content-part lists) into one prompt."""
+    parts = []
+    for m in messages or []:
+        content = m.get("content", "")
+        if isinstance(content, list):
+            content = " ".join(str(p.get("text", "")) for p in content if isinstance(p, dict))
+        parts.append(str(content))
+    return "\n".join(parts)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Serves Ollama- and OpenAI-shaped responses from `server.settings`."""
+
+    server_version = "llm-stub/2.0"
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out as separate writes; without TCP_NODELAY keep-alive
+    # clients see an extra ~40 ms per request from Nagle + delayed ACK
+    disable_nagle_algorithm = True
+
+    def log_message(self, fmt: str, *args: Any) -> None:
+        logger.debug("%s - %s", self.address_string(), fmt % args)
+
+    # ── helpers ────────────────────────────────────────────────────
+
+    @property
+    def settings(self) -> StubSettings:
+        return self.server.settings
+
+    def _read_json(self) -> Dict[str, Any]:
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        try:
+            return json.loads(self.rfile.read(length))
+        except json.JSONDecodeError:
+            return {}
+
+    def _send_json(self, status: int, body: Dict[str, Any]) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _start_stream(self, content_type: str) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+
+    def _write_chunk(self, data: bytes) -> None:
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def _end_stream(self) -> None:
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def _tokens(self, answer: str) -> Iterator[str]:
+        """Yield answer pieces paced at TTFT + tokens/sec."""
+        time.sleep(self.settings.ttft_seconds())
+        for i, piece in enumerate(tokenize(answer)):
+            if i:
+                time.sleep(self.settings.token_seconds())
+            yield piece
+
+    def _whole_answer(self, answer: str) -> None:
+        """Sleep for the time the full answer would take to generate."""
+        pieces = len(tokenize(answer))
+        time.sleep(self.settings.ttft_seconds()
+                   + max(0, pieces - 1) * self.settings.token_seconds())
+
+    def _prepare(self, prompt: str, max_tokens: Optional[int] = None) -> Optional[str]:
+        """Apply hang/error injection and max_tokens; returns the answer, or None if already answered."""
+        stats: StubStats = self.server.stats
+        stats.incr("requests")
+        if self.settings.should_hang():
+            stats.incr("hangs")
+            time.sleep(3600)
+            return None
+        status, answer = self.settings.respond(prompt)
+        if status != 200:
+            stats.incr("errors")
+            time.sleep(self.settings.ttft_seconds())
+            message = "Model is currently loading" if status == 503 else "injected stub error"
+            self._send_json(status, {"error": message})
+            return None
+        if max_tokens and max_tokens > 0:
+            answer = "".join(tokenize(answer)[:max_tokens]).rstrip()
+        stats.incr("prompt_tokens", (len(prompt) + 3) // 4)
+        stats.incr("completion_tokens", len(tokenize(answer)))
+        return answer
+
+    # ── routes ─────────────────────────────────────────────────────
+
+    def do_GET(self) -> None:
+        route = self.path.split("?")[0].rstrip("/")
+        if route == "/api/tags":
+            self._send_json(200, {"models": [
+                {"name": m, "model": m, "modified_at": _now_iso(), "size": 0,
+                 "details": {"format": "gguf", "family": "stub"}}
+                for m in STUB_MODELS]})
+        elif route == "/api/version":
+            self._send_json(200, {"version": "0.0.0-stub"})
+        elif route == "/v1/models":
+            self._send_json(200, {"object": "list", "data": [
+                {"id": m, "object": "model", "created": 0, "owned_by": "stub"}
+                for m in STUB_MODELS]})
+        elif route == "/stub/stats":
+            self._send_json(200, self.server.stats.snapshot())
+        elif route in ("", "/"):
+            self._send_json(200, {"status": "Ollama is running (stub)"})
+        else:
+            self._send_json(404, {"error": f"unknown endpoint {self.path}"})
+
+    def do_POST(self) -> None:
+        body = self._read_json()
+        route = self.path.split("?")[0].rstrip("/")
+
+        if route == "/api/generate":
+            self._ollama(body, body.get("prompt", ""), chat=False)
+        elif route == "/api/chat":
+            self._ollama(body, _message_text(body.get("messages", [])), chat=True)
+        elif route == "/api/show":
+            self._send_json(200, {"modelfile": "", "parameters": "", "template": "",
+                                  "details": {"format": "gguf", "family": "stub"},
+                                  "model_info": {}, "capabilities": ["completion", "tools"]})
+        elif route.endswith("/v1/chat/completions") or route == "/chat/completions":
+            self._openai_chat(body)
+        else:
+            self._send_json(404, {"error": f"unknown endpoint {self.path}"})
+
+    def _ollama(self, body: Dict[str, Any], prompt: str, chat: bool) -> None:
+        """Ollama /api/generate and /api/chat (stream defaults to true, like Ollama)."""
+        answer = self._prepare(prompt, (body.get("options") or {}).get("num_predict"))
+        if answer is None:
+            return
+
+        model = body.get("model", STUB_MODELS[0])
+        t0 = time.perf_counter_ns()
+
+        def frame(text: str, done: bool) -> Dict[str, Any]:
+            data: Dict[str, Any] = {"model": model, "created_at": _now_iso(), "done": done}
+            if chat:
+                data["message"] = {"role": "assistant", "content": text}
+            else:
+                data["response"] = text
+            if done:
+                data.update({
+                    "done_reason": "stop",
+                    "total_duration": time.perf_counter_ns() - t0,
+                    "load_duration": 0,
+                    "prompt_eval_count": (len(prompt) + 3) // 4,
+                    "prompt_eval_duration": 0,
+                    "eval_count": len(tokenize(answer)),
+                    "eval_duration": time.perf_counter_ns() - t0,
+                })
+            return data
+
+        if body.get("stream", True):
+            self._start_stream("application/x-ndjson")
+            for piece in self._tokens(answer):
+                self._write_chunk((json.dumps(frame(piece, False)) + "\n").encode())
+            self._write_chunk((json.dumps(frame("", True)) + "\n").encode())
+            self._end_stream()
+        else:
+            self._whole_answer(answer)
+            self._send_json(200, frame(answer, True))
+
+    def _openai_chat(self, body: Dict[str, Any]) -> None:
+        """OpenAI-style /v1/chat/completions, with SSE streaming when stream=true."""
+        prompt = _message_text(body.get("messages", []))
+        answer = self._prepare(prompt, body.get("max_tokens") or body.get("max_completion_tokens"))
+        if answer is None:
+            return
+
+        model = body.get("model") or "stub"
+        completion_id = f"chatcmpl-stub-{time.time_ns()}"
+        created = int(time.time())
+        usage = {
+            "prompt_tokens": (len(prompt) + 3) // 4,
+            "completion_tokens": len(tokenize(answer)),
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+
+        if body.get("stream"):
+            self._start_stream("text/event-stream")
+
+            def event(delta: Dict[str, Any], finish: Optional[str]) -> bytes:
+                chunk = {
+                    "id": completion_id, "object": "chat.completion.chunk",
+                    "created": created, "model": model, "system_fingerprint": "llm-stub",
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish,
+                                 "logprobs": None}],
+                }
+                return f"data: {json.dumps(chunk)}\n\n".encode()
+
+            first = True
+            for piece in self._tokens(answer):
+                delta = {"role": "assistant", "content": piece} if first else {"content": piece}
+                self._write_chunk(event(delta, None))
+                first = False
+            self._write_chunk(event({}, "stop"))
+            self._write_chunk(b"data: [DONE]\n\n")
+            self._end_stream()
+        else:
+            self._whole_answer(answer)
+            self._send_json(200, {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "system_fingerprint": "llm-stub",
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": answer},
+                    "finish_reason": "stop",
+                    "logprobs": None,
+                }],
+                "usage": usage,
+            })
+
+
+# ╔════════════════════════════════════════════════════════════════╗
+# 3.  Server lifecycle                                             ║
+# ╚════════════════════════════════════════════════════════════════╝
+
+def make_server(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                settings: Optional[StubSettings] = None) -> ThreadingHTTPServer:
+    """Create (but do not start) a stub server; port 0 picks a free port."""
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    server.daemon_threads = True
+    server.settings = settings or StubSettings()
+    server.stats = StubStats()
+    return server
+
+
+def serve_in_thread(host: str = DEFAULT_HOST, port: int = 0,
+                    settings: Optional[StubSettings] = None) -> Tuple[ThreadingHTTPServer, str]:
+    """Start a stub server on a background thread; returns (server, base_url)."""
+    server = make_server(host, port, settings)
+    thread = threading.Thread(target=server.serve_forever, name="llm-stub", daemon=True)
+    thread.start()
+    bound_host, bound_port = server.server_address[:2]
+    return server, f"http://{bound_host}:{bound_port}"
+
+
+def main():
+    """Parse command-line arguments and run the stub server until Ctrl+C."""
+    parser = argparse.ArgumentParser(
+        description="Local stand-in for Ollama / OpenAI / HF-compatible LLM endpoints.",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Replace Ollama entirely (stop the real server first)
+  python llm_stub_server.py --port 11434
+
+  # Slow model with 5% "model loading" failures
+  python llm_stub_server.py --ttft-ms 800 --tokens-per-sec 15 --error-rate 0.05
+
+  # Scripted answers (JSONL: {"match": "password", "response": "..."})
+  python llm_stub_server.py --script responses.jsonl
+        """
+    )
+    parser.add_argument("--host", default=DEFAULT_HOST,
+                        help=f"Interface to bind (default: {DEFAULT_HOST})")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT,
+                        help=f"Port to listen on (default: {DEFAULT_PORT})")
+    parser.add_argument("--ttft-ms", type=float, default=DEFAULT_TTFT_MS,
+                        help=f"Time to first token in ms (default: {DEFAULT_TTFT_MS})")
+    parser.add_argument("--tokens-per-sec", type=float, default=DEFAULT_TOKENS_PER_SEC,
+                        help=f"Decode rate; 0 = instant (default: {DEFAULT_TOKENS_PER_SEC})")
+    parser.add_argument("--answer-tokens", type=int, default=DEFAULT_ANSWER_TOKENS,
+                        help=f"Words in the default answer (default: {DEFAULT_ANSWER_TOKENS})")
+    parser.add_argument("--jitter", type=float, default=0.0,
+                        help="Random +/- fraction applied to TTFT and per-token delay (default: 0)")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="Fraction of requests that fail (default: 0)")
+    parser.add_argument("--error-status", type=int, default=DEFAULT_ERROR_STATUS,
+                        help=f"HTTP status for injected failures (default: {DEFAULT_ERROR_STATUS})")
+    parser.add_argument("--hang-rate", type=float, default=0.0,
+                        help="Fraction of requests that never answer (default: 0)")
+    parser.add_argument("--script", type=Path,
+                        help="JSON/JSONL file of {match, response, status} rules")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="Seed for jitter and error injection (default: 0)")
+    args = parser.parse_args()
+
+    settings = StubSettings(
+        ttft_ms=args.ttft_ms,
+        tokens_per_sec=args.tokens_per_sec,
+        answer_tokens=args.answer_tokens,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        hang_rate=args.hang_rate,
+        script=load_script(args.script) if args.script else None,
+        seed=args.seed,
+    )
+    server = make_server(args.host, args.port, settings)
+    logger.info(f"LLM stub listening on http://{args.host}:{args.port} "
+                f"(TTFT {args.ttft_ms:.0f} ms, {args.tokens_per_sec:g} tok/s, "
+                f"error rate {args.error_rate:g})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Stopping LLM stub")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
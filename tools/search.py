@@ -11,11 +11,20 @@ It uses the same embedding model to ensure semantic consistency.
 Features
 --------
 - **Multi-database support**: Search code or PDF collections
+- **Federated search**: `--target all` queries every registered collection
+  concurrently and merges the hits into one ranked list
 - **Semantic search**: Uses vector similarity, not keyword matching
+- **Symbol lookup**: identifier-shaped code queries (`filter_chunks`,
+  `NearDuplicateFilter.check`, `chunk_*`) are answered exactly from the
+  symbol table written by index_code.py, before any embedding is done
 - **Colorized output**: Best match highlighted, similarity scores shown
 - **Rich metadata**: Shows source file, page/line numbers, language, etc.
+- **Query embedding cache**: Repeated queries skip the embedding model (LRU)
+- **Memory-mapped backend**: `--backend mmap` searches the float16/int8 copy
+  written by convert_chroma_store.py (exact top-k, near-instant open)
 - **Interactive mode**: REPL for multiple searches
 - **CLI mode**: Single query via command-line arguments
+- **Bulk mode**: Batched queries from a file or stdin, streamed as JSONL
 
 Usage
 -----
@@ -28,22 +37,48 @@ python search.py --target pdfs
 # Single query via CLI
 python search.py --query "how to reset password" --target pdfs
 
+# Search code, PDFs and any --register'ed collections at once
+python search.py --query "password reset" --target all
+
+# Bulk mode: queries from a file (or '-' for stdin), JSONL results on stdout
+python search.py --queries-file questions.txt --target pdfs --top-k 5 > results.jsonl
+
 # Customize number of results
 python search.py --query "authentication function" --top-k 5 --target code
 
+# Search the memory-mapped copy (after tools/convert_chroma_store.py)
+python search.py --query "how to reset password" --target pdfs --backend mmap
+
+# Definitions and references of a function (exact symbol lookup)
+python search.py --query filter_chunks
+
 Arguments:
-  --target      Which database to search: 'code' or 'pdfs' (default: code)
+  --target      Which database to search: 'code', 'pdfs', 'all' or a registered name (default: code)
+  --register    Extra collection for --target all: NAME=PATH[:COLLECTION[:KIND]] (repeatable)
+  --queries-file  Bulk mode: queries file or '-' for stdin; JSONL results
+  --output      Bulk mode: JSONL output file (default: stdout)
+  --batch-size  Bulk mode: queries per embedding / search call (default: 64)
+  --no-documents  Bulk mode: omit chunk text from the output
   --query       Search query (if not provided, enters interactive mode)
   --top-k       Number of results to return (default: 3)
   --chroma-path Path to ChromaDB directory (default: auto-detect based on target)
   --collection  Collection name (default: auto-detect based on target)
+  --backend     Vector store: 'chroma' or 'mmap' (default: $VECTOR_BACKEND or chroma)
+  --store-path  mmap store directory (default: <chroma-path>_mmap)
+  --no-symbols  Always search semantically, even for identifier queries
 """
 
 # ───────────────────── standard-library imports ────────────────────
 import argparse
+import heapq
+import json
+import re
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple, Iterable, Iterator, TextIO
 import logging
 
 # ───────────────────── 3rd-party imports ───────────────────────────
@@ -57,6 +92,14 @@ except ImportError:
     print("ERROR: chromadb not installed. Install with: pip install chromadb")
     sys.exit(1)
 
+# ───────────────────── shared helpers (repo root) ──────────────────
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+from common.embedding_cache import QueryEmbeddingCache
+from common.hnsw import collection_space, distance_to_score
+from common.symbol_index import Symbol, SymbolIndex, symbol_index_path
+from common.vector_store import BACKENDS, open_mmap_collection, vector_backend
+
 # ───────────────────── logging setup ───────────────────────────────
 logging.basicConfig(
     level=logging.INFO,
@@ -74,15 +117,53 @@ DATABASE_CONFIGS = {
     "code": {
         "chroma_path": Path("./chroma_code_db"),
         "collection": "code_index",
+        "kind": "code",
         "description": "Source code repository"
     },
     "pdfs": {
         "chroma_path": Path("./chroma_db"),
         "collection": "pdf_documents",
+        "kind": "pdfs",
         "description": "PDF documentation"
     }
 }
 
+# `--target all` searches every entry of DATABASE_CONFIGS at once
+ALL_TARGETS = "all"
+
+
+def register_target(name: str, chroma_path: Path, collection: str,
+                    kind: str = "pdfs", description: Optional[str] = None) -> None:
+    """
+    Add a collection to DATABASE_CONFIGS so `--target NAME` and `--target all`
+    can search it. `kind` ('code' or 'pdfs') selects the metadata formatting.
+    """
+    if name == ALL_TARGETS:
+        raise ValueError(f"'{ALL_TARGETS}' is reserved")
+    if kind not in ("code", "pdfs"):
+        raise ValueError("kind must be 'code' or 'pdfs'")
+    DATABASE_CONFIGS[name] = {
+        "chroma_path": Path(chroma_path),
+        "collection": collection,
+        "kind": kind,
+        "description": description or f"{collection} ({chroma_path})",
+    }
+
+
+def parse_registration(spec: str) -> Tuple[str, Path, str, str]:
+    """Parse NAME=PATH[:COLLECTION[:KIND]] from --register."""
+    name, sep, rest = spec.partition("=")
+    if not sep or not name or not rest:
+        raise ValueError(f"expected NAME=PATH[:COLLECTION[:KIND]], got '{spec}'")
+    parts = rest.split(":")
+    collection = parts[1] if len(parts) > 1 and parts[1] else "pdf_documents"
+    kind = parts[2] if len(parts) > 2 and parts[2] else "pdfs"
+    return name, Path(parts[0]), collection, kind
+
+# Query vectors are cached for the lifetime of the process (LRU), so
+# repeated searches in interactive mode skip the embedding model
+QUERY_CACHE = QueryEmbeddingCache(capacity=1024)
+
 # ANSI color codes for terminal output
 # These work on most POSIX terminals (Linux, macOS, WSL)
 COLORS = {
@@ -170,7 +251,8 @@ def format_pdf_metadata(metadata: Dict[str, Any]) -> str:
 
 
 def display_results(query: str, documents: List[str], metadatas: List[Dict[str, Any]],
-                   similarities: List[float], target: str) -> None:
+                   similarities: List[float], target: str,
+                   result_targets: Optional[List[str]] = None) -> None:
     """
     Display search results in a formatted, colorized output.
 
@@ -188,7 +270,9 @@ def display_results(query: str, documents: List[str], metadatas: List[Dict[str,
     similarities : List[float]
         List of similarity scores for each result.
     target : str
-        Search target ('code' or 'pdfs') for metadata formatting.
+        Search target ('code', 'pdfs' or a registered name) for metadata formatting.
+    result_targets : Optional[List[str]]
+        Per-result target names (federated search); overrides `target`.
     """
     # Print search header
     print(f"\n{COLORS['cyan']}{COLORS['bold']}{'='*80}{COLORS['reset']}")
@@ -215,34 +299,187 @@ def display_results(query: str, documents: List[str], metadatas: List[Dict[str,
         display_text = doc if len(doc) <= max_display_chars else doc[:max_display_chars] + "..."
         print(f"{display_text}\n")
 
-        # Similarity score in red for emphasis
-        print(f"{COLORS['red']}Similarity Score: {sim:.4f}{COLORS['reset']}\n")
+        # Cosine similarity in red for emphasis
+        print(f"{COLORS['red']}Cosine Similarity: {sim:.4f}{COLORS['reset']}\n")
 
         # Format metadata based on target type
-        if target == "code":
+        result_target = result_targets[i] if result_targets else target
+        if DATABASE_CONFIGS.get(result_target, {}).get("kind", result_target) == "code":
             metadata_str = format_code_metadata(meta)
         else:  # pdfs
             metadata_str = format_pdf_metadata(meta)
 
+        if result_targets:
+            print(f"{COLORS['yellow']}Collection:{COLORS['reset']} {result_target}")
         print(metadata_str)
         print()  # Blank line between results
 
 
+# ╔════════════════════════════════════════════════════════════════╗
+# 3.  Exact symbol lookup                                          ║
+# ╚════════════════════════════════════════════════════════════════╝
+
+# Identifiers, dotted names, and `prefix*` patterns
+SYMBOL_QUERY = re.compile(r"[A-Za-z_$][\w$]*(?:\.[A-Za-z_$][\w$]*)*\*?\Z")
+
+# Definitions (and, separately, references) listed per symbol lookup
+SYMBOL_DISPLAY_LIMIT = 20
+
+# Open symbol indexes by path, with the mtime they were opened at
+# (index_code.py --watch replaces the file as the tree changes)
+_SYMBOL_INDEXES: Dict[str, Tuple[int, SymbolIndex]] = {}
+
+
+def is_symbol_query(query: str) -> bool:
+    """
+    Whether a query names a symbol rather than describing something.
+
+    Identifiers with an underscore, digit, dot or capital letter
+    (`filter_chunks`, `NearDuplicateFilter.check`, `MAX_TOKENS`) qualify,
+    as does anything ending in '*' (a prefix lookup). A plain lowercase
+    word ("pagination") stays a semantic query; `pagination*` looks it up.
+    """
+    query = query.strip()
+    if not SYMBOL_QUERY.match(query):
+        return False
+    return query.endswith("*") or not (query.isalpha() and query.islower())
+
+
+def open_symbol_index(db_path: Path) -> Optional[SymbolIndex]:
+    """The symbol index of a code database, reopened when it was rewritten; None if absent."""
+    path = symbol_index_path(db_path)
+    try:
+        mtime = path.stat().st_mtime_ns
+    except OSError:
+        return None
+    key = str(path.resolve())
+    cached = _SYMBOL_INDEXES.get(key)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    try:
+        index = SymbolIndex(path)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Symbol index unavailable: {e}")
+        return None
+    if cached is not None:
+        cached[1].close()
+    _SYMBOL_INDEXES[key] = (mtime, index)
+    return index
+
+
+def display_symbols(query: str, symbols: List[Symbol], prefix: bool, elapsed_us: float) -> None:
+    """Print definitions, then references, of a symbol lookup."""
+    definitions = [s for s in symbols if s.is_definition]
+    references = [s for s in symbols if not s.is_definition]
+
+    print(f"\n{COLORS['cyan']}{COLORS['bold']}{'='*80}{COLORS['reset']}")
+    print(f"{COLORS['cyan']}{COLORS['bold']}Symbol Results for: \"{query}\"{COLORS['reset']}")
+    print(f"{COLORS['cyan']}{COLORS['bold']}{'='*80}{COLORS['reset']}\n")
+    print(f"{COLORS['yellow']}{len(definitions)} definitions, {len(references)} references "
+          f"({'prefix' if prefix else 'exact'} match, {elapsed_us:.0f} µs){COLORS['reset']}\n")
+
+    for title, group, color in (("Definitions", definitions, COLORS['green']),
+                                ("References", references, COLORS['blue'])):
+        if not group:
+            continue
+        print(f"{color}{title}{COLORS['reset']}")
+        for symbol in group[:SYMBOL_DISPLAY_LIMIT]:
+            location = f"{symbol.file_path}:{symbol.line}"
+            if symbol.is_definition:
+                print(f"  {symbol.kind:<9} {symbol.qualname:<40} {location}")
+            else:
+                print(f"  {symbol.name:<30} {location:<50} in {symbol.scope or '<module>'}")
+        if len(group) > SYMBOL_DISPLAY_LIMIT:
+            print(f"  ... and {len(group) - SYMBOL_DISPLAY_LIMIT} more")
+        print()
+
+
+def symbol_search(query: str, db_path: Path) -> bool:
+    """
+    Answer an identifier query from the code database's symbol index.
+
+    An exact lookup is tried first, then (or directly, for `name*`) a
+    prefix lookup. Returns False – so the caller falls back to a semantic
+    search – when there is no symbol index or nothing matches.
+    """
+    index = open_symbol_index(db_path)
+    if index is None:
+        return False
+
+    query = query.strip()
+    prefix = query.endswith("*")
+    name = query.rstrip("*")
+    t0 = time.perf_counter()
+    symbols = index.lookup(name, prefix=prefix)
+    if not symbols and not prefix:
+        prefix = True
+        symbols = index.lookup(name, prefix=True)
+    elapsed_us = (time.perf_counter() - t0) * 1e6
+
+    if not symbols:
+        logger.info(f"No symbol matches '{query}'; running a semantic search")
+        return False
+    display_symbols(query, symbols, prefix, elapsed_us)
+    return True
+
+
 # ╔════════════════════════════════════════════════════════════════╗
 # 4.  Core search functionality                                    ║
 # ╚════════════════════════════════════════════════════════════════╝
 
+# Opened collections, reused across queries (interactive and federated mode)
+_COLLECTIONS: Dict[Tuple[str, str, str, str], Any] = {}
+_COLLECTIONS_LOCK = threading.Lock()
+
+
+def open_collection(db_path: Path, collection: str, backend: str,
+                    store_path: Optional[Path] = None):
+    """
+    Open (or reuse) a collection from ChromaDB or its memory-mapped copy.
+
+    Raises on failure; callers decide whether that is fatal.
+    """
+    key = (backend, str(db_path.resolve()), collection, str(store_path or ""))
+    with _COLLECTIONS_LOCK:
+        coll = _COLLECTIONS.get(key)
+    if coll is not None:
+        return coll
+
+    if backend == "mmap":
+        # Memory-mapped copy: opening only maps files, nothing is loaded
+        coll = open_mmap_collection(db_path, collection, store_path)
+    else:
+        # Connect to the persistent database on disk
+        client = PersistentClient(
+            path=str(db_path),
+            settings=Settings(),
+            tenant=DEFAULT_TENANT,
+            database=DEFAULT_DATABASE,
+        )
+
+        # Get the collection (will error if it doesn't exist)
+        coll = client.get_or_create_collection(name=collection)
+
+    with _COLLECTIONS_LOCK:
+        return _COLLECTIONS.setdefault(key, coll)
+
+
 def search(query: str, target: str = "code", top_k: int = 3,
           chroma_path: Optional[Path] = None,
-          collection_name: Optional[str] = None) -> None:
+          collection_name: Optional[str] = None,
+          backend: Optional[str] = None,
+          store_path: Optional[Path] = None,
+          use_symbols: bool = True) -> None:
     """
     Search the vector database for semantically similar content.
 
-    This function:
+    Identifier-shaped queries on a code database are looked up in its
+    symbol index first (see symbol_search); otherwise this function:
     1. Connects to the specified ChromaDB database
     2. Encodes the query using the same embedding model as indexing
     3. Performs vector similarity search
-    4. Computes exact cosine similarities
+    4. Converts the returned distances to cosine similarity for the
+       collection's distance space (l2, cosine or ip)
     5. Displays results with formatting and metadata
 
     Parameters
@@ -250,19 +487,31 @@ def search(query: str, target: str = "code", top_k: int = 3,
     query : str
         The search query (natural language).
     target : str
-        Which database to search: 'code' or 'pdfs'.
+        Which database to search: 'code', 'pdfs', a registered name, or
+        'all' for a federated search (see search_all).
     top_k : int
         Number of results to return (default: 3).
     chroma_path : Optional[Path]
         Path to ChromaDB directory (overrides default).
     collection_name : Optional[str]
         Collection name (overrides default).
+    backend : Optional[str]
+        'chroma' or 'mmap' (default: $VECTOR_BACKEND, else 'chroma').
+    store_path : Optional[Path]
+        mmap store directory (default: <chroma_path>_mmap).
+    use_symbols : bool
+        Route identifier-shaped queries to the exact symbol lookup.
     """
     # ══════════════════════════════════════════════════════════════
     # STEP 1: Validate target and get configuration
     # ══════════════════════════════════════════════════════════════
+    if target == ALL_TARGETS:
+        search_all(query, top_k, backend)
+        return
+
     if target not in DATABASE_CONFIGS:
-        logger.error(f"Invalid target: {target}. Must be 'code' or 'pdfs'.")
+        logger.error(f"Invalid target: {target}. Must be one of: "
+                     f"{', '.join([*DATABASE_CONFIGS, ALL_TARGETS])}.")
         return
 
     # Get configuration for this target (use overrides if provided)
@@ -270,8 +519,14 @@ def search(query: str, target: str = "code", top_k: int = 3,
     db_path = chroma_path or config["chroma_path"]
     collection = collection_name or config["collection"]
 
-    # Validate database exists
-    if not db_path.exists():
+    # Identifiers are answered exactly from the symbol table, when it has them
+    if use_symbols and config["kind"] == "code" and is_symbol_query(query):
+        if symbol_search(query, db_path):
+            return
+
+    # Validate database exists (the mmap store is checked when it is opened)
+    backend = vector_backend(backend)
+    if backend == "chroma" and not db_path.exists():
         logger.error(
             f"Database not found at {db_path.resolve()}\n"
             f"Run the appropriate indexing script first:\n"
@@ -281,29 +536,21 @@ def search(query: str, target: str = "code", top_k: int = 3,
         return
 
     # ══════════════════════════════════════════════════════════════
-    # STEP 2: Connect to ChromaDB and load collection
+    # STEP 2: Connect to the vector store and load collection
     # ══════════════════════════════════════════════════════════════
     try:
-        # Connect to the persistent database on disk
-        client = PersistentClient(
-            path=str(db_path),
-            settings=Settings(),
-            tenant=DEFAULT_TENANT,
-            database=DEFAULT_DATABASE,
-        )
-
-        # Get the collection (will error if it doesn't exist)
-        coll = client.get_or_create_collection(name=collection)
-
+        coll = open_collection(db_path, collection, backend, store_path)
     except Exception as e:
         logger.error(f"Failed to connect to database: {e}")
+        if backend == "mmap":
+            logger.error(f"Create the store first: python tools/convert_chroma_store.py "
+                         f"--chroma-path {db_path}")
         return
 
     # Check if collection has any content
     # An empty collection means nothing has been indexed yet
     try:
-        collection_data = coll.get()
-        total_chunks = len(collection_data.get("documents", []))
+        total_chunks = coll.count()
     except Exception as e:
         logger.error(f"Failed to read collection: {e}")
         return
@@ -321,10 +568,11 @@ def search(query: str, target: str = "code", top_k: int = 3,
     # ══════════════════════════════════════════════════════════════
     # STEP 3: Perform vector similarity search
     # ══════════════════════════════════════════════════════════════
-    # ChromaDB embeds the query and finds the top_k most similar vectors
+    # The query is embedded once (or served from QUERY_CACHE) and the vector
+    # store finds the top_k most similar vectors
     try:
         results = coll.query(
-            query_texts=[query],                        # ChromaDB embeds this automatically
+            query_embeddings=[QUERY_CACHE.embed_query(query)],  # Same model as the index
             n_results=top_k,                            # How many results to return
             include=["documents", "metadatas", "distances"],  # What to include
         )
@@ -346,9 +594,11 @@ def search(query: str, target: str = "code", top_k: int = 3,
     # ══════════════════════════════════════════════════════════════
     # STEP 4: Convert distances to similarity scores
     # ══════════════════════════════════════════════════════════════
-    # ChromaDB returns squared L2 distances by default; convert to
-    # a similarity score where higher = more similar
-    similarities = [1.0 / (1.0 + dist) for dist in distances]
+    # Distances depend on the collection's space (squared L2 by default,
+    # see index_*.py --hnsw-space); convert them to cosine similarity so
+    # scores mean the same thing whatever the index was built with
+    space = collection_space(coll)
+    similarities = [distance_to_score(dist, space) for dist in distances]
 
     # ══════════════════════════════════════════════════════════════
     # STEP 5: Display formatted results
@@ -357,12 +607,234 @@ def search(query: str, target: str = "code", top_k: int = 3,
 
 
 # ╔════════════════════════════════════════════════════════════════╗
-# 5.  Interactive REPL mode                                        ║
+# 5.  Federated search across collections                          ║
+# ╚════════════════════════════════════════════════════════════════╝
+
+def query_collection(name: str, config: Dict[str, Any], query_embeddings: List[Any],
+                     top_k: int, backend: str,
+                     store_path: Optional[Path] = None) -> List[List[Dict[str, Any]]]:
+    """
+    Top-k hits per query vector from one collection, in a single query call.
+
+    Hits carry cosine similarity scores. Runs on a worker thread; problems
+    are logged and yield no hits so one missing database never fails a
+    federated or bulk search.
+    """
+    no_hits: List[List[Dict[str, Any]]] = [[] for _ in query_embeddings]
+    db_path = config["chroma_path"]
+    if backend == "chroma" and not db_path.exists():
+        logger.warning(f"[{name}] no database at {db_path.resolve()}; skipped")
+        return no_hits
+    try:
+        coll = open_collection(db_path, config["collection"], backend, store_path)
+        t0 = time.perf_counter()
+        results = coll.query(
+            query_embeddings=list(query_embeddings),
+            n_results=top_k,
+            include=["documents", "metadatas", "distances"],
+        )
+        elapsed_ms = (time.perf_counter() - t0) * 1000
+    except Exception as e:
+        logger.warning(f"[{name}] search failed: {e}")
+        return no_hits
+
+    # Cosine similarity is comparable across collections: every index uses
+    # the same embedding model, whatever distance space it was built with
+    space = collection_space(coll)
+    logger.debug(f"[{name}] {len(query_embeddings)} queries in {elapsed_ms:.1f} ms")
+    return [
+        [{"target": name, "id": id_, "document": doc, "metadata": meta or {},
+          "distance": dist, "score": distance_to_score(dist, space)}
+         for id_, doc, meta, dist in zip(ids, docs, metas, dists)]
+        for ids, docs, metas, dists in zip(results["ids"], results["documents"],
+                                           results["metadatas"], results["distances"])
+    ]
+
+
+def merge_hits(per_target: List[List[Dict[str, Any]]], top_k: int) -> List[Dict[str, Any]]:
+    """Best `top_k` hits across collections by cosine similarity."""
+    return heapq.nlargest(top_k, (h for target_hits in per_target for h in target_hits),
+                          key=lambda h: h["score"])
+
+
+def search_all(query: str, top_k: int = 3, backend: Optional[str] = None,
+               targets: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """
+    Search several collections concurrently and merge them into one ranking.
+
+    The query is embedded once, every collection is queried for its own
+    top_k on a thread pool (vector search releases the GIL, so latency is
+    close to the slowest single lookup rather than the sum), and the hits
+    are merged by cosine similarity.
+
+    Parameters
+    ----------
+    query : str
+        The search query (natural language).
+    top_k : int
+        Number of merged results to return.
+    backend : Optional[str]
+        'chroma' or 'mmap' (default: $VECTOR_BACKEND, else 'chroma').
+    targets : Optional[List[str]]
+        Registered target names (default: all of DATABASE_CONFIGS).
+
+    Returns
+    -------
+    List[Dict[str, Any]]
+        Merged hits (target, document, metadata, score), best first.
+    """
+    backend = vector_backend(backend)
+    targets = targets or list(DATABASE_CONFIGS)
+    query_embedding = QUERY_CACHE.embed_query(query)
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(targets), thread_name_prefix="search") as pool:
+        per_target = list(pool.map(
+            lambda name: query_collection(name, DATABASE_CONFIGS[name], [query_embedding],
+                                          top_k, backend)[0],
+            targets))
+    elapsed_ms = (time.perf_counter() - t0) * 1000
+
+    hits = merge_hits(per_target, top_k)
+    logger.info(f"Searched {len(targets)} collections ({', '.join(targets)}) in {elapsed_ms:.1f} ms")
+
+    if not hits:
+        logger.warning("No matches found for your query.")
+        return hits
+
+    display_results(query, [h["document"] for h in hits], [h["metadata"] for h in hits],
+                    [h["score"] for h in hits], ALL_TARGETS,
+                    result_targets=[h["target"] for h in hits])
+    return hits
+
+
+# ╔════════════════════════════════════════════════════════════════╗
+# 6.  Bulk mode (JSONL)                                            ║
+# ╚════════════════════════════════════════════════════════════════╝
+
+def read_queries(stream: TextIO) -> Iterator[Tuple[str, str]]:
+    """
+    Yield (id, query) pairs from plain-text lines or JSON objects.
+
+    A line starting with '{' is parsed as {"id": ..., "query": ...};
+    anything else is the query itself, numbered by its line. Blank lines
+    are skipped.
+    """
+    for line_no, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith("{"):
+            try:
+                record = json.loads(line)
+                yield str(record.get("id", line_no)), str(record["query"])
+            except (json.JSONDecodeError, KeyError) as e:
+                logger.warning(f"Line {line_no}: skipped ({e})")
+            continue
+        yield str(line_no), line
+
+
+def batched(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    batch: List[Any] = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def bulk_search(stream: TextIO, out: TextIO, target: str = "code", top_k: int = 3,
+                batch_size: int = 64, backend: Optional[str] = None,
+                chroma_path: Optional[Path] = None,
+                collection_name: Optional[str] = None,
+                store_path: Optional[Path] = None,
+                include_documents: bool = True) -> int:
+    """
+    Answer many queries with batched embedding and multi-query vector searches.
+
+    Queries are read lazily and processed `batch_size` at a time: the batch
+    is embedded in one model call (cached vectors are reused), each
+    collection gets one query() call for the whole batch (all collections
+    in parallel for target 'all'), and one JSON line per query is written
+    and flushed as soon as its batch is done.
+
+    Parameters
+    ----------
+    stream : TextIO
+        Source of queries (see read_queries).
+    out : TextIO
+        Where the JSONL results go.
+    target : str
+        'code', 'pdfs', a registered name, or 'all'.
+    top_k : int
+        Results per query.
+    batch_size : int
+        Queries per embedding / query() call.
+    backend : Optional[str]
+        'chroma' or 'mmap' (default: $VECTOR_BACKEND, else 'chroma').
+    chroma_path, collection_name, store_path : Optional
+        Overrides for a single target (ignored for 'all').
+    include_documents : bool
+        Include chunk text in the output (metadata and scores always are).
+
+    Returns
+    -------
+    int
+        Number of queries answered.
+    """
+    backend = vector_backend(backend)
+    if target == ALL_TARGETS:
+        targets = [(name, config, None) for name, config in DATABASE_CONFIGS.items()]
+    else:
+        config = dict(DATABASE_CONFIGS[target])
+        config["chroma_path"] = chroma_path or config["chroma_path"]
+        config["collection"] = collection_name or config["collection"]
+        targets = [(target, config, store_path)]
+
+    answered = 0
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(targets), thread_name_prefix="search") as pool:
+        for batch in batched(read_queries(stream), batch_size):
+            embeddings = QUERY_CACHE.embed([query for _, query in batch])
+            per_target = list(pool.map(
+                lambda t: query_collection(t[0], t[1], embeddings, top_k, backend, t[2]),
+                targets))
+
+            for i, (query_id, query) in enumerate(batch):
+                hits = merge_hits([target_hits[i] for target_hits in per_target], top_k)
+                results = []
+                for rank, hit in enumerate(hits, 1):
+                    result = {"rank": rank, "collection": hit["target"], "id": hit["id"],
+                              "score": round(hit["score"], 6),
+                              "distance": round(hit["distance"], 6),
+                              "metadata": hit["metadata"]}
+                    if include_documents:
+                        result["document"] = hit["document"]
+                    results.append(result)
+                out.write(json.dumps({"id": query_id, "query": query, "target": target,
+                                      "results": results}, ensure_ascii=False) + "\n")
+            out.flush()
+            answered += len(batch)
+
+    elapsed = time.perf_counter() - t0
+    logger.info(f"Answered {answered} queries in {elapsed:.2f}s "
+                f"({answered / elapsed if elapsed else 0:.1f} queries/sec); "
+                f"{QUERY_CACHE.format_stats()}")
+    return answered
+
+
+# ╔════════════════════════════════════════════════════════════════╗
+# 7.  Interactive REPL mode                                        ║
 # ╚════════════════════════════════════════════════════════════════╝
 
 def interactive_mode(target: str = "code", top_k: int = 3,
                     chroma_path: Optional[Path] = None,
-                    collection_name: Optional[str] = None) -> None:
+                    collection_name: Optional[str] = None,
+                    backend: Optional[str] = None,
+                    store_path: Optional[Path] = None,
+                    use_symbols: bool = True) -> None:
     """
     Run an interactive search REPL (Read-Eval-Print Loop).
 
@@ -379,15 +851,23 @@ def interactive_mode(target: str = "code", top_k: int = 3,
         Custom database path (overrides default).
     collection_name : Optional[str]
         Custom collection name (overrides default).
+    backend : Optional[str]
+        'chroma' or 'mmap' vector store.
+    store_path : Optional[Path]
+        Custom mmap store directory.
+    use_symbols : bool
+        Route identifier-shaped queries to the exact symbol lookup.
     """
     # Display welcome message with instructions
     config = DATABASE_CONFIGS.get(target, {})
-    description = config.get("description", target)
+    description = config.get("description",
+                             "all collections" if target == ALL_TARGETS else target)
 
     print(f"\n{COLORS['cyan']}{COLORS['bold']}{'='*80}{COLORS['reset']}")
     print(f"{COLORS['cyan']}{COLORS['bold']}Interactive Search - {description.title()}{COLORS['reset']}")
     print(f"{COLORS['cyan']}{COLORS['bold']}{'='*80}{COLORS['reset']}\n")
     print("Enter your search queries below.")
+    print("Type 'stats' for query cache statistics.")
     print("Type 'exit', 'quit', or press Ctrl+C to exit.\n")
 
     # Main REPL loop
@@ -399,16 +879,23 @@ def interactive_mode(target: str = "code", top_k: int = 3,
 
             # Check for exit commands
             if user_input.lower() in ["exit", "quit", "q"]:
+                print(f"\n{COLORS['cyan']}{QUERY_CACHE.format_stats()}{COLORS['reset']}")
                 print(f"\n{COLORS['cyan']}Exiting search. Goodbye!{COLORS['reset']}\n")
                 break
 
+            # Show query embedding cache hit rate
+            if user_input.lower() == "stats":
+                print(f"{COLORS['cyan']}{QUERY_CACHE.format_stats()}{COLORS['reset']}\n")
+                continue
+
             # Skip empty queries
             if not user_input:
                 print(f"{COLORS['yellow']}Please enter a search query.{COLORS['reset']}\n")
                 continue
 
             # Perform the search
-            search(user_input, target, top_k, chroma_path, collection_name)
+            search(user_input, target, top_k, chroma_path, collection_name,
+                   backend, store_path, use_symbols)
 
         except KeyboardInterrupt:
             # Handle Ctrl+C gracefully
@@ -421,7 +908,7 @@ def interactive_mode(target: str = "code", top_k: int = 3,
 
 
 # ╔════════════════════════════════════════════════════════════════╗
-# 6.  CLI entry point                                              ║
+# 8.  CLI entry point                                              ║
 # ╚════════════════════════════════════════════════════════════════╝
 
 def main():
@@ -448,6 +935,19 @@ Examples:
 
   # Custom database path
   python search.py --query "error handling" --chroma-path ./my_db
+
+  # Bulk: one JSON line per query, for evaluation scripts and other tools
+  printf 'reset password\nrefund policy\n' | python search.py --queries-file - --target pdfs
+
+  # Code + PDFs + an extra collection, merged into one ranking
+  python search.py --query "refund rules" --target all --register policies=./policy_db:pdf_documents
+
+  # Memory-mapped store (create with convert_chroma_store.py)
+  python search.py --query "password reset" --target pdfs --backend mmap
+
+  # Where a function is defined and used (exact, no embedding); 'chunk_*' for a prefix
+  python search.py --query filter_chunks
+  python search.py --query "chunk_*"
         """
     )
 
@@ -456,9 +956,18 @@ Examples:
     parser.add_argument(
         "--target",
         type=str,
-        choices=["code", "pdfs"],
         default="code",
-        help="Which database to search: 'code' or 'pdfs' (default: code)"
+        help="Which database to search: 'code', 'pdfs', 'all' (every collection "
+             "at once) or a --register'ed name (default: code)"
+    )
+
+    parser.add_argument(
+        "--register",
+        action="append",
+        default=[],
+        metavar="NAME=PATH[:COLLECTION[:KIND]]",
+        help="Register an extra collection for --target all / --target NAME; "
+             "KIND is 'pdfs' (default) or 'code'. Repeatable."
     )
 
     # ── Query parameters ──────────────────────────────────────────
@@ -469,6 +978,35 @@ Examples:
         help="Search query (if omitted, enters interactive mode)"
     )
 
+    # ── Bulk mode ─────────────────────────────────────────────────
+    # Many queries from a file or stdin, JSONL results
+    parser.add_argument(
+        "--queries-file",
+        type=str,
+        metavar="PATH",
+        help="Bulk mode: read queries (one per line, or {\"id\", \"query\"} JSON) "
+             "from PATH, or '-' for stdin, and write JSONL results"
+    )
+
+    parser.add_argument(
+        "--output",
+        type=Path,
+        help="Bulk mode: write JSONL here instead of stdout"
+    )
+
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=64,
+        help="Bulk mode: queries per embedding / vector search call (default: 64)"
+    )
+
+    parser.add_argument(
+        "--no-documents",
+        action="store_true",
+        help="Bulk mode: omit chunk text from the JSONL (scores and metadata only)"
+    )
+
     parser.add_argument(
         "--top-k",
         type=int,
@@ -476,6 +1014,12 @@ Examples:
         help="Number of results to return (default: 3)"
     )
 
+    parser.add_argument(
+        "--no-symbols",
+        action="store_true",
+        help="Search semantically even for identifier queries (skip the symbol index)"
+    )
+
     # ── Database overrides ────────────────────────────────────────
     # Advanced options to override default paths
     parser.add_argument(
@@ -490,6 +1034,19 @@ Examples:
         help="Collection name (overrides default for target)"
     )
 
+    # ── Vector store backend ──────────────────────────────────────
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        help="Vector store to search: 'chroma' or 'mmap' (default: $VECTOR_BACKEND or chroma)"
+    )
+
+    parser.add_argument(
+        "--store-path",
+        type=Path,
+        help="mmap store directory (default: <chroma-path>_mmap)"
+    )
+
     # Parse the command-line arguments
     args = parser.parse_args()
 
@@ -502,11 +1059,59 @@ Examples:
         logger.error("--top-k must be at least 1")
         sys.exit(1)
 
+    # Register extra collections before validating the target
+    for spec in args.register:
+        try:
+            register_target(*parse_registration(spec))
+        except ValueError as e:
+            logger.error(f"--register: {e}")
+            sys.exit(1)
+
+    if args.target != ALL_TARGETS and args.target not in DATABASE_CONFIGS:
+        logger.error(f"--target must be one of: {', '.join([*DATABASE_CONFIGS, ALL_TARGETS])}")
+        sys.exit(1)
+
+    if args.batch_size < 1:
+        logger.error("--batch-size must be at least 1")
+        sys.exit(1)
+
+    if args.query and args.queries_file:
+        logger.error("Use either --query or --queries-file, not both")
+        sys.exit(1)
+
+    # Path overrides name a single database; 'all' uses each registered one
+    if args.target == ALL_TARGETS and (args.chroma_path or args.collection or args.store_path):
+        logger.warning("--chroma-path/--collection/--store-path are ignored with --target all; "
+                       "use --register to add collections")
+
     # ══════════════════════════════════════════════════════════════
     # Run search in appropriate mode
     # ══════════════════════════════════════════════════════════════
 
-    if args.query:
+    if args.queries_file:
+        # ──────────────────────────────────────────────────────────
+        # Bulk mode: batched queries, JSONL out (logs go to stderr)
+        # ──────────────────────────────────────────────────────────
+        source = sys.stdin if args.queries_file == "-" else open(args.queries_file, encoding="utf-8")
+        out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+        try:
+            bulk_search(
+                source, out,
+                target=args.target,
+                top_k=args.top_k,
+                batch_size=args.batch_size,
+                backend=args.backend,
+                chroma_path=args.chroma_path,
+                collection_name=args.collection,
+                store_path=args.store_path,
+                include_documents=not args.no_documents
+            )
+        finally:
+            if source is not sys.stdin:
+                source.close()
+            if out is not sys.stdout:
+                out.close()
+    elif args.query:
         # ──────────────────────────────────────────────────────────
         # CLI mode: Single query, then exit
         # ──────────────────────────────────────────────────────────
@@ -515,7 +1120,10 @@ Examples:
             target=args.target,
             top_k=args.top_k,
             chroma_path=args.chroma_path,
-            collection_name=args.collection
+            collection_name=args.collection,
+            backend=args.backend,
+            store_path=args.store_path,
+            use_symbols=not args.no_symbols
         )
     else:
         # ──────────────────────────────────────────────────────────
@@ -525,7 +1133,10 @@ Examples:
             target=args.target,
             top_k=args.top_k,
             chroma_path=args.chroma_path,
-            collection_name=args.collection
+            collection_name=args.collection,
+            backend=args.backend,
+            store_path=args.store_path,
+            use_symbols=not args.no_symbols
         )
 
 